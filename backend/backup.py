@@ -0,0 +1,213 @@
+"""Online snapshots and restores of the SQLite databases, using SQLite's backup API.
+
+Usage (from backend/):
+    python backup.py snapshot --dest backups                # budget_tracker.db, or every household in multi-tenant mode
+    python backup.py snapshot --dest backups --household smiths --checkpoint
+    python backup.py restore backups/20250101-120000/budget_tracker.db
+    python backup.py restore backups/20250101-120000/households/smiths.db --household smiths
+
+Snapshots can be taken while the API is serving requests. So can restores with
+WRITE_COORDINATION=single-writer; without it, stop the API and pass --offline.
+"""
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import List, Optional
+
+from database import SQLITE_DATABASE_PATH, WRITE_COORDINATION, writer_for
+from tenants import HOUSEHOLD_PATTERN, MULTI_TENANT, TENANT_DATABASE_DIR, tenant_pool
+
+logger = logging.getLogger("budget_tracker.backup")
+
+# Pages copied per backup step, and the pause between steps that lets requests run
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_PAUSE_MS = float(os.getenv("BACKUP_STEP_PAUSE_MS", "5"))
+# Rollback-journal databases only: restarts caused by concurrent writes before
+# the rest is copied in one step with writes blocked
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "10"))
+
+class BackupStats:
+    def __init__(self):
+        self.pages = 0
+        self.steps = 0
+        self.restarts = 0
+        self.seconds = 0.0
+        self.wal = False
+        self.blocked_writes = False  # The rest was copied in one step with writes blocked
+
+class TooManyRestarts(Exception):
+    """Writes kept invalidating an incremental copy of a rollback-journal database"""
+
+def writer_lock(path: str):
+    return writer_for(path).hold() if WRITE_COORDINATION == "single-writer" else nullcontext()
+
+@contextmanager
+def writes_blocked(path: str):
+    """Keep every writer out of a database, coordinated or not, until the block exits.
+
+    A separate connection holds BEGIN IMMEDIATE (SQLite's RESERVED lock), so
+    other connections can still read but no write transaction can start.
+    Coordinated writers queue on the writer lock first instead of timing out.
+    """
+    with writer_lock(path):
+        lock = sqlite3.connect(path, isolation_level=None, timeout=30)
+        try:
+            lock.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            finally:
+                lock.execute("ROLLBACK")
+        finally:
+            lock.close()
+
+def snapshot_database(source_path: str, dest_path: str, pages: int = BACKUP_PAGES_PER_STEP,
+                      pause_ms: float = BACKUP_STEP_PAUSE_MS, checkpoint: bool = False) -> BackupStats:
+    """Copy a live database to dest_path as a consistent snapshot, pages pages at a time.
+
+    In WAL mode (WRITE_COORDINATION=single-writer) every step reads from one
+    pinned read transaction, so the copy is consistent and writers are never
+    blocked. In rollback-journal mode a held read lock would stall writers, so
+    the lock is only taken per step; a write between steps restarts the copy,
+    and after BACKUP_MAX_RESTARTS restarts the rest is copied in one step while
+    a separate connection holds BEGIN IMMEDIATE, which blocks every writer
+    whether or not WRITE_COORDINATION is on. checkpoint first runs a PASSIVE
+    WAL checkpoint, which never waits on readers or writers.
+
+    The copy is written next to dest_path and renamed into place when complete.
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(source_path)
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    partial = dest_path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    stats = BackupStats()
+    last_remaining = [None]
+
+    def progress(status, remaining, total):
+        stats.steps += 1
+        stats.pages = total
+        if last_remaining[0] is not None and remaining > last_remaining[0]:
+            stats.restarts += 1
+            if not stats.wal and stats.restarts > BACKUP_MAX_RESTARTS:
+                raise TooManyRestarts()
+        last_remaining[0] = remaining
+        if remaining and pause_ms:
+            time.sleep(pause_ms / 1000)
+
+    start = time.perf_counter()
+    source = sqlite3.connect(source_path, isolation_level=None, timeout=30)
+    target = sqlite3.connect(partial)
+    try:
+        stats.wal = source.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if stats.wal:
+            if checkpoint:
+                source.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()  # Pin the snapshot
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except TooManyRestarts:
+            stats.blocked_writes = True
+            with writes_blocked(source_path):
+                source.backup(target)
+        if stats.wal:
+            source.execute("COMMIT")
+    finally:
+        source.close()
+        target.close()
+    os.replace(partial, dest_path)
+
+    stats.seconds = time.perf_counter() - start
+    logger.info("Snapshot of %s to %s: %d pages in %d steps, %d restarts, %.2f s",
+                source_path, dest_path, stats.pages, stats.steps, stats.restarts, stats.seconds)
+    return stats
+
+def restore_database(snapshot_path: str, target_path: str, offline: bool = False) -> None:
+    """Replace a database's contents with a snapshot.
+
+    The snapshot is integrity-checked first, then copied in a single step. With
+    WRITE_COORDINATION=single-writer the copy holds the writer lock, so the API
+    can keep running and no write interleaves with it. Without coordination
+    nothing keeps a running server's writes out, so the API must be stopped and
+    offline=True passed to confirm it. Open connections see the restored data
+    from their next transaction; in-process caches of a running server
+    (forecasts, live summaries) are not told, so restart it afterwards.
+    """
+    if WRITE_COORDINATION != "single-writer" and not offline:
+        raise RuntimeError("Without WRITE_COORDINATION=single-writer a restore can't exclude the API's writes; "
+                           "stop the API and restore with offline=True (--offline)")
+    if not os.path.exists(snapshot_path):
+        raise FileNotFoundError(snapshot_path)
+    snapshot = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        result = snapshot.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"{snapshot_path} failed its integrity check: {result}")
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            with writer_lock(target_path):
+                snapshot.backup(target)
+        finally:
+            target.close()
+    finally:
+        snapshot.close()
+    logger.info("Restored %s from %s", target_path, snapshot_path)
+
+def household_path(household: str) -> str:
+    if not HOUSEHOLD_PATTERN.fullmatch(household):
+        raise ValueError(f"Invalid household id: {household}")
+    return tenant_pool.database_path(household)
+
+def snapshot_sources(household: Optional[str] = None) -> List[str]:
+    """The database files a snapshot covers"""
+    if household:
+        return [household_path(household)]
+    if MULTI_TENANT:
+        return sorted(glob.glob(os.path.join(TENANT_DATABASE_DIR, "*.db")))
+    return [SQLITE_DATABASE_PATH]
+
+def snapshot_all(dest_dir: str, household: Optional[str] = None, **options) -> dict:
+    """Snapshot each database into a new timestamped directory under dest_dir"""
+    run_dir = os.path.join(dest_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+    results = {}
+    for source_path in snapshot_sources(household):
+        name = os.path.basename(source_path)
+        dest_path = os.path.join(run_dir, "households", name) if MULTI_TENANT or household else os.path.join(run_dir, name)
+        results[source_path] = snapshot_database(source_path, dest_path, **options)
+    return results
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Online SQLite snapshots and restores")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="Take a consistent snapshot while the API keeps running")
+    snapshot.add_argument("--dest", default="backups")
+    snapshot.add_argument("--household", help="Only this household (multi-tenant mode)")
+    snapshot.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages per step, -1 for one step")
+    snapshot.add_argument("--pause-ms", type=float, default=BACKUP_STEP_PAUSE_MS)
+    snapshot.add_argument("--checkpoint", action="store_true", help="Run a passive WAL checkpoint first")
+
+    restore = commands.add_parser("restore", help="Replace a database with a snapshot")
+    restore.add_argument("snapshot")
+    restore.add_argument("--household", help="Restore into this household's database (multi-tenant mode)")
+    restore.add_argument("--offline", action="store_true",
+                         help="Confirm the API is stopped; required unless WRITE_COORDINATION=single-writer")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        snapshot_all(args.dest, args.household, pages=args.pages, pause_ms=args.pause_ms,
+                     checkpoint=args.checkpoint)
+    else:
+        restore_database(args.snapshot, household_path(args.household) if args.household else SQLITE_DATABASE_PATH,
+                         offline=args.offline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Request latency while an online snapshot of a large database is running.
+
+The API runs under uvicorn in its own process and the snapshot in another, as
+with `python backup.py snapshot` next to a live server. Client threads mix
+expense reads and writes; p50/p99 are reported with no backup running and
+during backups with different step sizes (-1 copies everything in one step).
+
+Each coordination gets its own database: single-writer runs in WAL mode and
+copies from one pinned snapshot; off stays in rollback-journal mode, where
+writes restart the copy until the rest is copied with writes blocked.
+
+Usage (from backend/):
+    python benchmarks/backup_latency.py --size-mb 2048 --pages -1 256 64
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import httpx
+
+import harness
+
+
+def seed(workdir, coordination, size_mb):
+    """Create the schema, then pad the expenses table with raw inserts up to size_mb"""
+    harness.create_database(workdir, {"write_coordination": coordination})
+    from database import SQLITE_DATABASE_PATH, engine
+    engine.dispose()
+
+    conn = sqlite3.connect(SQLITE_DATABASE_PATH)
+    padding = "x" * 900
+    while os.path.getsize(SQLITE_DATABASE_PATH) < size_mb * 1024 * 1024:
+        conn.executemany(
+            "INSERT INTO expenses (amount, description, date, user_id, category_id, version, currency, fingerprint) "
+            "VALUES (?, ?, ?, 1, ?, 1, 'USD', ?)",
+            # A stand-in fingerprint keeps the app's startup backfill from rewriting every row
+            [(round(random.uniform(1, 300), 2), padding, f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+              random.randint(1, 10), os.urandom(20).hex()) for _ in range(50000)]
+        )
+        conn.commit()
+    conn.close()
+
+
+def take_snapshot(workdir, coordination, pages, results):
+    harness.use_backend(workdir, write_coordination=coordination)
+    from backup import snapshot_database
+    from database import SQLITE_DATABASE_PATH
+    stats = snapshot_database(SQLITE_DATABASE_PATH, os.path.join("backups", f"snapshot-{pages}.db"), pages=pages)
+    results.put((stats.seconds, stats.steps, stats.restarts, stats.blocked_writes))
+
+
+def run_clients(base_url, clients, until):
+    """Issue requests from client threads until until() is true; returns latencies in ms"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        mine = []
+        with httpx.Client(base_url=base_url, timeout=60) as http:
+            while not until():
+                start = time.perf_counter()
+                if random.random() < 0.2:
+                    http.post("/api/expenses", json={"date": "2025-01-15", "amount": 9.5, "description": "bench",
+                                                     "user_id": 1, "category_id": 1})
+                else:
+                    http.get("/api/expenses", params={"limit": 20})
+                mine.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def run(coordination, args, table):
+    workdir = tempfile.mkdtemp(prefix="bench-backup-")
+    harness.run_in_process(seed, workdir, coordination, args.size_mb)
+    base_url, server = harness.start_server(workdir, write_coordination=coordination)
+    try:
+        deadline = time.monotonic() + args.seconds
+        samples = run_clients(base_url, args.clients, lambda: time.monotonic() > deadline)
+        table.row(coordination, "none", args.seconds, "", "", len(samples), *harness.p50_p99(samples))
+
+        for pages in args.pages:
+            results = harness.queue()
+            snapshot = harness.spawn(take_snapshot, workdir, coordination, pages, results)
+            samples = run_clients(base_url, args.clients, lambda: not snapshot.is_alive())
+            seconds, steps, restarts, blocked_writes = results.get()
+            snapshot.join()
+            label = "one step" if pages < 0 else f"{pages} pages"
+            table.row(coordination, label, seconds, steps, restarts, len(samples), *harness.p50_p99(samples),
+                      note="rest copied with writes blocked" if blocked_writes else "")
+    finally:
+        server.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--pages", type=int, nargs="+", default=[-1, 1024, 256])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5, help="Length of the no-backup baseline")
+    parser.add_argument("--coordination", nargs="+", default=["single-writer", "off"])
+    args = parser.parse_args()
+
+    print(f"{args.size_mb} MB databases, {args.clients} clients")
+    table = harness.Table(("coordination", 14, ""), ("backup", 10, ""), ("seconds", 9, ".1f"), ("steps", 7, ""),
+                          ("restarts", 10, ""), ("requests", 10, "d"), ("p50 ms", 8, ".1f"), ("p99 ms", 8, ".1f"))
+    for coordination in args.coordination:
+        run(coordination, args, table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""PUT /api/expenses/{id} latency under concurrent edits: UPDATE ... RETURNING vs the old path.
+
+Usage (from backend/):
+    python benchmarks/concurrent_updates.py --threads 16 --edits 200 --hot-rows 20
+
+Threads edit a small set of hot rows through the app, the way concurrent
+clients would. The legacy path is the former select/assign/commit/refresh
+update_expense, inlined here for comparison. With --versioned, each edit sends
+the version it read, so concurrent edits to one row come back as 409s.
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import date
+
+import harness
+
+harness.use_backend(prefix="bench-updates-")
+
+from fastapi.testclient import TestClient
+
+import crud, schemas
+from main import app
+
+
+def legacy_update_expense(db, expense_id, expense):
+    db_expense = crud.get_expense(db, expense_id)
+    if db_expense:
+        for field, value in expense.model_dump(exclude_unset=True, exclude={"version"}).items():
+            setattr(db_expense, field, value)
+        db_expense.fingerprint = crud.fingerprint_for(db_expense)
+        db.commit()
+        db.refresh(db_expense)
+    return db_expense
+
+
+def run(client, threads, edits, hot_rows, versioned):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def editor():
+        for _ in range(edits):
+            expense_id = random.randint(1, hot_rows)
+            body = {
+                "amount": round(random.uniform(1, 300), 2),
+                "date": "2025-06-01",
+                "user_id": 1,
+                "category_id": random.randint(1, 10),
+                "description": "edited"
+            }
+            if versioned:
+                body["version"] = client.get(f"/api/expenses/{expense_id}").json()["version"]
+            start = time.perf_counter()
+            response = client.put(f"/api/expenses/{expense_id}", json=body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    workers = [threading.Thread(target=editor) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    p50, p99 = harness.p50_p99(latencies)
+    return p50 * 1000, p99 * 1000, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--edits", type=int, default=100)
+    parser.add_argument("--hot-rows", type=int, default=20)
+    parser.add_argument("--versioned", action="store_true")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        for _ in range(args.hot_rows):
+            client.post("/api/expenses", json={
+                "amount": 10, "date": date(2025, 6, 1).isoformat(), "user_id": 1, "category_id": 1
+            })
+
+        table = harness.Table(("path", 18, ""), ("p50 ms", 9, ".2f"), ("p99 ms", 9, ".2f"))
+        p50, p99, statuses = run(client, args.threads, args.edits, args.hot_rows, args.versioned)
+        table.row("update returning", p50, p99, note=str(statuses))
+
+        current = crud.update_expense
+        crud.update_expense = crud.serialized_write(legacy_update_expense)
+        try:
+            p50, p99, statuses = run(client, args.threads, args.edits, args.hot_rows, False)
+        finally:
+            crud.update_expense = current
+        table.row("legacy", p50, p99, note=str(statuses))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Queries, bytes and time to load the dashboard: separate calls vs /api/dashboard.
+
+Usage (from backend/):
+    python benchmarks/dashboard_bootstrap.py --rows 20000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import harness
+
+harness.use_backend(prefix="bench-dashboard-")
+
+import crud, schemas
+from database import SessionLocal, engine
+from main import app
+
+SEPARATE_CALLS = [
+    "/api/summary/current-month",
+    "/api/expenses?limit=5",
+    "/api/users",
+    "/api/categories",
+    "/api/forecast/current-month",
+]
+
+
+def seed(rows):
+    db = SessionLocal()
+    users = [crud.create_user(db, schemas.UserCreate(name=f"User {i}")).id for i in range(4)]
+    categories = [category.id for category in crud.get_categories(db)]
+    crud.create_expenses(db, [
+        schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2),
+            description=f"Expense {i}",
+            date=date.today() - timedelta(days=random.randint(0, 700)),
+            user_id=random.choice(users),
+            category_id=random.choice(categories)
+        )
+        for i in range(rows)
+    ])
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    with TestClient(app) as client:
+        seed(args.rows)
+        table = harness.Table(("load", 10, ""), ("requests", 10, "d"), ("queries", 9, "d"),
+                              ("bytes", 8, "d"), ("ms", 8, ".1f"))
+        for label, paths in (("separate", SEPARATE_CALLS), ("dashboard", ["/api/dashboard"])):
+            for path in paths:
+                client.get(path)  # warm the forecast cache and connection pool
+
+            def load():
+                statements[0] = 0
+                return sum(len(client.get(path).content) for path in paths)
+
+            size, elapsed = harness.best_of(load, args.repeat)
+            table.row(label, len(paths), statements[0], size, elapsed * 1000)
+
+
+if __name__ == "__main__":
+    main()
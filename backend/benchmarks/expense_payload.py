@@ -0,0 +1,72 @@
+"""Payload size and serialization time of /api/expenses, full vs compact format.
+
+Usage (from backend/):
+    python benchmarks/expense_payload.py --rows 20000 --limit 1000 5000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+import harness
+
+harness.use_backend(prefix="bench-payload-")
+
+import crud, models, schemas
+from database import SessionLocal, engine
+
+
+def seed(rows):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    crud.create_default_categories(db)
+    users = [crud.create_user(db, schemas.UserCreate(name=f"User {i}")) for i in range(4)]
+    categories = crud.get_categories(db)
+    crud.create_expenses(db, [
+        schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2),
+            description=f"Expense {i}",
+            date=date(2024, 1, 1) + timedelta(days=random.randint(0, 700)),
+            user_id=random.choice(users).id,
+            category_id=random.choice(categories).id
+        )
+        for i in range(rows)
+    ])
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--limit", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+    seed(args.rows)
+
+    full_adapter = TypeAdapter(List[schemas.Expense])
+    table = harness.Table(("limit", 6, "d"), ("full bytes", 12, "d"), ("compact bytes", 15, "d"),
+                          ("ratio", 7, ".2f"), ("full ms", 9, ".1f"), ("compact ms", 12, ".1f"))
+    for limit in args.limit:
+        def full():
+            db = SessionLocal()
+            try:
+                return full_adapter.dump_json(crud.get_expenses(db, limit=limit))
+            finally:
+                db.close()
+
+        def compact():
+            db = SessionLocal()
+            try:
+                return crud.get_expenses_compact(db, limit=limit).model_dump_json().encode()
+            finally:
+                db.close()
+
+        full_body, full_time = harness.best_of(full)
+        compact_body, compact_time = harness.best_of(compact)
+        table.row(limit, len(full_body), len(compact_body), len(compact_body) / len(full_body),
+                  full_time * 1000, compact_time * 1000)
+
+
+if __name__ == "__main__":
+    main()
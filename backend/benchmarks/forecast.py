@@ -0,0 +1,85 @@
+"""Time the spending forecast for a household with years of history.
+
+Reports the vectorized fit alone, a cold forecast (history queries + fit) and
+a cached one, for increasing numbers of categories.
+
+Usage (from backend/):
+    python benchmarks/forecast.py --years 5 --categories 10 50 200
+"""
+import argparse
+import random
+from datetime import date
+
+import numpy as np
+
+import harness
+
+harness.use_backend(prefix="bench-forecast-")
+
+import crud, models, schemas
+from database import SessionLocal, engine
+from forecast import FORECAST_HISTORY_MONTHS, fit_forecasts, forecast_cache, get_spending_forecast
+
+
+def seed(first, last, years, per_month):
+    """Add categories first..last-1, each with years of monthly expenses"""
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    crud.create_default_user(db)
+    user_ids = [user.id for user in crud.get_users(db)]
+    category_ids = [crud.create_category(db, schemas.CategoryCreate(name=f"Bench {i}")).id for i in range(first, last)]
+    today = date.today()
+    current = today.year * 12 + today.month - 1
+    expenses = []
+    for index in range(current - years * 12, current + 1):
+        for category_id in category_ids:
+            for _ in range(per_month):
+                expenses.append(schemas.ExpenseCreate(
+                    amount=round(random.uniform(5, 200), 2),
+                    description="Bench",
+                    date=date(index // 12, index % 12 + 1, random.randint(1, 28)),
+                    user_id=random.choice(user_ids),
+                    category_id=category_id
+                ))
+    crud.create_expenses(db, expenses)
+    db.close()
+    return len(expenses)
+
+
+def forecast():
+    today = date.today()
+    db = SessionLocal()
+    try:
+        return get_spending_forecast(db, today.year, today.month)
+    finally:
+        db.close()
+
+
+def cold_forecast():
+    forecast_cache.forget_household(None)
+    return forecast()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--categories", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--per-month", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = harness.Table(("categories", 11, "d"), ("expenses", 10, "d"), ("fit ms", 8, ".2f"),
+                          ("cold ms", 9, ".1f"), ("cached ms", 11, ".1f"))
+    added = expenses = 0
+    for categories in sorted(args.categories):
+        expenses += seed(added, categories, args.years, args.per_month)
+        added = categories
+        history = np.random.uniform(0, 500, (categories, FORECAST_HISTORY_MONTHS))
+        _, fit = harness.best_of(lambda: fit_forecasts(history, 1), args.repeat)
+        _, cold = harness.best_of(cold_forecast, args.repeat)
+        _, cached = harness.best_of(forecast, args.repeat)
+        table.row(categories, expenses, fit * 1000, cold * 1000, cached * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Single-expense write throughput with N concurrent clients, with and without group commit.
+
+Usage (from backend/):
+    python benchmarks/group_commit.py --clients 50 --seconds 5 --window-ms 0 1 2 5
+
+Each client is a thread calling crud.create_expense in its own session, as
+concurrent requests do on uvicorn's threadpool. A window of 0 is the plain
+one-commit-per-expense path.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import harness
+
+
+def env(window_ms, coordination):
+    return {"group_commit_ms": window_ms, "write_coordination": coordination}
+
+
+def measure(workdir, window_ms, coordination, clients, seconds, results):
+    harness.use_backend(workdir, **env(window_ms, coordination))
+    import crud, schemas
+    from database import SessionLocal
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        mine = []
+        while time.monotonic() < deadline:
+            db = SessionLocal()
+            start = time.perf_counter()
+            try:
+                crud.create_expense(db, schemas.ExpenseCreate(
+                    amount=round(random.uniform(1, 200), 2),
+                    description="bench",
+                    date=date(2025, 1, 1) + timedelta(days=random.randint(0, 364)),
+                    user_id=1,
+                    category_id=1
+                ))
+                mine.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((len(latencies), errors[0], *harness.p50_p99(latencies)))
+
+
+def run(window_ms, coordination, clients, seconds):
+    workdir = tempfile.mkdtemp(prefix="bench-group-commit-")
+    harness.run_in_process(harness.create_database, workdir, env(window_ms, coordination))
+    [outcome] = harness.gather(measure, [(workdir, window_ms, coordination, clients, seconds)])
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[0, 1, 2, 5])
+    parser.add_argument("--coordination", nargs="+", default=["off", "single-writer"])
+    args = parser.parse_args()
+
+    table = harness.Table(("coordination", 14, ""), ("window ms", 10, "g"), ("writes/s", 10, ".0f"),
+                          ("errors", 8, "d"), ("p50 ms", 8, ".1f"), ("p99 ms", 8, ".1f"))
+    for coordination in args.coordination:
+        for window_ms in args.window_ms:
+            writes, errors, p50, p99 = run(window_ms, coordination, args.clients, args.seconds)
+            table.row(coordination, window_ms, writes / args.seconds, errors, p50, p99)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Shared plumbing for the benchmarks in this directory.
+
+The backend's modules read their configuration (database path, WRITE_COORDINATION,
+GROUP_COMMIT_MS, ...) when they are imported, so a benchmark that compares
+configurations runs each one in a fresh spawned interpreter: the child calls
+use_backend() before importing anything from the backend.
+"""
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_spawn = multiprocessing.get_context("spawn")
+
+
+def use_backend(workdir=None, prefix="bench-", **env):
+    """Point this interpreter at a benchmark directory and the backend sources.
+
+    Keyword arguments are exported as upper-cased environment variables, e.g.
+    use_backend(workdir, write_coordination="single-writer"). Returns the
+    directory, a new temporary one when workdir is None.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix=prefix)
+    os.chdir(workdir)
+    for name, value in env.items():
+        os.environ[name.upper()] = str(value)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    return workdir
+
+
+def create_database(workdir=None, env=None):
+    """Create main's tables with the default categories and user, in workdir or the current directory"""
+    use_backend(workdir or os.getcwd(), **(env or {}))
+    import crud, models
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        crud.create_default_categories(db)
+        crud.create_default_user(db)
+    finally:
+        db.close()
+
+
+def queue():
+    return _spawn.Queue()
+
+
+def spawn(target, *args, daemon=False):
+    """Start target(*args) in a fresh interpreter"""
+    process = _spawn.Process(target=target, args=args, daemon=daemon)
+    process.start()
+    return process
+
+
+def run_in_process(target, *args):
+    spawn(target, *args).join()
+
+
+def gather(target, args_list):
+    """Run target(*args, results) in one process per args and collect what each puts on results"""
+    results = queue()
+    processes = [spawn(target, *args, results) for args in args_list]
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return outcomes
+
+
+def best_of(func, repeat=5):
+    """(last result, fastest wall time in seconds) over repeat calls"""
+    best = result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def p50_p99(samples):
+    if not samples:
+        return 0, 0
+    p99 = statistics.quantiles(samples, n=100)[98] if len(samples) > 1 else samples[0]
+    return statistics.median(samples), p99
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(workdir, port, env):
+    use_backend(workdir, **env)
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(workdir, **env):
+    """Serve main.app under uvicorn in its own process; returns (base_url, process) once healthy"""
+    import httpx
+    port = free_port()
+    server = spawn(_serve, workdir, port, env, daemon=True)
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(f"{base_url}/health")
+            return base_url, server
+        except httpx.TransportError:
+            if not server.is_alive():
+                raise SystemExit("API server failed to start")
+            time.sleep(0.2)
+
+
+class Table:
+    """Fixed-width results table; columns are (title, width, format spec)"""
+
+    def __init__(self, *columns):
+        self.columns = columns
+        print("".join(f"{title:<{width}}" if i == 0 else f"{title:>{width}}"
+                      for i, (title, width, _) in enumerate(columns)))
+
+    def row(self, *values, note=""):
+        cells = []
+        for i, ((_, width, spec), value) in enumerate(zip(self.columns, values)):
+            text = format(value, spec) if value != "" else ""
+            cells.append(f"{text:<{width}}" if i == 0 else f"{text:>{width}}")
+        print("".join(cells) + (f"  {note}" if note else ""))
@@ -0,0 +1,51 @@
+"""Latency of POST /api/expenses without a key, with fresh Idempotency-Keys, and for replays.
+
+Usage (from backend/):
+    python benchmarks/idempotency_overhead.py --requests 500
+"""
+import argparse
+import time
+import uuid
+
+import harness
+
+harness.use_backend(prefix="bench-idempotency-")
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+EXPENSE = {"date": "2025-01-15", "amount": 12.5, "description": "Bench", "user_id": 1, "category_id": 1}
+
+
+def latencies(client, requests, key_for):
+    samples = []
+    for i in range(requests):
+        key = key_for(i)
+        headers = {"Idempotency-Key": key} if key else {}
+        start = time.perf_counter()
+        response = client.post("/api/expenses", json=EXPENSE, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        latencies(client, 20, lambda i: None)  # warm up
+        replay_key = str(uuid.uuid4())
+        table = harness.Table(("mode", 12, ""), ("p50 ms", 9, ".2f"), ("p99 ms", 9, ".2f"))
+        for label, key_for in (
+            ("no key", lambda i: None),
+            ("fresh key", lambda i: str(uuid.uuid4())),
+            ("replay", lambda i: replay_key),
+        ):
+            table.row(label, *harness.p50_p99(latencies(client, args.requests, key_for)))
+
+
+if __name__ == "__main__":
+    main()
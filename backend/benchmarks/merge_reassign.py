@@ -0,0 +1,66 @@
+"""Time crud.merge_categories and crud.merge_users on large expense sets.
+
+Half the expenses are archived first, so both tiers and the rolled-up totals
+are moved. Each merge runs once: it empties its source.
+
+Usage (from backend/):
+    python benchmarks/merge_reassign.py --rows 100000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import harness
+
+harness.use_backend(prefix="bench-merge-")
+
+import crud, models, schemas
+from database import SessionLocal, engine
+
+
+def seed(rows):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    crud.create_default_categories(db)
+    users = [crud.create_user(db, schemas.UserCreate(name=f"User {i}")).id for i in range(2)]
+    categories = [crud.create_category(db, schemas.CategoryCreate(name=f"Bench {i}")).id for i in range(2)]
+    crud.create_expenses(db, [
+        schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2),
+            description=f"Expense {i}",
+            date=date(2022, 1, 1) + timedelta(days=random.randint(0, 1000)),
+            user_id=users[i % 2],
+            category_id=categories[i % 2]
+        )
+        for i in range(rows)
+    ])
+    crud.archive_expenses(db, date(2023, 5, 1))
+    db.close()
+    return users, categories
+
+
+def merge(func, source, target):
+    db = SessionLocal()
+    try:
+        return func(db, source, target)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    users, categories = seed(args.rows)
+
+    table = harness.Table(("operation", 18, ""), ("moved", 9, "d"), ("seconds", 9, ".2f"))
+    for label, func, (source, target) in (
+        ("merge_categories", crud.merge_categories, categories),
+        ("merge_users", crud.merge_users, users),
+    ):
+        moved, elapsed = harness.best_of(lambda: merge(func, source, target), repeat=1)
+        table.row(label, moved, elapsed)
+
+
+if __name__ == "__main__":
+    main()
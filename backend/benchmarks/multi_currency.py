@@ -0,0 +1,78 @@
+"""Monthly summary latency with every expense in the reporting currency vs a mix of currencies.
+
+The mixed run converts each foreign-currency row inside the aggregate with a
+correlated lookup into exchange_rates.
+
+Usage (from backend/):
+    python benchmarks/multi_currency.py --rows 50000 --foreign-share 0.5
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import harness
+
+harness.use_backend(prefix="bench-currency-")
+
+import crud, models, schemas
+from currency import REPORTING_CURRENCY
+from database import SessionLocal, engine
+
+FOREIGN_CURRENCIES = ["EUR", "GBP", "JPY", "CAD"]
+MONTH = date(2025, 6, 1)
+
+
+def seed(rows, foreign_share):
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    crud.create_default_categories(db)
+    crud.create_default_user(db)
+    users = [crud.create_user(db, schemas.UserCreate(name=f"User {i}")).id for i in range(3)]
+    categories = [category.id for category in crud.get_categories(db)]
+    # A daily rate per currency for the two years before the month
+    crud.upsert_exchange_rates(db, [
+        schemas.ExchangeRateBase(currency=currency, rate_date=MONTH - timedelta(days=day),
+                                 rate=round(random.uniform(0.5, 1.5), 4))
+        for currency in FOREIGN_CURRENCIES for day in range(730)
+    ])
+    crud.create_expenses(db, [
+        schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2),
+            description=f"Expense {i}",
+            date=MONTH + timedelta(days=random.randint(0, 29)),
+            user_id=random.choice(users),
+            category_id=random.choice(categories),
+            currency=random.choice(FOREIGN_CURRENCIES) if random.random() < foreign_share else REPORTING_CURRENCY
+        )
+        for i in range(rows)
+    ])
+    db.close()
+
+
+def summary():
+    db = SessionLocal()
+    try:
+        return crud.get_monthly_summary(db, MONTH.year, MONTH.month)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--foreign-share", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = harness.Table(("data", 8, ""), ("rows", 8, "d"), ("summary ms", 12, ".1f"))
+    baseline = None
+    for label, share in (("single", 0.0), ("mixed", args.foreign_share)):
+        seed(args.rows, share)
+        _, elapsed = harness.best_of(summary, args.repeat)
+        baseline = baseline or elapsed
+        table.row(label, args.rows, elapsed * 1000, note=f"({elapsed / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Server CPU for keeping N dashboards current: pushed deltas vs re-fetching the summary.
+
+Usage (from backend/):
+    python benchmarks/summary_stream.py --clients 500 --writes 5 --rows 5000
+
+Push: N subscribers on the broadcaster, each draining its queue in its own task,
+while expenses are written. Poll: every client re-fetches the current-month
+summary once per write, which is what a refresh-on-change dashboard costs.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date
+
+import harness
+
+harness.use_backend(prefix="bench-stream-")
+
+import crud, schemas
+from database import SessionLocal
+from live_summary import broadcaster
+
+
+def seed(rows):
+    harness.create_database()
+    db = SessionLocal()
+    today = date.today()
+    crud.create_expenses(db, [
+        schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2),
+            date=today.replace(day=random.randint(1, today.day)),
+            user_id=1,
+            category_id=random.randint(1, 10)
+        )
+        for _ in range(rows)
+    ])
+    db.close()
+
+
+def write_expense():
+    db = SessionLocal()
+    try:
+        crud.create_expense(db, schemas.ExpenseCreate(
+            amount=round(random.uniform(1, 300), 2), date=date.today(),
+            user_id=1, category_id=random.randint(1, 10)
+        ))
+    finally:
+        db.close()
+
+
+async def push(clients, writes):
+    broadcaster.bind_loop(asyncio.get_running_loop())
+    crud.expense_listeners.append(broadcaster)
+    received = [0]
+
+    async def dashboard(queue):
+        while True:
+            await queue.get()
+            received[0] += 1
+
+    queues = [broadcaster.subscribe() for _ in range(clients)]
+    tasks = [asyncio.create_task(dashboard(queue)) for queue in queues]
+    loop = asyncio.get_running_loop()
+
+    start = time.process_time()
+    for _ in range(writes):
+        await loop.run_in_executor(None, write_expense)
+    while received[0] < clients * writes:
+        await asyncio.sleep(0.01)
+    elapsed = time.process_time() - start
+
+    for task in tasks:
+        task.cancel()
+    crud.expense_listeners.remove(broadcaster)
+    return elapsed
+
+
+def poll(clients, writes):
+    today = date.today()
+    start = time.process_time()
+    for _ in range(writes):
+        write_expense()
+        for _ in range(clients):
+            db = SessionLocal()
+            try:
+                crud.get_monthly_summary(db, today.year, today.month).model_dump_json()
+            finally:
+                db.close()
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--writes", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    seed(args.rows)
+
+    push_cpu = asyncio.run(push(args.clients, args.writes))
+    poll_cpu = poll(args.clients, args.writes)
+    print(f"{args.clients} dashboards, {args.writes} writes, {args.rows} expenses this month")
+    print(f"push deltas: {push_cpu:8.3f}s CPU ({push_cpu / args.writes * 1000:.2f} ms per write)")
+    print(f"re-fetch:    {poll_cpu:8.3f}s CPU ({poll_cpu / args.writes * 1000:.2f} ms per write)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Write throughput vs number of household databases in multi-tenant mode.
+
+Usage (from backend/):
+    python benchmarks/tenant_scaling.py --workers 8 --tenants 1 2 4 8 --seconds 3
+
+Each worker process writes single expenses through crud into household
+"h<worker % tenants>". With one tenant all workers share one SQLite writer
+lock; with one tenant per worker they don't contend at all.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import date
+
+import harness
+
+
+def worker(workdir, household, seconds, results):
+    harness.use_backend(workdir, multi_tenant="on")
+    import crud, schemas
+    from tenants import tenant_session
+
+    writes = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        db = tenant_session(household)
+        try:
+            crud.create_expense(db, schemas.ExpenseCreate(
+                amount=round(random.uniform(1, 200), 2), date=date(2025, 1, 1),
+                user_id=1, category_id=1
+            ))
+            writes += 1
+        except Exception:
+            errors += 1
+        finally:
+            db.close()
+    results.put((writes, errors))
+
+
+def run(workers, tenants, seconds):
+    workdir = tempfile.mkdtemp(prefix="bench-tenants-")
+    outcomes = harness.gather(worker, [(workdir, f"h{i % tenants}", seconds) for i in range(workers)])
+    return [sum(column) for column in zip(*outcomes)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    table = harness.Table(("tenants", 8, "d"), ("writes/s", 10, ".0f"), ("errors", 8, "d"))
+    for tenants in args.tenants:
+        writes, errors = run(args.workers, tenants, args.seconds)
+        table.row(tenants, writes / args.seconds, errors)
+
+
+if __name__ == "__main__":
+    main()
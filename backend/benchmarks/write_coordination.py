@@ -0,0 +1,73 @@
+"""Read/write throughput of crud against one SQLite file with N worker processes.
+
+Usage (from backend/):
+    python benchmarks/write_coordination.py --workers 1 2 4 8 --seconds 5
+
+Each worker mimics a uvicorn worker: its own engine and sessions, a mix of
+expense list reads and single-expense writes. Runs once with
+WRITE_COORDINATION=off and once with single-writer.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import harness
+
+
+def worker(workdir, mode, seconds, write_ratio, results):
+    harness.use_backend(workdir, write_coordination=mode)
+    import crud, schemas
+    from database import SessionLocal
+
+    reads = writes = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        db = SessionLocal()
+        try:
+            if random.random() < write_ratio:
+                crud.create_expense(db, schemas.ExpenseCreate(
+                    amount=round(random.uniform(1, 200), 2),
+                    description="bench",
+                    date=date(2025, 1, 1) + timedelta(days=random.randint(0, 364)),
+                    user_id=1,
+                    category_id=1
+                ))
+                writes += 1
+            else:
+                crud.get_expenses(db, limit=50)
+                reads += 1
+        except Exception:
+            errors += 1
+        finally:
+            db.close()
+    results.put((reads, writes, errors))
+
+
+def run(mode, workers, seconds, write_ratio):
+    # A fresh database and fresh interpreters per run, so module-level engines
+    # pick up this run's directory and WRITE_COORDINATION
+    workdir = tempfile.mkdtemp(prefix="bench-writers-")
+    harness.run_in_process(harness.create_database, workdir, {"write_coordination": mode})
+    outcomes = harness.gather(worker, [(workdir, mode, seconds, write_ratio)] * workers)
+    return [sum(column) for column in zip(*outcomes)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    table = harness.Table(("mode", 14, ""), ("workers", 8, "d"), ("reads/s", 10, ".0f"),
+                          ("writes/s", 10, ".0f"), ("errors", 8, "d"))
+    for mode in ("off", "single-writer"):
+        for workers in args.workers:
+            reads, writes, errors = run(mode, workers, args.seconds, args.write_ratio)
+            table.row(mode, workers, reads / args.seconds, writes / args.seconds, errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
-from datetime import datetime, date
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, extract, and_, literal, not_, select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta, timezone
 import models, schemas
-from typing import List, Optional
+from currency import REPORTING_CURRENCY, convert_amount, reporting_amount, unconverted, unconverted_summary
+from database import GROUP_COMMIT_MS, group_committer_for, serialized_write, sqlite_functions
+from typing import Iterator, List, Optional, Union
+import hashlib
+import heapq
+from types import SimpleNamespace
+
+class VersionConflict(Exception):
+    """The row exists but its version no longer matches the one the client expected"""
+
+class ArchivedExpenseError(Exception):
+    """The expense was moved to the archive tier, which is read-only"""
 
 # User CRUD operations
+@serialized_write
 def create_user(db: Session, user: schemas.UserCreate):
     db_user = models.User(name=user.name, color=user.color)
     db.add(db_user)
@@ -12,12 +25,14 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+def get_users(db: Session, skip: int = 0, limit: Optional[int] = 100):
+    """limit=None returns every row"""
     return db.query(models.User).offset(skip).limit(limit).all()
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+@serialized_write
 def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     db_user = get_user(db, user_id)
     if db_user:
@@ -28,14 +43,25 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
         db.refresh(db_user)
     return db_user
 
-def delete_user(db: Session, user_id: int):
+@serialized_write
+def delete_user(db: Session, user_id: int, reassign_to: Optional[int] = None):
+    """Delete a user, first moving their expenses to reassign_to.
+
+    Raises InUse if the user still has expenses and no reassign_to is given.
+    """
     db_user = get_user(db, user_id)
     if db_user:
+        if reassign_to is not None:
+            merge_users(db, user_id, reassign_to)
+            return db_user
+        if has_expenses(db, "user_id", user_id):
+            raise InUse()
         db.delete(db_user)
         db.commit()
     return db_user
 
 # Category CRUD operations
+@serialized_write
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.model_dump())
     db.add(db_category)
@@ -43,7 +69,8 @@ def create_category(db: Session, category: schemas.CategoryCreate):
     db.refresh(db_category)
     return db_category
 
-def get_categories(db: Session, skip: int = 0, limit: int = 100):
+def get_categories(db: Session, skip: int = 0, limit: Optional[int] = 100):
+    """limit=None returns every row"""
     return db.query(models.Category).offset(skip).limit(limit).all()
 
 def get_category(db: Session, category_id: int):
@@ -52,6 +79,7 @@ def get_category(db: Session, category_id: int):
 def get_category_by_name(db: Session, name: str):
     return db.query(models.Category).filter(models.Category.name == name).first()
 
+@serialized_write
 def update_category(db: Session, category_id: int, category: schemas.CategoryCreate):
     db_category = get_category(db, category_id)
     if db_category:
@@ -62,89 +90,478 @@ def update_category(db: Session, category_id: int, category: schemas.CategoryCre
         db.refresh(db_category)
     return db_category
 
-def delete_category(db: Session, category_id: int):
+@serialized_write
+def delete_category(db: Session, category_id: int, reassign_to: Optional[int] = None):
+    """Delete a category, first moving its expenses to reassign_to.
+
+    Raises InUse if the category still has expenses and no reassign_to is given.
+    """
     db_category = get_category(db, category_id)
     if db_category:
+        if reassign_to is not None:
+            merge_categories(db, category_id, reassign_to)
+            return db_category
+        if has_expenses(db, "category_id", category_id):
+            raise InUse()
         db.delete(db_category)
         db.commit()
     return db_category
 
 # Expense CRUD operations
+
+# Objects with on_expense_change(household, before, after), called with expense_snapshot
+# dicts after each committed expense write, and wants(household), whether they need
+# those snapshots right now. (None, None) means many expenses changed at once, or that
+# a single write's before state wasn't captured. household is the session's
+# info["household"], None outside multi-tenant mode.
+expense_listeners: list = []
+
+def wants_expense_snapshots(db: Session) -> bool:
+    """Whether a listener needs snapshots of this session's household's writes.
+
+    Snapshots cost extra reads, so writes nobody is listening to skip them.
+    """
+    household = db.info.get("household")
+    return any(listener.wants(household) for listener in expense_listeners)
+
+def expense_snapshot(db: Session, db_expense: models.Expense) -> dict:
+    """The summary-relevant fields of an expense, with the amount in the reporting currency.
+
+    db_expense's user and category should already be loaded (see get_expense),
+    so taking a snapshot doesn't cost a query per relation. "expense" is the row
+    as the dashboard lists it, in its own currency.
+    """
+    return {
+        "id": db_expense.id,
+        "expense": {
+            "id": db_expense.id,
+            "date": db_expense.date,
+            "amount": db_expense.amount,
+            "description": db_expense.description,
+            "user_id": db_expense.user_id,
+            "category_id": db_expense.category_id,
+            "currency": db_expense.currency
+        },
+        "date": db_expense.date,
+        # None when the currency has no exchange rates yet
+        "amount": convert_amount(db, models.ExchangeRate, db_expense.amount, db_expense.currency, db_expense.date),
+        "user_id": db_expense.user_id,
+        "user_name": db_expense.user.name if db_expense.user else None,
+        "user_color": db_expense.user.color if db_expense.user else None,
+        "category_id": db_expense.category_id,
+        "category_name": db_expense.category.name if db_expense.category else None,
+        "category_color": db_expense.category.color if db_expense.category else None
+    }
+
+def row_snapshot(db: Session, row) -> dict:
+    """expense_snapshot of a row returned by an UPDATE or DELETE, with its user and category in one query"""
+    user, category = db.query(models.User, models.Category).join(
+        models.Category, models.Category.id == row.category_id
+    ).filter(models.User.id == row.user_id).first() or (None, None)
+    return expense_snapshot(db, SimpleNamespace(**row._mapping, user=user, category=category))
+
+def notify_expense_change(db: Session, before: Optional[dict], after: Optional[dict]):
+    household = db.info.get("household")
+    for listener in expense_listeners:
+        listener.on_expense_change(household, before, after)
+
+def notify_single_write(db: Session, captured: bool, before: Optional[dict], after: Optional[dict]):
+    """After a committed update or delete: the change itself if its before state was captured.
+
+    A listener that only started wanting snapshots during the write gets a
+    resync instead, as there is no before state to take off its totals.
+    """
+    if captured:
+        notify_expense_change(db, before, after)
+    elif wants_expense_snapshots(db):
+        notify_expense_change(db, None, None)
+
+def expense_fingerprint(expense_date: date, amount: float, user_key: Union[int, str],
+                        category_key: Union[int, str], description: Optional[str],
+                        currency: Optional[str] = None) -> str:
+    """Stable hash of an expense's normalized fields, used to detect duplicates"""
+    normalized_description = " ".join((description or "").lower().split())
+    raw = f"{expense_date.isoformat()}|{amount:.2f}|{user_key}|{category_key}|{normalized_description}"
+    # Only foreign currencies are hashed, so fingerprints stored before currencies existed still match
+    if currency and currency != REPORTING_CURRENCY:
+        raw += f"|{currency}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def fingerprint_for(db_expense: models.Expense) -> str:
+    return expense_fingerprint(db_expense.date, db_expense.amount, db_expense.user_id,
+                               db_expense.category_id, db_expense.description, db_expense.currency)
+
+# Fingerprinted fields, in expense_fingerprint's argument order
+FINGERPRINT_FIELDS = ("date", "amount", "user_id", "category_id", "description", "currency")
+
+sqlite_functions["expense_fingerprint"] = (
+    len(FINGERPRINT_FIELDS),
+    lambda expense_date, *fields: expense_fingerprint(date.fromisoformat(expense_date), *fields)
+)
+
+def fingerprint_expression(model, values: dict):
+    """The fingerprint of a row of model once values are applied, for use in an UPDATE.
+
+    Fields missing from values are read from the row by the SQL function
+    expense_fingerprint; inside an UPDATE those columns still hold the
+    current values. When values has every field it is hashed here instead.
+    """
+    if all(field in values for field in FINGERPRINT_FIELDS):
+        return expense_fingerprint(*(values[field] for field in FINGERPRINT_FIELDS))
+    return func.expense_fingerprint(*(
+        literal(values[field], getattr(model, field).type) if field in values else getattr(model, field)
+        for field in FINGERPRINT_FIELDS
+    ))
+
 def create_expense(db: Session, expense: schemas.ExpenseCreate):
+    """Insert one expense, sharing a commit with concurrent inserts when GROUP_COMMIT_MS is set.
+
+    A session with pending changes of its own takes the plain path, which
+    commits them together with the expense.
+    """
+    if GROUP_COMMIT_MS and not (db.new or db.dirty or db.deleted):
+        values = expense.model_dump()
+        values["fingerprint"] = expense_fingerprint(
+            expense.date, expense.amount, expense.user_id, expense.category_id, expense.description,
+            expense.currency
+        )
+        # The row is committed on another connection; end any read snapshot so the read-back sees it
+        if db.in_transaction():
+            db.rollback()
+        expense_id = group_committer_for(db.get_bind()).insert(models.Expense.__table__, values)
+        db_expense = get_expense(db, expense_id)
+        if db_expense is None:
+            raise RuntimeError(f"Expense {expense_id} was committed but could not be read back")
+    else:
+        db_expense = insert_expense(db, expense)
+    if wants_expense_snapshots(db):
+        notify_expense_change(db, None, expense_snapshot(db, db_expense))
+    return db_expense
+
+@serialized_write
+def insert_expense(db: Session, expense: schemas.ExpenseCreate):
     db_expense = models.Expense(**expense.model_dump())
+    db_expense.fingerprint = fingerprint_for(db_expense)
     db.add(db_expense)
     db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    # Reloads the expired row with its user and category, in place of a refresh
+    return get_expense(db, db_expense.id)
 
-def get_expenses(db: Session, skip: int = 0, limit: int = 100, 
-                user_id: Optional[int] = None, category_id: Optional[int] = None,
-                start_date: Optional[date] = None, end_date: Optional[date] = None):
-    query = db.query(models.Expense)
-    
+@serialized_write
+def create_expenses(db: Session, expenses: List[schemas.ExpenseCreate]) -> int:
+    """Insert many expenses in a single transaction"""
+    db_expenses = []
+    for expense in expenses:
+        db_expense = models.Expense(**expense.model_dump())
+        db_expense.fingerprint = fingerprint_for(db_expense)
+        db_expenses.append(db_expense)
+    db.add_all(db_expenses)
+    db.commit()
+    if db_expenses:
+        notify_expense_change(db, None, None)
+    return len(db_expenses)
+
+def get_existing_fingerprints(db: Session, fingerprints, batch_size: int = 500) -> set:
+    """The given fingerprints that are already stored, in the hot or archive tier.
+
+    Looked up through the fingerprint indexes in chunks, which keeps each IN list
+    under SQLite's bound-parameter limit.
+    """
+    candidates = list(set(fingerprints))
+    existing = set()
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        for model in (models.Expense, models.ArchivedExpense):
+            rows = db.query(model.fingerprint).filter(model.fingerprint.in_(batch))
+            existing.update(fingerprint for (fingerprint,) in rows)
+    return existing
+
+@serialized_write
+def backfill_expense_fingerprints(db: Session, batch_size: int = 1000):
+    """Fill in fingerprints for expenses stored before the column existed"""
+    while True:
+        batch = db.query(models.Expense).filter(
+            models.Expense.fingerprint.is_(None)
+        ).limit(batch_size).all()
+        if not batch:
+            break
+        for db_expense in batch:
+            db_expense.fingerprint = fingerprint_for(db_expense)
+        db.commit()
+
+def filter_expenses(query, user_id: Optional[int] = None, category_id: Optional[int] = None,
+                    start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    model=models.Expense):
     if user_id:
-        query = query.filter(models.Expense.user_id == user_id)
+        query = query.filter(model.user_id == user_id)
     if category_id:
-        query = query.filter(models.Expense.category_id == category_id)
+        query = query.filter(model.category_id == category_id)
     if start_date:
-        query = query.filter(models.Expense.date >= start_date)
+        query = query.filter(model.date >= start_date)
     if end_date:
-        query = query.filter(models.Expense.date <= end_date)
-        
-    return query.order_by(models.Expense.date.desc()).offset(skip).limit(limit).all()
+        query = query.filter(model.date <= end_date)
+    return query
 
-def get_expense(db: Session, expense_id: int):
-    return db.query(models.Expense).filter(models.Expense.id == expense_id).first()
+def get_archive_boundary(db: Session) -> Optional[date]:
+    """Latest date held in the archive tier, or None if nothing is archived"""
+    return db.query(func.max(models.ArchivedExpense.date)).scalar()
 
-def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate):
-    db_expense = get_expense(db, expense_id)
-    if db_expense:
-        update_data = expense.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_expense, field, value)
-        db.commit()
-        db.refresh(db_expense)
-    return db_expense
+def reaches_archive(db: Session, start_date: Optional[date]) -> bool:
+    boundary = get_archive_boundary(db)
+    return boundary is not None and (start_date is None or start_date <= boundary)
 
-def delete_expense(db: Session, expense_id: int):
-    db_expense = get_expense(db, expense_id)
-    if db_expense:
-        db.delete(db_expense)
-        db.commit()
+def merge_tiers(hot_rows: list, archived_rows: list, skip: int, limit: int, date_of) -> list:
+    """Merge two date-descending result lists and apply the page window"""
+    merged = sorted(hot_rows + archived_rows, key=date_of, reverse=True)
+    return merged[skip:skip + limit]
+
+def get_expenses(db: Session, skip: int = 0, limit: int = 100, 
+                user_id: Optional[int] = None, category_id: Optional[int] = None,
+                start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = filter_expenses(db.query(models.Expense), user_id, category_id, start_date, end_date)
+    if not reaches_archive(db, start_date):
+        return query.order_by(models.Expense.date.desc()).offset(skip).limit(limit).all()
+    
+    # Each tier can contribute at most skip + limit rows to the requested page
+    hot_rows = query.order_by(models.Expense.date.desc()).limit(skip + limit).all()
+    archived_rows = filter_expenses(
+        db.query(models.ArchivedExpense), user_id, category_id, start_date, end_date,
+        model=models.ArchivedExpense
+    ).order_by(models.ArchivedExpense.date.desc()).limit(skip + limit).all()
+    return merge_tiers(hot_rows, archived_rows, skip, limit, lambda expense: expense.date)
+
+def get_expense_rows(db: Session, skip: int = 0, limit: int = 100,
+                     user_id: Optional[int] = None, category_id: Optional[int] = None,
+                     start_date: Optional[date] = None, end_date: Optional[date] = None) -> list:
+    """Same page as get_expenses, as (id, date, amount, user_id, category_id, description, currency) rows"""
+    def column_query(model):
+        return filter_expenses(
+            db.query(model.id, model.date, model.amount, model.user_id, model.category_id, model.description,
+                     model.currency),
+            user_id, category_id, start_date, end_date, model=model
+        ).order_by(model.date.desc())
+    
+    if reaches_archive(db, start_date):
+        return merge_tiers(
+            column_query(models.Expense).limit(skip + limit).all(),
+            column_query(models.ArchivedExpense).limit(skip + limit).all(),
+            skip, limit, lambda row: row.date
+        )
+    return column_query(models.Expense).offset(skip).limit(limit).all()
+
+def get_expenses_compact(db: Session, skip: int = 0, limit: int = 100,
+                         user_id: Optional[int] = None, category_id: Optional[int] = None,
+                         start_date: Optional[date] = None, end_date: Optional[date] = None) -> schemas.CompactExpenseList:
+    """Same page as get_expenses, as column arrays with deduplicated users and categories"""
+    rows = get_expense_rows(db, skip, limit, user_id, category_id, start_date, end_date)
+    ids, dates, amounts, user_ids, category_ids, descriptions, currencies = (
+        [list(column) for column in zip(*rows)] if rows else ([], [], [], [], [], [], [])
+    )
+    
+    users = db.query(models.User).filter(models.User.id.in_(set(user_ids))).all() if user_ids else []
+    categories = db.query(models.Category).filter(
+        models.Category.id.in_(set(category_ids))
+    ).all() if category_ids else []
+    
+    return schemas.CompactExpenseList(
+        ids=ids,
+        dates=dates,
+        amounts=amounts,
+        user_ids=user_ids,
+        category_ids=category_ids,
+        descriptions=descriptions,
+        currencies=currencies,
+        users=users,
+        categories=categories
+    )
+
+STREAM_COLUMNS = ("id", "date", "amount", "currency", "description", "user_id", "category_id", "version")
+
+def iter_expense_rows(db: Session, user_id: Optional[int] = None, category_id: Optional[int] = None,
+                      start_date: Optional[date] = None, end_date: Optional[date] = None,
+                      batch_size: int = 1000) -> Iterator[dict]:
+    """Every matching expense, newest first, fetched from the cursor batch_size rows at a time"""
+    def rows(model):
+        return filter_expenses(
+            db.query(*(getattr(model, column) for column in STREAM_COLUMNS)),
+            user_id, category_id, start_date, end_date, model=model
+        ).order_by(model.date.desc(), model.id.desc()).yield_per(batch_size)
+    
+    if reaches_archive(db, start_date):
+        # Both tiers are already date-descending, so merging them lazily keeps the stream ordered
+        merged = heapq.merge(rows(models.Expense), rows(models.ArchivedExpense),
+                             key=lambda row: (row.date, row.id), reverse=True)
+    else:
+        merged = rows(models.Expense)
+    for row in merged:
+        yield dict(zip(STREAM_COLUMNS, row))
+
+def get_expense(db: Session, expense_id: int, include_archive: bool = False):
+    """One expense with its user and category loaded in the same query"""
+    db_expense = db.query(models.Expense).options(
+        joinedload(models.Expense.user), joinedload(models.Expense.category)
+    ).filter(models.Expense.id == expense_id).first()
+    if db_expense is None and include_archive:
+        db_expense = db.query(models.ArchivedExpense).options(
+            joinedload(models.ArchivedExpense.user), joinedload(models.ArchivedExpense.category)
+        ).filter(models.ArchivedExpense.id == expense_id).first()
     return db_expense
 
+def raise_if_version_conflict(db: Session, expense_id: int, expected_version: Optional[int]):
+    """After a guarded write matched no row, tell a stale version apart from a missing row"""
+    if expected_version is not None and db.query(models.Expense.id).filter(
+        models.Expense.id == expense_id
+    ).first() is not None:
+        raise VersionConflict(expense_id)
+
+def raise_if_archived(db: Session, expense_id: int):
+    """After a write found no hot row, tell an archived expense apart from a missing one"""
+    if db.query(models.ArchivedExpense.id).filter(models.ArchivedExpense.id == expense_id).first() is not None:
+        raise ArchivedExpenseError(expense_id)
+
+@serialized_write
+def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate) -> Optional[schemas.Expense]:
+    """Apply the update, fingerprint and version bump with one UPDATE ... RETURNING.
+
+    When expense.version is given the row is only updated if it still has that
+    version; otherwise VersionConflict is raised. Without it the last write
+    wins. The response's user and category take one more read, and the old
+    row is only read when a listener wants the change (see expense_listeners).
+    """
+    expected_version = expense.version
+    update_data = expense.model_dump(exclude_unset=True, exclude={"version"})
+    
+    conditions = [models.Expense.id == expense_id]
+    if expected_version is not None:
+        conditions.append(models.Expense.version == expected_version)
+    expenses = models.Expense.__table__
+    
+    captured = wants_expense_snapshots(db)
+    row = before = None
+    if captured:
+        # SQLite's RETURNING only sees the new values, so the old ones come from a
+        # no-op UPDATE first: it takes the write lock, so the row can't change
+        # between it and the real UPDATE
+        old = db.execute(
+            update(expenses).where(*conditions).values(version=expenses.c.version).returning(*expenses.c)
+        ).first()
+        before = row_snapshot(db, old) if old is not None else None
+    if before is not None or not captured:
+        row = db.execute(
+            update(expenses).where(*conditions)
+            .values(**update_data, fingerprint=fingerprint_expression(models.Expense, update_data),
+                    version=expenses.c.version + 1)
+            .returning(*expenses.c)
+        ).first()
+    
+    if row is None:
+        db.rollback()
+        raise_if_version_conflict(db, expense_id, expected_version)
+        raise_if_archived(db, expense_id)
+        return None
+    
+    user, category = db.query(models.User, models.Category).join(
+        models.Category, models.Category.id == row.category_id
+    ).filter(models.User.id == row.user_id).one()
+    # Build the response before commit expires the loaded user and category
+    result = schemas.Expense.model_validate({
+        **row._mapping,
+        "user": schemas.User.model_validate(user),
+        "category": schemas.Category.model_validate(category)
+    })
+    db.commit()
+    notify_single_write(db, captured, before, expense_snapshot(db, result) if captured else None)
+    return result
+
+@serialized_write
+def delete_expense(db: Session, expense_id: int, expected_version: Optional[int] = None) -> Optional[models.Expense]:
+    """Delete with one DELETE ... RETURNING statement, optionally guarded by version.
+
+    Returns the deleted expense as a transient model, or None. Listeners get
+    their before snapshot from the returned row.
+    """
+    conditions = [models.Expense.id == expense_id]
+    if expected_version is not None:
+        conditions.append(models.Expense.version == expected_version)
+    expenses = models.Expense.__table__
+    row = db.execute(delete(expenses).where(*conditions).returning(*expenses.c)).first()
+    
+    if row is None:
+        db.rollback()
+        raise_if_version_conflict(db, expense_id, expected_version)
+        raise_if_archived(db, expense_id)
+        return None
+    captured = wants_expense_snapshots(db)
+    # Read before the commit, so the user and category are those the row pointed at
+    before = row_snapshot(db, row) if captured else None
+    db.commit()
+    notify_single_write(db, captured, before, None)
+    return models.Expense(**row._mapping)
+
 # Summary and analytics operations
+def merge_group_totals(*row_sets) -> list:
+    """Combine (id, name, color, total, count) rows from several tiers by id"""
+    merged = {}
+    for rows in row_sets:
+        for group_id, name, color, total, count in rows:
+            current = merged.get(group_id)
+            if current is None:
+                merged[group_id] = [group_id, name, color, total or 0, count or 0]
+            else:
+                current[3] += total or 0
+                current[4] += count or 0
+    return list(merged.values())
+
 def get_monthly_summary(db: Session, year: int, month: int) -> schemas.MonthlySummary:
-    # Get expenses for the month
-    expenses_query = db.query(models.Expense).filter(
-        and_(
-            extract('year', models.Expense.date) == year,
-            extract('month', models.Expense.date) == month
-        )
+    month_filter = and_(
+        extract('year', models.Expense.date) == year,
+        extract('month', models.Expense.date) == month
+    )
+    archived_month_filter = and_(
+        models.ArchivedMonthlyTotal.year == year,
+        models.ArchivedMonthlyTotal.month == month
     )
     
-    expenses = expenses_query.all()
-    total_amount = sum(expense.amount for expense in expenses)
-    expense_count = len(expenses)
+    # Totals for the month in the reporting currency, from the hot table plus precomputed archive totals.
+    # Expenses in a currency without rates are left out of totals and counts, and reported separately.
+    amount = reporting_amount(models.Expense, models.ExchangeRate)
+    hot_total, hot_count = db.query(func.sum(amount), func.count(amount)).filter(month_filter).one()
+    unconverted_count, unconverted_currencies = unconverted_summary(
+        db, models.Expense, models.ExchangeRate, month_filter
+    )
+    archived_total, archived_count = db.query(
+        func.sum(models.ArchivedMonthlyTotal.total_amount),
+        func.sum(models.ArchivedMonthlyTotal.expense_count)
+    ).filter(archived_month_filter).one()
+    total_amount = (hot_total or 0) + (archived_total or 0)
+    expense_count = (hot_count or 0) + (archived_count or 0)
     daily_average = total_amount / 30 if expense_count > 0 else 0
     
     # Category summary
-    category_totals = db.query(
-        models.Category.name,
-        models.Category.color,
-        func.sum(models.Expense.amount).label('total'),
-        func.count(models.Expense.id).label('count')
-    ).join(models.Expense).filter(
-        and_(
-            extract('year', models.Expense.date) == year,
-            extract('month', models.Expense.date) == month
-        )
-    ).group_by(models.Category.id).all()
+    category_totals = merge_group_totals(
+        db.query(
+            models.Category.id,
+            models.Category.name,
+            models.Category.color,
+            func.sum(amount).label('total'),
+            func.count(amount).label('count')
+        ).join(models.Expense).filter(month_filter).group_by(models.Category.id)
+        .having(func.count(amount) > 0).all(),
+        db.query(
+            models.Category.id,
+            models.Category.name,
+            models.Category.color,
+            func.sum(models.ArchivedMonthlyTotal.total_amount),
+            func.sum(models.ArchivedMonthlyTotal.expense_count)
+        ).join(models.ArchivedMonthlyTotal, models.ArchivedMonthlyTotal.category_id == models.Category.id)
+        .filter(archived_month_filter).group_by(models.Category.id).all()
+    )
     
     categories = []
-    for cat_name, cat_color, cat_total, cat_count in category_totals:
+    for cat_id, cat_name, cat_color, cat_total, cat_count in category_totals:
         percentage = (cat_total / total_amount * 100) if total_amount > 0 else 0
         categories.append(schemas.CategorySummary(
+            category_id=cat_id,
             category_name=cat_name,
             category_color=cat_color,
             total_amount=cat_total,
@@ -153,22 +570,30 @@ def get_monthly_summary(db: Session, year: int, month: int) -> schemas.MonthlySu
         ))
     
     # User summary
-    user_totals = db.query(
-        models.User.name,
-        models.User.color,
-        func.sum(models.Expense.amount).label('total'),
-        func.count(models.Expense.id).label('count')
-    ).join(models.Expense).filter(
-        and_(
-            extract('year', models.Expense.date) == year,
-            extract('month', models.Expense.date) == month
-        )
-    ).group_by(models.User.id).all()
+    user_totals = merge_group_totals(
+        db.query(
+            models.User.id,
+            models.User.name,
+            models.User.color,
+            func.sum(amount).label('total'),
+            func.count(amount).label('count')
+        ).join(models.Expense).filter(month_filter).group_by(models.User.id)
+        .having(func.count(amount) > 0).all(),
+        db.query(
+            models.User.id,
+            models.User.name,
+            models.User.color,
+            func.sum(models.ArchivedMonthlyTotal.total_amount),
+            func.sum(models.ArchivedMonthlyTotal.expense_count)
+        ).join(models.ArchivedMonthlyTotal, models.ArchivedMonthlyTotal.user_id == models.User.id)
+        .filter(archived_month_filter).group_by(models.User.id).all()
+    )
     
     users = []
-    for user_name, user_color, user_total, user_count in user_totals:
+    for user_id, user_name, user_color, user_total, user_count in user_totals:
         percentage = (user_total / total_amount * 100) if total_amount > 0 else 0
         users.append(schemas.UserSummary(
+            user_id=user_id,
             user_name=user_name,
             user_color=user_color,
             total_amount=user_total,
@@ -183,9 +608,240 @@ def get_monthly_summary(db: Session, year: int, month: int) -> schemas.MonthlySu
         expense_count=expense_count,
         daily_average=daily_average,
         categories=categories,
-        users=users
+        users=users,
+        unconverted_count=unconverted_count,
+        unconverted_currencies=unconverted_currencies
+    )
+
+def get_monthly_history(db: Session, field: str, start: date, end: date) -> list:
+    """(year, month, owner id, total) for each month in [start, end) and each user_id or category_id.
+
+    Totals are in the reporting currency.
+    """
+    year, month = extract('year', models.Expense.date), extract('month', models.Expense.date)
+    owner = getattr(models.Expense, field)
+    hot_rows = db.query(year, month, owner, func.sum(reporting_amount(models.Expense, models.ExchangeRate))).filter(
+        models.Expense.date >= start, models.Expense.date < end
+    ).group_by(year, month, owner).all()
+    
+    totals = models.ArchivedMonthlyTotal
+    period = totals.year * 12 + totals.month
+    archived_rows = db.query(
+        totals.year, totals.month, getattr(totals, field), func.sum(totals.total_amount)
+    ).filter(
+        period >= start.year * 12 + start.month, period < end.year * 12 + end.month
+    ).group_by(totals.year, totals.month, getattr(totals, field)).all()
+    return [(int(y), int(m), owner_id, total or 0) for y, m, owner_id, total in hot_rows + archived_rows]
+
+# Archive operations
+ARCHIVED_COLUMNS = ["id", "amount", "description", "date", "created_at", "updated_at",
+                    "fingerprint", "version", "currency", "user_id", "category_id"]
+
+@serialized_write
+def archive_expenses(db: Session, before: date) -> int:
+    """Move expenses dated before the start of before's month into the archive tier.
+
+    Whole months are archived so the per-month totals stay complete. Rows are
+    copied, aggregated and deleted with set-based statements in one transaction.
+    The totals are converted to the reporting currency with the rates known now
+    and stay at those rates. Expenses in a currency without rates stay in the
+    hot tier until a rate is added, so they are never archived unconverted.
+    """
+    cutoff = before.replace(day=1)
+    old_expenses = and_(models.Expense.date < cutoff, not_(unconverted(models.Expense, models.ExchangeRate)))
+    
+    month_totals = db.query(
+        extract('year', models.Expense.date),
+        extract('month', models.Expense.date),
+        models.Expense.user_id,
+        models.Expense.category_id,
+        func.sum(reporting_amount(models.Expense, models.ExchangeRate)),
+        func.count(models.Expense.id)
+    ).filter(old_expenses).group_by(
+        extract('year', models.Expense.date),
+        extract('month', models.Expense.date),
+        models.Expense.user_id,
+        models.Expense.category_id
+    ).all()
+    if not month_totals:
+        return 0
+    
+    # Expenses backdated into an already archived month add to its existing totals
+    existing = {
+        (row.year, row.month, row.user_id, row.category_id): row
+        for row in db.query(models.ArchivedMonthlyTotal).filter(
+            models.ArchivedMonthlyTotal.year.in_({int(year) for year, *_ in month_totals})
+        )
+    }
+    for year, month, user_id, category_id, total, count in month_totals:
+        key = (int(year), int(month), user_id, category_id)
+        if key in existing:
+            existing[key].total_amount += total
+            existing[key].expense_count += count
+        else:
+            db.add(models.ArchivedMonthlyTotal(
+                year=key[0], month=key[1], user_id=user_id, category_id=category_id,
+                total_amount=total, expense_count=count
+            ))
+    
+    db.execute(insert(models.ArchivedExpense).from_select(
+        ARCHIVED_COLUMNS,
+        select(*[getattr(models.Expense, column) for column in ARCHIVED_COLUMNS]).where(old_expenses)
+    ))
+    result = db.execute(delete(models.Expense).where(old_expenses))
+    db.commit()
+    return result.rowcount
+
+# Merge operations
+class InUse(Exception):
+    """The row still has expenses; reassign them before deleting it"""
+
+def merge_expense_owner(db: Session, field: str, source_id: int, target_id: int) -> int:
+    """Move every expense and archived total from source to target; the caller commits"""
+    moved = 0
+    for model in (models.Expense, models.ArchivedExpense):
+        column = getattr(model, field)
+        # The fingerprint hashes the owner ids, so it is recomputed in the same UPDATE
+        moved += db.execute(
+            update(model).where(column == source_id).values({
+                field: target_id,
+                "version": model.version + 1,
+                "fingerprint": fingerprint_expression(model, {field: target_id})
+            }).execution_options(synchronize_session=False)
+        ).rowcount
+    
+    # Fold the source's archived month totals into the target's, matching on the other owner column
+    other = "category_id" if field == "user_id" else "user_id"
+    totals_column = getattr(models.ArchivedMonthlyTotal, field)
+    target_totals = {
+        (row.year, row.month, getattr(row, other)): row
+        for row in db.query(models.ArchivedMonthlyTotal).filter(totals_column == target_id)
+    }
+    for row in db.query(models.ArchivedMonthlyTotal).filter(totals_column == source_id).all():
+        existing = target_totals.get((row.year, row.month, getattr(row, other)))
+        if existing is not None:
+            existing.total_amount += row.total_amount
+            existing.expense_count += row.expense_count
+            db.delete(row)
+        else:
+            setattr(row, field, target_id)
+    return moved
+
+def has_expenses(db: Session, field: str, owner_id: int) -> bool:
+    return any(
+        db.query(getattr(model, field)).filter(getattr(model, field) == owner_id).first() is not None
+        for model in (models.Expense, models.ArchivedExpense)
     )
 
+@serialized_write
+def merge_users(db: Session, source_id: int, target_id: int) -> int:
+    """Reassign all of source's expenses to target in one transaction, then delete source"""
+    moved = merge_expense_owner(db, "user_id", source_id, target_id)
+    db.query(models.User).filter(models.User.id == source_id).delete()
+    db.commit()
+    if moved:
+        notify_expense_change(db, None, None)
+    return moved
+
+@serialized_write
+def merge_categories(db: Session, source_id: int, target_id: int) -> int:
+    """Reassign all of source's expenses to target in one transaction, then delete source"""
+    moved = merge_expense_owner(db, "category_id", source_id, target_id)
+    db.query(models.Category).filter(models.Category.id == source_id).delete()
+    db.commit()
+    if moved:
+        notify_expense_change(db, None, None)
+    return moved
+
+# Exchange rates
+def get_exchange_rates(db: Session, currency: Optional[str] = None):
+    query = db.query(models.ExchangeRate)
+    if currency:
+        query = query.filter(models.ExchangeRate.currency == currency)
+    return query.order_by(models.ExchangeRate.currency, models.ExchangeRate.rate_date).all()
+
+@serialized_write
+def upsert_exchange_rates(db: Session, rates: List[schemas.ExchangeRateBase]):
+    """Insert rates, replacing any already stored for the same currency and date"""
+    existing = {
+        (row.currency, row.rate_date): row
+        for row in db.query(models.ExchangeRate).filter(
+            models.ExchangeRate.currency.in_({rate.currency for rate in rates})
+        )
+    }
+    for rate in rates:
+        row = existing.get((rate.currency, rate.rate_date))
+        if row is None:
+            row = models.ExchangeRate(**rate.model_dump())
+            db.add(row)
+            existing[(rate.currency, rate.rate_date)] = row
+        else:
+            row.rate = rate.rate
+    db.commit()
+    if rates:
+        # Converted totals of any month may have changed
+        notify_expense_change(db, None, None)
+    return get_exchange_rates(db)
+
+# Idempotency keys
+def idempotency_key_filter(scope: str, key: str):
+    return and_(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+
+@serialized_write
+def claim_idempotency_key(db: Session, scope: str, key: str, request_hash: str, ttl: timedelta) -> tuple:
+    """Record that a request with this key has started.
+
+    Returns (record id, None) if this caller claimed the key and should run the
+    request, or (None, existing record) if another request already holds it;
+    the record is None if that request gave the key up in the meantime.
+    A pending claim is never taken over: its request may have written before
+    it died. An expired key counts as unused.
+    """
+    now = datetime.now(timezone.utc)
+    db.execute(delete(models.IdempotencyKey).where(
+        idempotency_key_filter(scope, key), models.IdempotencyKey.expires_at <= now
+    ).execution_options(synchronize_session=False))
+    existing = db.query(models.IdempotencyKey).filter(idempotency_key_filter(scope, key)).first()
+    if existing is not None:
+        db.expunge(existing)  # Keep its loaded fields readable after the commit
+        db.commit()
+        return None, existing
+    
+    record = models.IdempotencyKey(scope=scope, key=key, request_hash=request_hash,
+                                   created_at=now, expires_at=now + ttl)
+    db.add(record)
+    try:
+        db.flush()
+        record_id = record.id
+        db.commit()
+    except IntegrityError:
+        # Another process inserted the same key first
+        db.rollback()
+        return None, db.query(models.IdempotencyKey).filter(idempotency_key_filter(scope, key)).first()
+    return record_id, None
+
+@serialized_write
+def complete_idempotency_key(db: Session, record_id: int, status_code: int, response_body: str):
+    db.execute(update(models.IdempotencyKey).where(models.IdempotencyKey.id == record_id).values(
+        status_code=status_code, response_body=response_body
+    ))
+    db.commit()
+
+@serialized_write
+def release_idempotency_key(db: Session, record_id: int):
+    """Forget a claimed key after its request failed, so the client can retry with it"""
+    db.rollback()
+    db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.id == record_id))
+    db.commit()
+
+@serialized_write
+def purge_expired_idempotency_keys(db: Session) -> int:
+    result = db.execute(delete(models.IdempotencyKey).where(
+        models.IdempotencyKey.expires_at <= datetime.now(timezone.utc)
+    ).execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount
+
 def create_default_categories(db: Session):
     """Create default expense categories"""
     default_categories = [
@@ -0,0 +1,69 @@
+import os
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+
+CURRENCY_PATTERN = "^[A-Z]{3}$"  # ISO 4217 code
+
+# Currency that summaries and totals are reported in; amounts in other
+# currencies are converted with the app's exchange_rates table
+REPORTING_CURRENCY = os.getenv("REPORTING_CURRENCY", "USD").upper()
+# It also ends up in DDL (column defaults), so it must be a plain currency code
+if not re.fullmatch(CURRENCY_PATTERN, REPORTING_CURRENCY):
+    raise ValueError(f"REPORTING_CURRENCY must be a three-letter currency code, not {REPORTING_CURRENCY!r}")
+
+# The helpers below take the app's models: rates is its ExchangeRate model and
+# model the table with amount, currency and date columns (Expense, Transaction, ...)
+
+def exchange_rate_query(rates, currency, on, earlier: bool):
+    """The rate for currency closest to the date on, looking backwards or forwards from it"""
+    if earlier:
+        condition, order = rates.rate_date <= on, rates.rate_date.desc()
+    else:
+        condition, order = rates.rate_date > on, rates.rate_date.asc()
+    return select(rates.rate).where(rates.currency == currency, condition).order_by(order).limit(1)
+
+def exchange_rate(model, rates):
+    """SQL expression for each row's rate: the latest on or before its date, else the earliest later one"""
+    return func.coalesce(
+        exchange_rate_query(rates, model.currency, model.date, earlier=True).scalar_subquery(),
+        exchange_rate_query(rates, model.currency, model.date, earlier=False).scalar_subquery()
+    )
+
+def reporting_amount(model, rates):
+    """SQL expression for model.amount converted to the reporting currency.
+
+    NULL for a currency with no rates at all, so SUM() leaves those rows out
+    and count() of this expression counts only the rows that were converted.
+    """
+    return case(
+        (model.currency == REPORTING_CURRENCY, model.amount),
+        else_=model.amount * exchange_rate(model, rates)
+    )
+
+def unconverted(model, rates):
+    """SQL condition for the rows reporting_amount can't convert"""
+    return and_(model.currency != REPORTING_CURRENCY, exchange_rate(model, rates).is_(None))
+
+def unconverted_summary(db: Session, model, rates, *conditions) -> Tuple[int, List[str]]:
+    """How many rows matching conditions were left out of converted totals, and their currencies"""
+    rows = db.query(model.currency, func.count()).filter(
+        *conditions, unconverted(model, rates)
+    ).group_by(model.currency).order_by(model.currency).all()
+    return sum(count for _, count in rows), [currency for currency, _ in rows]
+
+def convert_amount(db: Session, rates, amount: Optional[float], currency: Optional[str],
+                   on: date) -> Optional[float]:
+    """One amount in the reporting currency, using the same rate as reporting_amount.
+
+    None when currency has no rates, like reporting_amount's NULL.
+    """
+    if amount is None or not currency or currency == REPORTING_CURRENCY:
+        return amount
+    rate = db.execute(exchange_rate_query(rates, currency, on, earlier=True)).scalar()
+    if rate is None:
+        rate = db.execute(exchange_rate_query(rates, currency, on, earlier=False)).scalar()
+    return amount * rate if rate is not None else None
@@ -1,12 +1,54 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from sqlalchemy import create_engine, event, insert, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlalchemy.orm import sessionmaker
 
-SQLITE_DATABASE_URL = "sqlite:///./budget_tracker.db"
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are coordinated
+    fcntl = None
 
-engine = create_engine(
-    SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLITE_DATABASE_PATH = "./budget_tracker.db"
+SQLITE_DATABASE_URL = f"sqlite:///{SQLITE_DATABASE_PATH}"
+
+# "single-writer" funnels every crud write through one writer at a time, across
+# threads and across uvicorn worker processes; "off" leaves locking to SQLite.
+WRITE_COORDINATION = os.getenv("WRITE_COORDINATION", "off").lower()
+
+# Group commit: concurrent single-expense inserts arriving within this many
+# milliseconds share one transaction (and one fsync). Unset or 0 = off.
+GROUP_COMMIT_MS = float(os.getenv("GROUP_COMMIT_MS", "0") or 0)
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+
+# Python functions callable from SQL on every SQLite connection, registered by
+# the modules that define them: name -> (number of arguments, function)
+sqlite_functions = {}
+
+def create_sqlite_engine(path: str):
+    db_engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    @event.listens_for(db_engine, "connect")
+    def _create_sqlite_functions(dbapi_connection, connection_record):
+        for name, (arity, func) in sqlite_functions.items():
+            dbapi_connection.create_function(name, arity, func, deterministic=True)
+    if WRITE_COORDINATION == "single-writer":
+        @event.listens_for(db_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL keeps readers running in parallel with the single writer
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
+    return db_engine
+
+engine = create_sqlite_engine(SQLITE_DATABASE_PATH)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -17,4 +59,230 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def add_missing_columns(bind, metadata):
+    """Add model columns and indexes missing from existing tables.
+
+    create_all() only creates tables that don't exist yet, so columns added to a
+    model later are patched onto older databases here.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    default = bind.dialect.ddl_compiler(bind.dialect, None).get_column_default_string(column)
+                    default_clause = f" DEFAULT {default}" if default is not None else ""
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default_clause}"
+                    ))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+def add_autoincrement(bind, table, reserved_ids=()):
+    """Rebuild an older SQLite table whose model now asks for AUTOINCREMENT.
+
+    Without it SQLite hands out max(id) + 1, reusing the id of a deleted max
+    row. The table is renamed, recreated from the model and refilled in one
+    BEGIN IMMEDIATE transaction, so concurrent workers migrate it only once.
+    The id sequence then starts past every id in the reserved_ids columns too.
+    """
+    if bind.dialect.name != "sqlite" or not table.dialect_options["sqlite"]["autoincrement"]:
+        return
+    connection = bind.raw_connection()
+    dbapi_connection = connection.driver_connection
+    isolation_level = dbapi_connection.isolation_level
+    dbapi_connection.isolation_level = None  # Manage the transaction ourselves, DDL included
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        row = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).fetchone()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            cursor.execute("COMMIT")
+            return
+        old_name = f"{table.name}_before_autoincrement"
+        existing = [column[1] for column in cursor.execute(f"PRAGMA table_info({table.name})")]
+        columns = ", ".join(column.name for column in table.columns if column.name in existing)
+        cursor.execute(f"ALTER TABLE {table.name} RENAME TO {old_name}")
+        for index in table.indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {index.name}")
+        cursor.execute(str(CreateTable(table).compile(dialect=bind.dialect)))
+        for index in table.indexes:
+            cursor.execute(str(CreateIndex(index).compile(dialect=bind.dialect)))
+        cursor.execute(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}")
+        cursor.execute(f"DROP TABLE {old_name}")
+        highest = " UNION ALL ".join(
+            f"SELECT max({column.name}) AS id FROM {column.table.name}"
+            for column in [*table.primary_key.columns, *reserved_ids]
+        )
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+        cursor.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT ?, coalesce(max(id), 0) FROM ({highest})", (table.name,)
+        )
+        cursor.execute("COMMIT")
+    except Exception:
+        if dbapi_connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        cursor.close()
+        dbapi_connection.isolation_level = isolation_level
+        connection.close()
+
+
+class SingleWriter:
+    """Process- and thread-wide write lock for one SQLite database file.
+
+    Threads queue on an in-process lock; worker processes queue on an flock()
+    of a sidecar lock file. Re-entrant within a thread, so a write helper may
+    call other write helpers.
+    """
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    @contextmanager
+    def hold(self):
+        with self._lock:
+            depth = getattr(self._local, "depth", 0)
+            lock_file = None
+            if depth == 0 and fcntl is not None:
+                lock_file = open(self.lock_path, "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+# One writer per database file, so separate files never wait on each other
+writers = {}
+writers_lock = threading.Lock()
+
+def writer_for(path: str) -> SingleWriter:
+    with writers_lock:
+        if path not in writers:
+            writers[path] = SingleWriter(path + ".write-lock")
+        return writers[path]
+
+def serialized_write(func):
+    """Run a crud write function under the single writer when coordination is on.
+
+    Any read transaction the session already holds is ended first so the write
+    starts from a fresh snapshot. The write commits before the lock is released,
+    so later reads on the same session see it.
+    """
+    @wraps(func)
+    def wrapper(db, *args, **kwargs):
+        if WRITE_COORDINATION != "single-writer":
+            return func(db, *args, **kwargs)
+        if db.in_transaction() and not (db.new or db.dirty or db.deleted):
+            db.rollback()
+        with writer_for(db.get_bind().url.database).hold():
+            return func(db, *args, **kwargs)
+    return wrapper
+
+
+class PendingInsert:
+    def __init__(self, table, values: dict):
+        self.table = table
+        self.values = values
+        self.ready = threading.Event()
+        self.lead = False
+        self.row_id = None
+        self.error = None
+
+class GroupCommitter:
+    """Coalesces concurrent single-row inserts into one transaction per database.
+
+    The first caller to arrive becomes the leader: it waits out the window,
+    inserts everything queued by then in one transaction and commits once.
+    Every caller gets its own row id or its own exception. A failed INSERT
+    only undoes that statement (SQLite's default conflict handling), so the
+    rest of the batch still commits. If more inserts queued up meanwhile, the
+    oldest of them leads the next batch.
+    """
+
+    def __init__(self, db_engine, window_ms: float, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.engine_ref = weakref.ref(db_engine)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending = []
+        self.leading = False
+        self._lock = threading.Lock()
+
+    def insert(self, table, values: dict) -> int:
+        """Insert one row and return its primary key once its batch has committed"""
+        item = PendingInsert(table, values)
+        with self._lock:
+            self.pending.append(item)
+            if not self.leading:
+                self.leading = True
+                item.lead = True
+                item.ready.set()
+        while True:
+            item.ready.wait()
+            if not item.lead:
+                break
+            item.lead = False
+            item.ready.clear()
+            self._lead()
+        if item.error is not None:
+            raise item.error
+        return item.row_id
+
+    def _lead(self):
+        time.sleep(self.window)
+        with self._lock:
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+        try:
+            self._commit(batch)
+        finally:
+            with self._lock:
+                if self.pending:
+                    self.pending[0].lead = True
+                    self.pending[0].ready.set()
+                else:
+                    self.leading = False
+            for item in batch:
+                item.ready.set()
+
+    def _commit(self, batch):
+        db_engine = self.engine_ref()
+        writer = writer_for(db_engine.url.database) if WRITE_COORDINATION == "single-writer" else None
+        try:
+            with writer.hold() if writer else nullcontext():
+                with db_engine.begin() as conn:
+                    for item in batch:
+                        try:
+                            item.row_id = conn.execute(
+                                insert(item.table).values(item.values).returning(*item.table.primary_key.columns)
+                            ).scalar_one()
+                        except Exception as e:
+                            item.error = e
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            for item in batch:
+                item.row_id = None
+                item.error = item.error or e
+
+# Weak keys: household engines evicted from the tenant pool take their committer with them
+committers = weakref.WeakKeyDictionary()
+
+def group_committer_for(db_engine) -> GroupCommitter:
+    with writers_lock:
+        if db_engine not in committers:
+            committers[db_engine] = GroupCommitter(db_engine, GROUP_COMMIT_MS)
+        return committers[db_engine]
@@ -0,0 +1,228 @@
+import calendar
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import crud, models, schemas
+
+# Months of history the models are fitted on
+FORECAST_HISTORY_MONTHS = 60
+# Series shorter than this get a flat mean instead of a trend line
+MIN_TREND_MONTHS = 6
+# A calendar month needs this many past occurrences before it gets a seasonal adjustment
+MIN_SEASONAL_YEARS = 2
+# Cached (household, month) forecast entries per process
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "256"))
+
+Series = Tuple[str, int]  # ("user_id" | "category_id", owner id)
+
+def fit_forecasts(history: np.ndarray, first_month: int) -> np.ndarray:
+    """Next-month forecast for every row of a series x month matrix in one pass.
+
+    Each row is fitted with a least-squares trend line over the months since its
+    first expense, plus the mean residual of earlier occurrences of the
+    forecast's calendar month. first_month is the calendar month of column 0.
+    """
+    series_count, months = history.shape
+    if series_count == 0 or months == 0:
+        return np.zeros(series_count)
+    t = np.arange(months, dtype=float)
+    first = np.argmax(history > 0, axis=1)
+    mask = (t >= first[:, None]).astype(float)
+    n = mask.sum(axis=1)
+
+    t_mean = (mask * t).sum(axis=1) / n
+    y_mean = (mask * history).sum(axis=1) / n
+    t_dev = (t - t_mean[:, None]) * mask
+    denominator = (t_dev ** 2).sum(axis=1)
+    slope = np.divide((t_dev * (history - y_mean[:, None])).sum(axis=1), denominator,
+                      out=np.zeros(series_count), where=denominator > 0)
+    slope[n < MIN_TREND_MONTHS] = 0
+    intercept = y_mean - slope * t_mean
+
+    residuals = (history - (intercept[:, None] + slope[:, None] * t)) * mask
+    same_month = ((first_month - 1 + t) % 12) == ((first_month - 1 + months) % 12)
+    occurrences = (mask * same_month).sum(axis=1)
+    seasonal = np.divide((residuals * same_month).sum(axis=1), occurrences,
+                         out=np.zeros(series_count), where=occurrences >= MIN_SEASONAL_YEARS)
+
+    return np.maximum(intercept + slope * months + seasonal, 0)
+
+def month_index(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+def month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+class ForecastCache:
+    """Per-series forecasts for each household and month, kept until that series changes.
+
+    Expense writes mark the series of the affected user and category stale, and
+    only stale series are refitted on the next request. Writes that land while
+    a forecast is being computed are recorded the same way, so they are refitted
+    on the next request too. Bulk writes drop the household's forecasts. At most
+    FORECAST_CACHE_SIZE (household, month) entries are kept, least recently used
+    first out.
+
+    The cache lives in one process and only hears about writes made through
+    crud in that process. With several uvicorn workers, or writes from scripts,
+    a worker can serve forecasts that miss other processes' writes until its
+    entry is evicted or the process restarts.
+    """
+
+    def __init__(self, size: int = FORECAST_CACHE_SIZE):
+        self.size = size
+        self.forecasts: "OrderedDict[tuple, Dict[Series, float]]" = OrderedDict()
+        self.stale: Dict[tuple, Set[Series]] = {}
+        # Keys being computed right now, and how many requests are computing each
+        self.computing: Dict[tuple, int] = {}
+        # Bumped when a household's forecasts are dropped, so computations started before are not stored
+        self.generations: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def _keys(self, household: Optional[str]) -> list:
+        return [key for key in {*self.forecasts, *self.computing} if key[0] == household]
+
+    def _drop(self, household: Optional[str]):
+        self.generations[household] = self.generations.get(household, 0) + 1
+        for key in self._keys(household):
+            self.forecasts.pop(key, None)
+            self.stale.pop(key, None)
+
+    def wants(self, household: Optional[str]) -> bool:
+        """crud listener: snapshots are only needed while the household has forecasts to invalidate"""
+        with self._lock:
+            return bool(self._keys(household))
+
+    def on_expense_change(self, household: Optional[str], before: Optional[dict], after: Optional[dict]):
+        with self._lock:
+            if before is None and after is None:
+                self._drop(household)
+                return
+            changed = {
+                (field, snapshot[field])
+                for snapshot in (before, after) if snapshot is not None
+                for field in ("user_id", "category_id")
+            }
+            for key in self._keys(household):
+                self.stale.setdefault(key, set()).update(changed)
+
+    def forget_household(self, household: Optional[str]):
+        """Drop a household's forecasts, e.g. when its database leaves the tenant pool"""
+        with self._lock:
+            self._drop(household)
+
+    def get(self, db: Session, year: int, month: int) -> Dict[Series, float]:
+        household = db.info.get("household")
+        key = (household, year, month)
+        with self._lock:
+            # Only listen for writes once there is something to invalidate
+            if self not in crud.expense_listeners:
+                crud.expense_listeners.append(self)
+            forecasts = self.forecasts.get(key)
+            stale = self.stale.pop(key, set())
+            if forecasts is not None:
+                self.forecasts.move_to_end(key)
+                if not stale:
+                    return forecasts
+            generation = self.generations.get(household, 0)
+            self.computing[key] = self.computing.get(key, 0) + 1
+
+        try:
+            refit = compute_forecasts(db, year, month, stale if forecasts is not None else None)
+        finally:
+            with self._lock:
+                self.computing[key] -= 1
+                if not self.computing[key]:
+                    del self.computing[key]
+        merged = {series: value for series, value in (forecasts or {}).items() if series not in stale}
+        merged.update(refit)
+        with self._lock:
+            if self.generations.get(household, 0) == generation:
+                self.forecasts[key] = merged
+                self.forecasts.move_to_end(key)
+                while len(self.forecasts) > self.size:
+                    evicted, _ = self.forecasts.popitem(last=False)
+                    self.stale.pop(evicted, None)
+        return merged
+
+forecast_cache = ForecastCache()
+
+def compute_forecasts(db: Session, year: int, month: int, only: Optional[Set[Series]] = None) -> Dict[Series, float]:
+    """Fit every user and category series (or just those in only) for the given month"""
+    target = year * 12 + month - 1
+    start = target - FORECAST_HISTORY_MONTHS
+    forecasts = {}
+    for field in ("user_id", "category_id"):
+        wanted = None if only is None else {owner_id for kind, owner_id in only if kind == field}
+        if wanted is not None and not wanted:
+            continue
+        rows = crud.get_monthly_history(db, field, month_start(start), month_start(target))
+        owners = sorted({owner_id for _, _, owner_id, _ in rows
+                         if wanted is None or owner_id in wanted})
+        row_of = {owner_id: i for i, owner_id in enumerate(owners)}
+        history = np.zeros((len(owners), FORECAST_HISTORY_MONTHS))
+        for y, m, owner_id, total in rows:
+            if owner_id in row_of:
+                history[row_of[owner_id], y * 12 + m - 1 - start] += total
+        values = fit_forecasts(history, start % 12 + 1)
+        forecasts.update({(field, owner_id): float(values[i]) for owner_id, i in row_of.items()})
+    return forecasts
+
+def get_spending_forecast(db: Session, year: int, month: int, today: Optional[date] = None,
+                          users: Optional[list] = None, categories: Optional[list] = None) -> schemas.SpendingForecast:
+    """Projected end-of-month spend: month-to-date plus the model's share for the days left.
+
+    Pass users and categories when the caller has already loaded them.
+    """
+    today = today or date.today()
+    days_in_month = calendar.monthrange(year, month)[1]
+    target = year * 12 + month - 1
+    if target < month_index(today):
+        days_elapsed = days_in_month
+    elif target > month_index(today):
+        days_elapsed = 0
+    else:
+        days_elapsed = today.day
+    remaining_share = (days_in_month - days_elapsed) / days_in_month
+
+    forecasts = forecast_cache.get(db, year, month)
+    entries = {}
+    for field, model, label, owners in (("category_id", models.Category, "categories", categories),
+                                        ("user_id", models.User, "users", users)):
+        month_to_date = {}
+        for _, _, owner_id, total in crud.get_monthly_history(db, field, month_start(target), month_start(target + 1)):
+            month_to_date[owner_id] = month_to_date.get(owner_id, 0.0) + total
+        entries[label] = []
+        if owners is None:
+            owners = db.query(model).order_by(model.id).all()
+        for owner in owners:
+            spent = month_to_date.get(owner.id, 0.0)
+            predicted = forecasts.get((field, owner.id))
+            if predicted is None and spent == 0:
+                continue
+            if predicted is None:
+                # No history yet: extrapolate this month's pace
+                projected = spent / days_elapsed * days_in_month if days_elapsed else spent
+            else:
+                projected = spent + predicted * remaining_share
+            entries[label].append(schemas.ForecastEntry(
+                id=owner.id, name=owner.name, color=owner.color,
+                month_to_date=spent, forecast_amount=predicted, projected_total=projected
+            ))
+
+    return schemas.SpendingForecast(
+        year=year,
+        month=month,
+        days_elapsed=days_elapsed,
+        days_in_month=days_in_month,
+        month_to_date=sum(entry.month_to_date for entry in entries["categories"]),
+        projected_total=sum(entry.projected_total for entry in entries["categories"]),
+        categories=entries["categories"],
+        users=entries["users"]
+    )
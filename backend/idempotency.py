@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud
+
+# How long a stored response is replayed for a repeated Idempotency-Key
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# A claim still pending after this long is reported as abandoned rather than in progress.
+# Keep it above the slowest request (large CSV imports).
+IDEMPOTENCY_PENDING_TIMEOUT = timedelta(seconds=float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "300")))
+# Expired keys are deleted in the background this often
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+MAX_KEY_LENGTH = 255
+
+logger = logging.getLogger("budget_tracker.idempotency")
+
+def request_hash(payload) -> str:
+    return hashlib.sha256(
+        json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+def abandoned(record) -> bool:
+    """Whether a pending claim is older than IDEMPOTENCY_PENDING_TIMEOUT"""
+    created_at = record.created_at
+    if created_at.tzinfo is None:  # SQLite hands back naive UTC datetimes
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at <= datetime.now(timezone.utc) - IDEMPOTENCY_PENDING_TIMEOUT
+
+def run_idempotent(request: Request, db: Session, payload, handler: Callable[[], object]):
+    """Run handler once per Idempotency-Key and replay its response for repeats.
+
+    Without the header the handler just runs. A repeat of a finished request
+    gets the stored response back without running the handler; a repeat that
+    arrives while the first is still running gets 409. So does a repeat of a
+    request that has been pending for IDEMPOTENCY_PENDING_TIMEOUT: its process
+    may have died after its writes committed, so running the handler again
+    could apply them twice, and the client has to check before retrying with a
+    new key. Reusing a key with a different payload gets 422. If the handler
+    fails the key is released so the client can retry with it.
+    """
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    payload_hash = request_hash(payload)
+    record_id, record = crud.claim_idempotency_key(db, request.url.path, key, payload_hash, IDEMPOTENCY_TTL)
+    if record_id is None:
+        if record is not None and record.request_hash != payload_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if record is not None and record.status_code is not None:
+            return JSONResponse(json.loads(record.response_body), status_code=record.status_code,
+                                headers={"Idempotent-Replayed": "true"})
+        if record is not None and abandoned(record):
+            raise HTTPException(status_code=409, detail="The request with this Idempotency-Key never finished and "
+                                "may have been applied; check before retrying with a new key")
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress",
+                            headers={"Retry-After": "1"})
+
+    try:
+        body = jsonable_encoder(handler())
+    except Exception:
+        crud.release_idempotency_key(db, record_id)
+        raise
+    crud.complete_idempotency_key(db, record_id, 200, json.dumps(body))
+    return body
+
+def purge_expired_keys(factories: Iterable[sessionmaker]) -> int:
+    purged = 0
+    for factory in factories:
+        db = factory()
+        try:
+            purged += crud.purge_expired_idempotency_keys(db)
+        except Exception:
+            logger.exception("Purging expired idempotency keys failed")
+        finally:
+            db.close()
+    return purged
+
+async def purge_expired_keys_periodically(factories: Callable[[], Iterable[sessionmaker]],
+                                          interval: float = IDEMPOTENCY_PURGE_INTERVAL_SECONDS):
+    """Delete expired keys from every database factories() returns, every interval seconds"""
+    while True:
+        await run_in_threadpool(purge_expired_keys, factories())
+        await asyncio.sleep(interval)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Callable, Dict, Optional, Set
+
+# Server-Sent Event frames are shared by every subscriber, so each change is
+# computed and serialized once no matter how many dashboards are connected.
+SUBSCRIBER_QUEUE_SIZE = 256
+# After a change the forecast is recomputed once per household and pushed to
+# its dashboards, at most once per this many seconds
+FORECAST_PUSH_DELAY_SECONDS = float(os.getenv("FORECAST_PUSH_DELAY_SECONDS", "2"))
+
+def sse_frame(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def summary_deltas(before: Optional[dict], after: Optional[dict]) -> list:
+    """Per-month summary changes caused by replacing the before snapshot with after.
+
+    Snapshots come from crud.expense_snapshot. Either side may be None for a
+    create or a delete. A snapshot whose amount is None (a currency without
+    exchange rates) is not part of any total, so it adds nothing here.
+    """
+    months = {}
+    for snapshot, sign in ((before, -1), (after, 1)):
+        if snapshot is None or snapshot["amount"] is None:
+            continue
+        key = (snapshot["date"].year, snapshot["date"].month)
+        delta = months.setdefault(key, {
+            "year": key[0], "month": key[1],
+            "total_amount": 0.0, "expense_count": 0,
+            "users": {}, "categories": {}
+        })
+        amount = sign * snapshot["amount"]
+        delta["total_amount"] += amount
+        delta["expense_count"] += sign
+        for group, prefix in (("users", "user"), ("categories", "category")):
+            entry = delta[group].setdefault(str(snapshot[f"{prefix}_id"]), {
+                "name": snapshot[f"{prefix}_name"],
+                "color": snapshot[f"{prefix}_color"],
+                "total_amount": 0.0,
+                "expense_count": 0
+            })
+            entry["total_amount"] += amount
+            entry["expense_count"] += sign
+    for delta in months.values():
+        for group in ("users", "categories"):
+            delta[group] = {
+                group_id: entry for group_id, entry in delta[group].items()
+                if entry["expense_count"] or abs(entry["total_amount"]) > 1e-9
+            }
+    # e.g. an edit to the description only: the listed row changes, no total does
+    return [
+        delta for delta in months.values()
+        if delta["users"] or delta["categories"] or delta["expense_count"] or abs(delta["total_amount"]) > 1e-9
+    ]
+
+def change_event(before: Optional[dict], after: Optional[dict]) -> dict:
+    """The delta event's data: summary deltas plus the changed row for the recent-expenses list"""
+    return {
+        "months": summary_deltas(before, after),
+        "expense": after["expense"] if after is not None else None,
+        "removed_id": before["id"] if after is None else None
+    }
+
+class SummaryBroadcaster:
+    """Fans summary deltas out to connected dashboards, per household.
+
+    Writes happen on threadpool threads, so frames are handed to the event loop
+    with call_soon_threadsafe. A subscriber that falls too far behind is dropped
+    and its stream closes, so the client reconnects and starts from a fresh summary.
+    Without multi-tenant mode every subscriber belongs to household None.
+
+    The broadcaster lives in one process: a dashboard only hears about writes
+    served by the same uvicorn worker. Run a single worker when live updates
+    matter, or put a shared channel (e.g. Postgres LISTEN/NOTIFY) in front of
+    publish().
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[Optional[str], Set[asyncio.Queue]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Builds a "forecast" frame for a household; set by the app, runs on the threadpool
+        self.forecast_frame: Optional[Callable[[Optional[str]], str]] = None
+        self.forecast_scheduled: Set[Optional[str]] = set()
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def subscribe(self, household: Optional[str] = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.setdefault(household, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, household: Optional[str] = None):
+        queues = self.subscribers.get(household)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[household]
+
+    def is_subscribed(self, queue: asyncio.Queue, household: Optional[str] = None) -> bool:
+        return queue in self.subscribers.get(household, ())
+
+    def publish(self, household: Optional[str], frame: str):
+        if not self.subscribers.get(household) or self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._fan_out, household, frame)
+
+    def _fan_out(self, household: Optional[str], frame: str):
+        queues = self.subscribers.get(household, set())
+        for queue in list(queues):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                queues.discard(queue)
+
+    def wants(self, household: Optional[str]) -> bool:
+        """crud listener: snapshots are only needed while a dashboard is connected"""
+        return bool(self.subscribers.get(household))
+
+    def on_expense_change(self, household: Optional[str], before: Optional[dict], after: Optional[dict]):
+        """crud listener: publish one delta event per change, or a resync for bulk writes"""
+        if not self.subscribers.get(household):
+            return
+        if before is None and after is None:
+            self.publish(household, sse_frame("resync", {}))
+            return
+        if before == after:
+            return
+        if any(snapshot is not None and snapshot["amount"] is None for snapshot in (before, after)):
+            # The summary's unconverted count and currencies changed; deltas don't carry those
+            self.publish(household, sse_frame("resync", {}))
+            return
+        self.publish(household, sse_frame("delta", change_event(before, after)))
+        self.schedule_forecast(household)
+
+    def schedule_forecast(self, household: Optional[str]):
+        """Push one recomputed forecast per household after a burst of changes"""
+        if self.forecast_frame is None or self.loop is None or self.loop.is_closed():
+            return
+        with self._lock:
+            if household in self.forecast_scheduled:
+                return
+            self.forecast_scheduled.add(household)
+        self.loop.call_soon_threadsafe(
+            self.loop.call_later, FORECAST_PUSH_DELAY_SECONDS, self._push_forecast, household
+        )
+
+    def _push_forecast(self, household: Optional[str]):
+        with self._lock:
+            self.forecast_scheduled.discard(household)
+        if not self.subscribers.get(household):
+            return
+        future = self.loop.run_in_executor(None, self.forecast_frame, household)
+
+        def fan_out(done):
+            if not done.cancelled() and done.exception() is None:
+                self._fan_out(household, done.result())
+        future.add_done_callback(fan_out)
+
+broadcaster = SummaryBroadcaster()
@@ -1,19 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
+import asyncio
 import csv
 import io
+import os
+import re
 
 import models, schemas, crud
-from database import SessionLocal, engine, get_db
+from currency import CURRENCY_PATTERN, REPORTING_CURRENCY
+from database import SessionLocal, engine, get_db, add_autoincrement, add_missing_columns
+from forecast import forecast_cache, get_spending_forecast
+from idempotency import purge_expired_keys_periodically, run_idempotent
+from live_summary import broadcaster, sse_frame
+from profiling import install_request_profiling, install_slow_query_log
+from streaming import StreamStats, compressed, ndjson_batches, negotiate_encoding
+from tenants import MULTI_TENANT, get_tenant_db, household_or_none, tenant_pool, tenant_session
+
+install_slow_query_log(engine)
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, models.Base.metadata)
+add_autoincrement(engine, models.Expense.__table__, reserved_ids=[models.ArchivedExpense.id])
 
 app = FastAPI(title="Budget Tracker 2025 API", version="1.0.0")
 
+# In multi-tenant mode every endpoint's session comes from the caller's household database
+if MULTI_TENANT:
+    app.dependency_overrides[get_db] = get_tenant_db
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -28,15 +48,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Before the routes, so each one is created as a ProfiledRoute
+install_request_profiling(app)
+
+# Expenses older than this many months are moved to the archive tier by /api/archive
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "24"))
+
 # Initialize default data
 @app.on_event("startup")
 async def startup_event():
+    broadcaster.bind_loop(asyncio.get_running_loop())
+    broadcaster.forecast_frame = current_month_forecast_frame
+    if broadcaster not in crud.expense_listeners:
+        crud.expense_listeners.append(broadcaster)
+    # Forecasts are per-household state worth dropping with the engine; live-summary
+    # subscribers hold no engine state, so they stay connected across evictions
+    if forecast_cache.forget_household not in tenant_pool.eviction_listeners:
+        tenant_pool.eviction_listeners.append(forecast_cache.forget_household)
     db = SessionLocal()
     try:
         crud.create_default_categories(db)
         crud.create_default_user(db)
+        crud.backfill_expense_fingerprints(db)
     finally:
         db.close()
+    # Expired idempotency keys are purged here rather than by the requests that claim keys
+    app.state.idempotency_purge = asyncio.create_task(purge_expired_keys_periodically(
+        lambda: tenant_pool.sessionmakers() if MULTI_TENANT else [SessionLocal]
+    ))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.idempotency_purge.cancel()
 
 @app.get("/")
 def read_root():
@@ -46,6 +89,12 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+def check_merge_target(target, source_id: int, target_id: int, kind: str):
+    if target_id == source_id:
+        raise HTTPException(status_code=400, detail=f"{kind} cannot be merged into itself")
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"Target {kind.lower()} not found")
+
 # User endpoints
 @app.post("/api/users", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -71,12 +120,26 @@ def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(ge
     return db_user
 
 @app.delete("/api/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.delete_user(db=db, user_id=user_id)
+def delete_user(user_id: int, reassign_to: Optional[int] = None, db: Session = Depends(get_db)):
+    if reassign_to is not None:
+        check_merge_target(crud.get_user(db, reassign_to), user_id, reassign_to, "User")
+    try:
+        db_user = crud.delete_user(db=db, user_id=user_id, reassign_to=reassign_to)
+    except crud.InUse:
+        raise HTTPException(status_code=409, detail="User has expenses; pass reassign_to to move them first")
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
 
+@app.post("/api/users/{user_id}/merge")
+def merge_user(user_id: int, into: int, db: Session = Depends(get_db)):
+    """Move all of a user's expenses to another user and delete them"""
+    if crud.get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    check_merge_target(crud.get_user(db, into), user_id, into, "User")
+    moved = crud.merge_users(db=db, source_id=user_id, target_id=into)
+    return {"message": "User merged successfully", "moved_expense_count": moved}
+
 # Category endpoints
 @app.post("/api/categories", response_model=schemas.Category)
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
@@ -102,18 +165,34 @@ def update_category(category_id: int, category: schemas.CategoryCreate, db: Sess
     return db_category
 
 @app.delete("/api/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = crud.delete_category(db=db, category_id=category_id)
+def delete_category(category_id: int, reassign_to: Optional[int] = None, db: Session = Depends(get_db)):
+    if reassign_to is not None:
+        check_merge_target(crud.get_category(db, reassign_to), category_id, reassign_to, "Category")
+    try:
+        db_category = crud.delete_category(db=db, category_id=category_id, reassign_to=reassign_to)
+    except crud.InUse:
+        raise HTTPException(status_code=409, detail="Category has expenses; pass reassign_to to move them first")
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"message": "Category deleted successfully"}
 
+@app.post("/api/categories/{category_id}/merge")
+def merge_category(category_id: int, into: int, db: Session = Depends(get_db)):
+    """Move all of a category's expenses to another category and delete it"""
+    if crud.get_category(db, category_id) is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    check_merge_target(crud.get_category(db, into), category_id, into, "Category")
+    moved = crud.merge_categories(db=db, source_id=category_id, target_id=into)
+    return {"message": "Category merged successfully", "moved_expense_count": moved}
+
 # Expense endpoints
 @app.post("/api/expenses", response_model=schemas.Expense)
-def create_expense(expense: schemas.ExpenseCreate, db: Session = Depends(get_db)):
-    return crud.create_expense(db=db, expense=expense)
+def create_expense(expense: schemas.ExpenseCreate, request: Request, db: Session = Depends(get_db)):
+    return run_idempotent(request, db, expense, lambda: schemas.Expense.model_validate(
+        crud.create_expense(db=db, expense=expense)
+    ))
 
-@app.get("/api/expenses", response_model=List[schemas.Expense])
+@app.get("/api/expenses", response_model=Union[List[schemas.Expense], schemas.CompactExpenseList])
 def read_expenses(
     skip: int = 0, 
     limit: int = 100,
@@ -121,8 +200,19 @@ def read_expenses(
     category_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    format: Literal["full", "compact"] = "full",
     db: Session = Depends(get_db)
 ):
+    if format == "compact":
+        return crud.get_expenses_compact(
+            db=db,
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            category_id=category_id,
+            start_date=start_date,
+            end_date=end_date
+        )
     expenses = crud.get_expenses(
         db=db, 
         skip=skip, 
@@ -134,23 +224,66 @@ def read_expenses(
     )
     return expenses
 
+@app.get("/api/expenses/stream")
+def stream_expenses(
+    request: Request,
+    user_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    batch_size: int = Query(1000, ge=1, le=10000)
+):
+    """Every matching expense as newline-delimited JSON, compressed if the client accepts gzip or br"""
+    household = household_or_none(request)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    
+    def body():
+        # The response outlives the request's dependencies, so the stream owns its session
+        db = tenant_session(household) if household else SessionLocal()
+        try:
+            rows = crud.iter_expense_rows(db, user_id=user_id, category_id=category_id,
+                                          start_date=start_date, end_date=end_date,
+                                          batch_size=batch_size)
+            yield from compressed(ndjson_batches(rows, batch_size), encoding, StreamStats(),
+                                  label=request.url.path)
+        finally:
+            db.close()
+    
+    headers = {"Vary": "Accept-Encoding", "X-Accel-Buffering": "no"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
+
 @app.get("/api/expenses/{expense_id}", response_model=schemas.Expense)
 def read_expense(expense_id: int, db: Session = Depends(get_db)):
-    db_expense = crud.get_expense(db, expense_id=expense_id)
+    db_expense = crud.get_expense(db, expense_id=expense_id, include_archive=True)
     if db_expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
     return db_expense
 
 @app.put("/api/expenses/{expense_id}", response_model=schemas.Expense)
 def update_expense(expense_id: int, expense: schemas.ExpenseUpdate, db: Session = Depends(get_db)):
-    db_expense = crud.update_expense(db=db, expense_id=expense_id, expense=expense)
+    """Partial or full edit. With "version" a stale edit gets 409; without it the last write wins."""
+    try:
+        db_expense = crud.update_expense(db=db, expense_id=expense_id, expense=expense)
+    except crud.VersionConflict:
+        raise HTTPException(status_code=409, detail="Expense was modified by another request")
+    except crud.ArchivedExpenseError:
+        raise HTTPException(status_code=409, detail="Expense is archived and can no longer be changed")
     if db_expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
     return db_expense
 
 @app.delete("/api/expenses/{expense_id}")
-def delete_expense(expense_id: int, db: Session = Depends(get_db)):
-    db_expense = crud.delete_expense(db=db, expense_id=expense_id)
+def delete_expense(expense_id: int, version: Optional[int] = Query(
+        None, description="Version the client last saw; optional, a stale one gets 409"),
+        db: Session = Depends(get_db)):
+    try:
+        db_expense = crud.delete_expense(db=db, expense_id=expense_id, expected_version=version)
+    except crud.VersionConflict:
+        raise HTTPException(status_code=409, detail="Expense was modified by another request")
+    except crud.ArchivedExpenseError:
+        raise HTTPException(status_code=409, detail="Expense is archived and can no longer be changed")
     if db_expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
     return {"message": "Expense deleted successfully"}
@@ -165,19 +298,110 @@ def get_current_month_summary(db: Session = Depends(get_db)):
     now = datetime.now()
     return crud.get_monthly_summary(db=db, year=now.year, month=now.month)
 
+@app.get("/api/forecast/current-month", response_model=schemas.SpendingForecast)
+def get_current_month_forecast(db: Session = Depends(get_db)):
+    today = date.today()
+    return get_spending_forecast(db=db, year=today.year, month=today.month, today=today)
+
+@app.get("/api/dashboard", response_model=schemas.DashboardData)
+def get_dashboard(recent: int = Query(5, ge=0, le=50), db: Session = Depends(get_db)):
+    """Everything the dashboard's first screen needs, from one session, with users and categories sent once"""
+    today = date.today()
+    # Every user and category, not the list endpoints' first page: the forecast and the pickers need all of them
+    users = crud.get_users(db, limit=None)
+    categories = crud.get_categories(db, limit=None)
+    return schemas.DashboardData(
+        summary=crud.get_monthly_summary(db=db, year=today.year, month=today.month),
+        forecast=get_spending_forecast(db=db, year=today.year, month=today.month, today=today,
+                                       users=users, categories=categories),
+        recent_expenses=[row._asdict() for row in crud.get_expense_rows(db, limit=recent)],
+        users=users,
+        categories=categories
+    )
+
+@app.get("/api/exchange-rates", response_model=List[schemas.ExchangeRate])
+def read_exchange_rates(currency: Optional[str] = None, db: Session = Depends(get_db)):
+    return crud.get_exchange_rates(db, currency.upper() if currency else None)
+
+@app.put("/api/exchange-rates", response_model=List[schemas.ExchangeRate])
+def put_exchange_rates(rates: List[schemas.ExchangeRateBase], db: Session = Depends(get_db)):
+    """Add rates, replacing any stored for the same currency and date"""
+    if any(rate.currency == REPORTING_CURRENCY for rate in rates):
+        raise HTTPException(status_code=400, detail=f"{REPORTING_CURRENCY} is the reporting currency and needs no rate")
+    return crud.upsert_exchange_rates(db, rates)
+
+def current_month_summary_frame(household: Optional[str]) -> str:
+    db = tenant_session(household) if household else SessionLocal()
+    try:
+        now = datetime.now()
+        summary = crud.get_monthly_summary(db=db, year=now.year, month=now.month)
+        return sse_frame("summary", summary.model_dump())
+    finally:
+        db.close()
+
+def current_month_forecast_frame(household: Optional[str]) -> str:
+    db = tenant_session(household) if household else SessionLocal()
+    try:
+        today = date.today()
+        forecast = get_spending_forecast(db=db, year=today.year, month=today.month, today=today)
+        return sse_frame("forecast", forecast.model_dump())
+    finally:
+        db.close()
+
+@app.get("/api/summary/stream")
+async def stream_summary(request: Request):
+    """Server-Sent Events: the current month's summary, then deltas as expenses change.
+
+    A "delta" carries the summary changes and the changed expense row, a
+    "forecast" follows a burst of changes, and "resync" asks the client to
+    reload after bulk writes. Only writes served by this worker process are
+    seen; see SummaryBroadcaster.
+    """
+    household = household_or_none(request)
+    queue = broadcaster.subscribe(household)
+    
+    async def events():
+        try:
+            yield await run_in_threadpool(current_month_summary_frame, household)
+            while broadcaster.is_subscribed(queue, household) and not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(queue, household)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Archive endpoints
+@app.post("/api/archive")
+def archive_expenses(before: Optional[date] = None, db: Session = Depends(get_db)):
+    if before is None:
+        today = date.today()
+        months = today.year * 12 + today.month - 1 - ARCHIVE_AFTER_MONTHS
+        before = date(months // 12, months % 12 + 1, 1)
+    archived_count = crud.archive_expenses(db=db, before=before)
+    return {
+        'archived_count': archived_count,
+        'cutoff': before.replace(day=1).isoformat()
+    }
+
 # CSV Import/Export endpoints
 @app.post("/api/import/csv/preview")
-async def preview_csv_import(file: UploadFile = File(...), db: Session = Depends(get_db)):
+def preview_csv_import(file: UploadFile = File(...), db: Session = Depends(get_db)):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
-    content = await file.read()
+    # A plain def endpoint runs on the threadpool, so the blocking read and queries don't stall the event loop
+    content = file.file.read()
     csv_data = io.StringIO(content.decode('utf-8'))
     reader = csv.DictReader(csv_data)
     
     valid_rows = []
     error_rows = []
     new_users = set()
+    seen_fingerprints = set()
     
     # Get existing users and categories
     users = {user.name.lower(): user for user in crud.get_users(db)}
@@ -218,6 +442,16 @@ async def preview_csv_import(file: UploadFile = File(...), db: Session = Depends
                 })
                 continue
             
+            # Optional currency column; blank means the reporting currency
+            currency = (row.get('currency') or REPORTING_CURRENCY).strip().upper()
+            if not re.fullmatch(CURRENCY_PATTERN, currency):
+                error_rows.append({
+                    'row': i + 1,
+                    'data': row,
+                    'error': 'Invalid currency. Expected a 3-letter code such as EUR'
+                })
+                continue
+            
             # Check if user exists
             user_name = row['user'].strip()
             if user_name.lower() not in users:
@@ -233,13 +467,26 @@ async def preview_csv_import(file: UploadFile = File(...), db: Session = Depends
                 })
                 continue
             
+            # Users that don't exist yet are keyed by name so in-file duplicates are still caught
+            description = (row.get('description') or '').strip()
+            user = users.get(user_name.lower())
+            user_key = user.id if user else f'new:{user_name.lower()}'
+            fingerprint = crud.expense_fingerprint(
+                parsed_date, amount, user_key, categories[category_name.lower()].id, description, currency
+            )
+            duplicate = 'file' if fingerprint in seen_fingerprints else None
+            seen_fingerprints.add(fingerprint)
+            
             valid_rows.append({
                 'row': i + 1,
                 'date': parsed_date.isoformat(),
                 'amount': amount,
+                'currency': currency,
                 'category': category_name,
-                'description': row.get('description', '').strip(),
-                'user': user_name
+                'description': description,
+                'user': user_name,
+                'fingerprint': fingerprint,
+                'duplicate': duplicate
             })
             
         except Exception as e:
@@ -249,6 +496,15 @@ async def preview_csv_import(file: UploadFile = File(...), db: Session = Depends
                 'error': str(e)
             })
     
+    # Check against stored expenses with indexed lookups of the file's fingerprints
+    if valid_rows:
+        existing_fingerprints = crud.get_existing_fingerprints(db, [row['fingerprint'] for row in valid_rows])
+        for row in valid_rows:
+            if row['duplicate'] is None and row['fingerprint'] in existing_fingerprints:
+                row['duplicate'] = 'database'
+    
+    duplicate_count = sum(1 for row in valid_rows if row['duplicate'])
+    
     return {
         'valid_rows': valid_rows,
         'error_rows': error_rows,
@@ -257,14 +513,18 @@ async def preview_csv_import(file: UploadFile = File(...), db: Session = Depends
             'total_rows': len(valid_rows) + len(error_rows),
             'valid_count': len(valid_rows),
             'error_count': len(error_rows),
-            'new_user_count': len(new_users)
+            'new_user_count': len(new_users),
+            'duplicate_count': duplicate_count
         }
     }
 
 @app.post("/api/import/csv/confirm")
-async def confirm_csv_import(import_data: dict, db: Session = Depends(get_db)):
+def confirm_csv_import(import_data: dict, request: Request, db: Session = Depends(get_db)):
+    return run_idempotent(request, db, import_data, lambda: import_rows(import_data, db))
+
+def import_rows(import_data: dict, db: Session) -> dict:
     try:
-        created_expenses = []
+        skip_duplicates = import_data.get('skip_duplicates', False)
         
         # Get existing users and categories
         users = {user.name.lower(): user for user in crud.get_users(db)}
@@ -276,25 +536,46 @@ async def confirm_csv_import(import_data: dict, db: Session = Depends(get_db)):
                 new_user = crud.create_user(db, schemas.UserCreate(name=user_name))
                 users[user_name.lower()] = new_user
         
-        # Create expenses
+        expenses = []
         for row in import_data.get('valid_rows', []):
             user = users[row['user'].lower()]
             category = categories[row['category'].lower()]
             
-            expense = schemas.ExpenseCreate(
+            expenses.append(schemas.ExpenseCreate(
                 amount=row['amount'],
                 description=row['description'],
                 date=datetime.strptime(row['date'], '%Y-%m-%d').date(),
                 user_id=user.id,
-                category_id=category.id
-            )
-            
-            created_expense = crud.create_expense(db, expense)
-            created_expenses.append(created_expense)
+                category_id=category.id,
+                currency=row.get('currency') or REPORTING_CURRENCY
+            ))
+        
+        # Anti-join against stored fingerprints, and against rows already accepted from this file
+        skipped_count = 0
+        if skip_duplicates and expenses:
+            fingerprints = [
+                crud.expense_fingerprint(
+                    expense.date, expense.amount, expense.user_id, expense.category_id, expense.description,
+                    expense.currency
+                )
+                for expense in expenses
+            ]
+            seen_fingerprints = crud.get_existing_fingerprints(db, fingerprints)
+            unique_expenses = []
+            for expense, fingerprint in zip(expenses, fingerprints):
+                if fingerprint in seen_fingerprints:
+                    continue
+                seen_fingerprints.add(fingerprint)
+                unique_expenses.append(expense)
+            skipped_count = len(expenses) - len(unique_expenses)
+            expenses = unique_expenses
+        
+        created_count = crud.create_expenses(db, expenses)
         
         return {
-            'message': f'Successfully imported {len(created_expenses)} expenses',
-            'created_count': len(created_expenses)
+            'message': f'Successfully imported {created_count} expenses',
+            'created_count': created_count,
+            'skipped_duplicate_count': skipped_count
         }
         
     except Exception as e:
@@ -323,13 +604,14 @@ def export_csv(
     writer = csv.writer(output)
     
     # Write header
-    writer.writerow(['date', 'amount', 'category', 'description', 'user'])
+    writer.writerow(['date', 'amount', 'currency', 'category', 'description', 'user'])
     
     # Write data
     for expense in expenses:
         writer.writerow([
             expense.date.isoformat(),
             expense.amount,
+            expense.currency,
             expense.category.name,
             expense.description or '',
             expense.user.name
@@ -343,6 +625,7 @@ def export_csv(
         'filename': f'expenses_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
     }
 
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,35 +1,58 @@
 import os
-from fastapi import FastAPI, HTTPException, Depends
+import itertools
+import time
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, date
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy import create_engine, func, inspect, text, update, Column, Integer, String, Float, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from currency import CURRENCY_PATTERN, REPORTING_CURRENCY, convert_amount, reporting_amount, unconverted_summary
+from profiling import install_request_profiling, install_slow_query_log
+
 # Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-if DATABASE_URL is None:
-    # Local development - SQLite
-    DATABASE_URL = "sqlite:///./budget.db"
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}
-    )
-else:
-    # Production - PostgreSQL (Render)
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg://")
-    elif DATABASE_URL.startswith("postgresql://"):
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://")
-    engine = create_engine(DATABASE_URL)
+def normalize_database_url(url: str) -> str:
+    # Render hands out postgres:// URLs; SQLAlchemy needs the psycopg driver named
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+psycopg://")
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://")
+    return url
+
+def make_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url)
+
+# Local development - SQLite; production - PostgreSQL (Render)
+DATABASE_URL = normalize_database_url(os.getenv("DATABASE_URL") or "sqlite:///./budget.db")
+engine = make_engine(DATABASE_URL)
+
+# Optional read replicas, comma separated. Read-only endpoints use these unless
+# the client wrote within the last READ_YOUR_WRITES_SECONDS.
+REPLICA_DATABASE_URLS = [
+    normalize_database_url(url.strip())
+    for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()
+]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+replica_engines = [make_engine(url) for url in REPLICA_DATABASE_URLS]
+
+for db_engine in [engine, *replica_engines]:
+    install_slow_query_log(db_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
 Base = declarative_base()
 
 # Database Models
@@ -51,12 +74,110 @@ class Transaction(Base):
     date = Column(Date)
     category_id = Column(Integer, ForeignKey("categories.id"))
     type = Column(String)
+    currency = Column(String(3), nullable=False, default=REPORTING_CURRENCY, server_default=REPORTING_CURRENCY)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     category = relationship("Category", back_populates="transactions")
 
+class CategoryPeriodTotal(Base):
+    """Running expense total per category and month, kept in step with transactions"""
+    __tablename__ = "category_period_totals"
+    __table_args__ = (UniqueConstraint("category_id", "period"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
+    period = Column(String(7), nullable=False, index=True)  # YYYY-MM
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+class ExchangeRate(Base):
+    """Value of one unit of currency in the reporting currency, from rate_date on"""
+    __tablename__ = "exchange_rates"
+    __table_args__ = (UniqueConstraint("currency", "rate_date"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False)
+    rate_date = Column(Date, nullable=False)
+    rate = Column(Float, nullable=False)
+
+def add_currency_column(db_engine):
+    """create_all doesn't alter existing tables; give older transactions tables the currency column"""
+    if "currency" not in {column["name"] for column in inspect(db_engine).get_columns("transactions")}:
+        # Safe to interpolate: currency.py only accepts a plain three-letter code
+        with db_engine.begin() as connection:
+            connection.execute(text(
+                f"ALTER TABLE transactions ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{REPORTING_CURRENCY}'"
+            ))
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+add_currency_column(engine)
+for replica_engine in replica_engines:
+    # Real replicas get their schema from the primary; local SQLite stand-ins need it created
+    if replica_engine.dialect.name == "sqlite":
+        Base.metadata.create_all(bind=replica_engine)
+        add_currency_column(replica_engine)
+
+# Budget alert thresholds, as a percentage of a category's budget_limit
+BUDGET_ALERT_THRESHOLDS = [
+    float(t) for t in os.getenv("BUDGET_ALERT_THRESHOLDS", "80,100").split(",") if t.strip()
+]
+
+def period_key(value: date) -> str:
+    return value.strftime("%Y-%m")
+
+def apply_period_total(db: Session, transaction_type: str, category_id: Optional[int],
+                       transaction_date: Optional[date], amount: float, count: int,
+                       currency: Optional[str] = None):
+    """Add amount/count to the running total for the transaction's category and month.
+
+    Only expense transactions count towards a budget. amount is converted to the
+    reporting currency first; a currency without rates isn't counted until
+    rates are added, which rebuilds the totals. The caller commits.
+    """
+    if transaction_type != "expense" or category_id is None or transaction_date is None:
+        return
+    amount = convert_amount(db, ExchangeRate, amount or 0, currency, transaction_date)
+    if amount is None:
+        return
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = insert(CategoryPeriodTotal).values(
+        category_id=category_id, period=period_key(transaction_date), total=amount or 0, count=count
+    )
+    # One atomic statement, so concurrent writers can't lose each other's increments
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[CategoryPeriodTotal.category_id, CategoryPeriodTotal.period],
+        set_={
+            "total": CategoryPeriodTotal.total + statement.excluded.total,
+            "count": CategoryPeriodTotal.count + statement.excluded.count,
+        }
+    ))
+
+def rebuild_period_totals(db: Session):
+    """Recompute all running totals from the transactions table with one GROUP BY"""
+    db.query(CategoryPeriodTotal).delete()
+    grouped = {}
+    amount = reporting_amount(Transaction, ExchangeRate)
+    # Transactions in a currency without rates are left out, as apply_period_total does
+    rows = db.query(
+        Transaction.category_id,
+        Transaction.date,
+        func.sum(amount),
+        func.count(amount)
+    ).filter(
+        Transaction.type == "expense",
+        Transaction.category_id.isnot(None),
+        Transaction.date.isnot(None)
+    ).group_by(Transaction.category_id, Transaction.date).all()
+    for category_id, transaction_date, total, count in rows:
+        if not count:
+            continue
+        key = (category_id, period_key(transaction_date))
+        current = grouped.get(key, (0, 0))
+        grouped[key] = (current[0] + (total or 0), current[1] + count)
+    for (category_id, period), (total, count) in grouped.items():
+        db.add(CategoryPeriodTotal(category_id=category_id, period=period, total=total, count=count))
+    db.commit()
 
 # Seed default data
 def seed_default_data():
@@ -80,6 +201,16 @@ def seed_default_data():
             
             db.commit()
             print("Default categories created")
+        
+        # Backfill running totals for databases created before they existed
+        has_expenses = db.query(Transaction.id).filter(
+            Transaction.type == "expense",
+            Transaction.category_id.isnot(None),
+            Transaction.date.isnot(None)
+        ).first() is not None
+        if has_expenses and db.query(CategoryPeriodTotal).count() == 0:
+            rebuild_period_totals(db)
+            print("Budget period totals rebuilt")
     finally:
         db.close()
 
@@ -107,6 +238,7 @@ class TransactionCreate(BaseModel):
     date: date
     category_id: int
     type: str
+    currency: str = Field(REPORTING_CURRENCY, pattern=CURRENCY_PATTERN)
 
 class TransactionResponse(BaseModel):
     id: int
@@ -115,16 +247,47 @@ class TransactionResponse(BaseModel):
     date: date
     category_id: int
     type: str
+    currency: str
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class BudgetStatus(BaseModel):
+    category_id: int
+    category_name: str
+    budget_limit: float
+    spent: float
+    remaining: float
+    percentage: float
+    expense_count: int
+    threshold_reached: Optional[float] = None
+
+class BudgetUtilization(BaseModel):
+    period: str
+    thresholds: List[float]
+    budgets: List[BudgetStatus]
+
 class BudgetSummary(BaseModel):
     total_income: float
     total_expenses: float
     balance: float
     categories_spending: dict
+    currency: str = REPORTING_CURRENCY  # All amounts are converted to this currency
+    # Transactions in currencies with no exchange rate yet, left out of the totals above
+    unconverted_count: int = 0
+    unconverted_currencies: List[str] = []
+
+class ExchangeRateBase(BaseModel):
+    currency: str = Field(pattern=CURRENCY_PATTERN)
+    rate_date: date
+    rate: float = Field(gt=0)  # Reporting currency per unit of currency
+
+class ExchangeRateResponse(ExchangeRateBase):
+    id: int
+    
+    class Config:
+        from_attributes = True
 
 # Database dependency
 def get_db():
@@ -134,6 +297,30 @@ def get_db():
     finally:
         db.close()
 
+# Read-your-writes: a write's response carries the time until which its client
+# reads from the primary, and the client sends it back on later requests. A
+# header rather than a cookie: the frontend is on another site, where browsers
+# drop third-party cookies, and it follows the client across workers and
+# proxies, where a client address would be shared or change.
+PRIMARY_PIN_HEADER = "X-Primary-Pin-Until"
+replica_cycle = itertools.cycle(range(len(ReplicaSessions))) if ReplicaSessions else None
+
+def pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.headers.get(PRIMARY_PIN_HEADER, 0)) > time.time()
+    except ValueError:
+        return False
+
+def get_read_db(request: Request):
+    if replica_cycle is None or pinned_to_primary(request):
+        db = SessionLocal()
+    else:
+        db = ReplicaSessions[next(replica_cycle)]()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # FastAPI app
 app = FastAPI(title="Budget Tracker 2025 API", version="1.0.0")
 
@@ -144,8 +331,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PRIMARY_PIN_HEADER],
 )
 
+@app.middleware("http")
+async def track_recent_writes(request: Request, call_next):
+    response = await call_next(request)
+    if replica_cycle is not None and request.method in ("POST", "PUT", "PATCH", "DELETE") \
+            and response.status_code < 400:
+        response.headers[PRIMARY_PIN_HEADER] = str(time.time() + READ_YOUR_WRITES_SECONDS)
+    return response
+
+# Before the routes, so each one is created as a ProfiledRoute
+install_request_profiling(app)
+
 @app.get("/")
 def read_root():
     return {"message": "Budget Tracker 2025 API is running!", "version": "1.0.0"}
@@ -164,7 +363,7 @@ def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
     return db_category
 
 @app.get("/api/categories", response_model=List[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(db: Session = Depends(get_read_db)):
     # Try to get categories from database
     try:
         categories = db.query(Category).all()
@@ -184,20 +383,70 @@ def get_categories(db: Session = Depends(get_db)):
         {"id": 7, "name": "Other", "type": "expense", "budget_limit": None},
     ]
 
+def merge_category_into(db: Session, source_id: int, target_id: int) -> int:
+    """Move every transaction and running total from source to target and delete source.
+
+    One UPDATE moves the transactions; the caller commits.
+    """
+    moved = db.query(Transaction).filter(Transaction.category_id == source_id).update(
+        {Transaction.category_id: target_id}, synchronize_session=False
+    )
+    target_totals = {
+        row.period: row
+        for row in db.query(CategoryPeriodTotal).filter(CategoryPeriodTotal.category_id == target_id)
+    }
+    for row in db.query(CategoryPeriodTotal).filter(CategoryPeriodTotal.category_id == source_id).all():
+        existing = target_totals.get(row.period)
+        if existing is not None:
+            existing.total = (existing.total or 0) + (row.total or 0)
+            existing.count = (existing.count or 0) + (row.count or 0)
+            db.delete(row)
+        else:
+            row.category_id = target_id
+    db.query(Category).filter(Category.id == source_id).delete(synchronize_session=False)
+    return moved
+
+def get_merge_target(db: Session, source_id: int, target_id: int) -> Category:
+    if target_id == source_id:
+        raise HTTPException(status_code=400, detail="Category cannot be merged into itself")
+    target = db.query(Category).filter(Category.id == target_id).first()
+    if not target:
+        raise HTTPException(status_code=404, detail="Target category not found")
+    return target
+
 @app.delete("/api/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
+def delete_category(category_id: int, reassign_to: Optional[int] = None, db: Session = Depends(get_db)):
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    if reassign_to is not None:
+        get_merge_target(db, category_id, reassign_to)
+        merge_category_into(db, category_id, reassign_to)
+        db.commit()
+        return {"message": "Category deleted successfully"}
+    if db.query(Transaction.id).filter(Transaction.category_id == category_id).first():
+        raise HTTPException(status_code=409, detail="Category has transactions; pass reassign_to to move them first")
+    db.query(CategoryPeriodTotal).filter(CategoryPeriodTotal.category_id == category_id).delete()
     db.delete(category)
     db.commit()
     return {"message": "Category deleted successfully"}
 
+@app.post("/api/categories/{category_id}/merge")
+def merge_category(category_id: int, into: int, db: Session = Depends(get_db)):
+    if not db.query(Category).filter(Category.id == category_id).first():
+        raise HTTPException(status_code=404, detail="Category not found")
+    get_merge_target(db, category_id, into)
+    moved = merge_category_into(db, category_id, into)
+    db.commit()
+    return {"message": "Category merged successfully", "moved_transaction_count": moved}
+
 # Transaction endpoints
 @app.post("/api/transactions", response_model=TransactionResponse)
 def create_transaction(transaction: TransactionCreate, db: Session = Depends(get_db)):
     db_transaction = Transaction(**transaction.model_dump())
     db.add(db_transaction)
+    apply_period_total(db, db_transaction.type, db_transaction.category_id,
+                       db_transaction.date, db_transaction.amount, 1, db_transaction.currency)
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
@@ -207,7 +456,7 @@ def get_transactions(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(Transaction)
     
@@ -222,20 +471,36 @@ def get_transactions(
     return transactions
 
 @app.get("/api/transactions/{transaction_id}", response_model=TransactionResponse)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
+def get_transaction(transaction_id: int, db: Session = Depends(get_read_db)):
     transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
 
+def lock_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
+    """Load a transaction whose amount is about to be taken off the running totals.
+
+    The row stays locked until the caller commits, so a concurrent edit or
+    delete of it waits and then sees the new values instead of subtracting the
+    same old amount twice. SQLite ignores FOR UPDATE and only locks on a write,
+    so there a no-op UPDATE takes the write lock first.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(Transaction).where(Transaction.id == transaction_id).values(id=Transaction.id))
+    return db.query(Transaction).filter(Transaction.id == transaction_id).with_for_update().first()
+
 @app.put("/api/transactions/{transaction_id}", response_model=TransactionResponse)
 def update_transaction(transaction_id: int, transaction: TransactionCreate, db: Session = Depends(get_db)):
-    db_transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    db_transaction = lock_transaction(db, transaction_id)
     if not db_transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    apply_period_total(db, db_transaction.type, db_transaction.category_id,
+                       db_transaction.date, -(db_transaction.amount or 0), -1, db_transaction.currency)
     for key, value in transaction.model_dump().items():
         setattr(db_transaction, key, value)
+    apply_period_total(db, db_transaction.type, db_transaction.category_id,
+                       db_transaction.date, db_transaction.amount, 1, db_transaction.currency)
     
     db.commit()
     db.refresh(db_transaction)
@@ -243,9 +508,11 @@ def update_transaction(transaction_id: int, transaction: TransactionCreate, db:
 
 @app.delete("/api/transactions/{transaction_id}")
 def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = lock_transaction(db, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    apply_period_total(db, transaction.type, transaction.category_id,
+                       transaction.date, -(transaction.amount or 0), -1, transaction.currency)
     db.delete(transaction)
     db.commit()
     return {"message": "Transaction deleted successfully"}
@@ -255,34 +522,119 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
 def get_summary(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Transaction)
-    
+    # Sums in the reporting currency, converted row by row inside the aggregate
+    conditions = []
     if start_date:
-        query = query.filter(Transaction.date >= start_date)
+        conditions.append(Transaction.date >= start_date)
     if end_date:
-        query = query.filter(Transaction.date <= end_date)
+        conditions.append(Transaction.date <= end_date)
+    amount = reporting_amount(Transaction, ExchangeRate)
     
-    transactions = query.all()
+    totals = dict(db.query(Transaction.type, func.sum(amount)).filter(
+        *conditions, Transaction.type.in_(["income", "expense"])
+    ).group_by(Transaction.type).all())
+    total_income = totals.get("income") or 0
+    total_expenses = totals.get("expense") or 0
     
-    total_income = sum(t.amount for t in transactions if t.type == "income")
-    total_expenses = sum(t.amount for t in transactions if t.type == "expense")
+    categories_spending = {
+        name: total or 0
+        for name, total in db.query(Category.name, func.sum(amount)).join(
+            Transaction, Transaction.category_id == Category.id
+        ).filter(*conditions, Transaction.type == "expense").group_by(Category.name).all()
+    }
     
-    categories_spending = {}
-    for transaction in transactions:
-        if transaction.type == "expense" and transaction.category:
-            if transaction.category.name not in categories_spending:
-                categories_spending[transaction.category.name] = 0
-            categories_spending[transaction.category.name] += transaction.amount
+    unconverted_count, unconverted_currencies = unconverted_summary(
+        db, Transaction, ExchangeRate, *conditions, Transaction.type.in_(["income", "expense"])
+    )
     
     return BudgetSummary(
         total_income=total_income,
         total_expenses=total_expenses,
         balance=total_income - total_expenses,
-        categories_spending=categories_spending
+        categories_spending=categories_spending,
+        unconverted_count=unconverted_count,
+        unconverted_currencies=unconverted_currencies
+    )
+
+# Budget endpoints
+def get_budget_statuses(db: Session, year: int, month: int, thresholds: List[float]) -> List[BudgetStatus]:
+    period = f"{year:04d}-{month:02d}"
+    rows = db.query(Category, CategoryPeriodTotal).outerjoin(
+        CategoryPeriodTotal,
+        (CategoryPeriodTotal.category_id == Category.id) & (CategoryPeriodTotal.period == period)
+    ).filter(Category.budget_limit.isnot(None)).all()
+    
+    statuses = []
+    for category, period_total in rows:
+        spent = period_total.total if period_total else 0
+        count = period_total.count if period_total else 0
+        percentage = (spent / category.budget_limit * 100) if category.budget_limit > 0 else 0
+        reached = [t for t in thresholds if percentage >= t]
+        statuses.append(BudgetStatus(
+            category_id=category.id,
+            category_name=category.name,
+            budget_limit=category.budget_limit,
+            spent=spent,
+            remaining=category.budget_limit - spent,
+            percentage=percentage,
+            expense_count=count,
+            threshold_reached=max(reached) if reached else None
+        ))
+    return statuses
+
+@app.get("/api/budgets/{year}/{month}", response_model=BudgetUtilization)
+def get_budget_utilization(year: int, month: int, db: Session = Depends(get_read_db)):
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    thresholds = sorted(BUDGET_ALERT_THRESHOLDS)
+    return BudgetUtilization(
+        period=f"{year:04d}-{month:02d}",
+        thresholds=thresholds,
+        budgets=get_budget_statuses(db, year, month, thresholds)
     )
 
+@app.get("/api/budgets/alerts", response_model=List[BudgetStatus])
+def get_budget_alerts(db: Session = Depends(get_read_db)):
+    now = datetime.now()
+    thresholds = sorted(BUDGET_ALERT_THRESHOLDS)
+    statuses = get_budget_statuses(db, now.year, now.month, thresholds)
+    return [status for status in statuses if status.threshold_reached is not None]
+
+# Exchange rate endpoints
+@app.get("/api/exchange-rates", response_model=List[ExchangeRateResponse])
+def get_exchange_rates(currency: Optional[str] = None, db: Session = Depends(get_read_db)):
+    query = db.query(ExchangeRate)
+    if currency:
+        query = query.filter(ExchangeRate.currency == currency.upper())
+    return query.order_by(ExchangeRate.currency, ExchangeRate.rate_date).all()
+
+@app.put("/api/exchange-rates", response_model=List[ExchangeRateResponse])
+def put_exchange_rates(rates: List[ExchangeRateBase], db: Session = Depends(get_db)):
+    """Add rates, replacing any stored for the same currency and date"""
+    if any(rate.currency == REPORTING_CURRENCY for rate in rates):
+        raise HTTPException(status_code=400, detail=f"{REPORTING_CURRENCY} is the reporting currency and needs no rate")
+    existing = {
+        (row.currency, row.rate_date): row
+        for row in db.query(ExchangeRate).filter(ExchangeRate.currency.in_({rate.currency for rate in rates}))
+    }
+    for rate in rates:
+        row = existing.get((rate.currency, rate.rate_date))
+        if row is None:
+            row = ExchangeRate(**rate.model_dump())
+            db.add(row)
+            existing[(rate.currency, rate.rate_date)] = row
+        else:
+            row.rate = rate.rate
+    db.flush()
+    if rates:
+        # Budget totals hold converted amounts, so they follow the new rates
+        rebuild_period_totals(db)
+    else:
+        db.commit()
+    return db.query(ExchangeRate).order_by(ExchangeRate.currency, ExchangeRate.rate_date).all()
+
 # User endpoints (for frontend compatibility)
 @app.get("/api/users")
 def get_users(db: Session = Depends(get_db)):
@@ -298,7 +650,7 @@ def get_expenses(
     category_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(Transaction)
     
@@ -320,7 +672,7 @@ def create_expense(transaction: TransactionCreate, db: Session = Depends(get_db)
     return create_transaction(transaction, db)
 
 @app.get("/api/expenses/{expense_id}")
-def get_expense(expense_id: int, db: Session = Depends(get_db)):
+def get_expense(expense_id: int, db: Session = Depends(get_read_db)):
     return get_transaction(expense_id, db)
 
 @app.put("/api/expenses/{expense_id}")
@@ -333,7 +685,7 @@ def delete_expense(expense_id: int, db: Session = Depends(get_db)):
 
 # Summary endpoints
 @app.get("/api/summary/current-month")
-def get_current_month_summary(db: Session = Depends(get_db)):
+def get_current_month_summary(db: Session = Depends(get_read_db)):
     from datetime import datetime
     now = datetime.now()
     start_date = now.replace(day=1).date()
@@ -352,6 +704,7 @@ def get_current_month_summary(db: Session = Depends(get_db)):
         "users": []  # Empty for now - fixes the undefined error
     }
 
+
 if __name__ == "__main__":
     import uvicorn
     # Use PORT environment variable for Render
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from currency import REPORTING_CURRENCY
 from database import Base
 
 class User(Base):
@@ -28,13 +29,18 @@ class Category(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    # Ids are never reused, so an archived expense's id can't be handed to a new one
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     description = Column(String(200), nullable=True)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    fingerprint = Column(String(40), index=True)  # See crud.expense_fingerprint
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every update
+    currency = Column(String(3), nullable=False, default=REPORTING_CURRENCY, server_default=REPORTING_CURRENCY)
     
     # Foreign keys
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -42,4 +48,65 @@ class Expense(Base):
     
     # Relationships
     user = relationship("User", back_populates="expenses")
-    category = relationship("Category", back_populates="expenses")
\ No newline at end of file
+    category = relationship("Category", back_populates="expenses")
+
+class ArchivedExpense(Base):
+    """Cold tier: expenses moved out of the hot table by crud.archive_expenses"""
+    __tablename__ = "archived_expenses"
+    
+    id = Column(Integer, primary_key=True, index=True)  # Keeps the original expense id
+    amount = Column(Float, nullable=False)
+    description = Column(String(200), nullable=True)
+    date = Column(Date, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    fingerprint = Column(String(40), index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    currency = Column(String(3), nullable=False, default=REPORTING_CURRENCY, server_default=REPORTING_CURRENCY)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    
+    user = relationship("User")
+    category = relationship("Category")
+
+class ArchivedMonthlyTotal(Base):
+    """Precomputed totals of archived expenses per month, user and category.
+
+    Amounts are in the reporting currency, converted when the month was archived.
+    """
+    __tablename__ = "archived_monthly_totals"
+    __table_args__ = (UniqueConstraint("year", "month", "user_id", "category_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    total_amount = Column(Float, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+class ExchangeRate(Base):
+    """Value of one unit of currency in the reporting currency, from rate_date on"""
+    __tablename__ = "exchange_rates"
+    __table_args__ = (UniqueConstraint("currency", "rate_date"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False)
+    rate_date = Column(Date, nullable=False)
+    rate = Column(Float, nullable=False)
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key header; see crud.claim_idempotency_key"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("scope", "key"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(100), nullable=False)  # Endpoint path
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # None while the first request is still running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
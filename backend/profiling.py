@@ -0,0 +1,180 @@
+import contextvars
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# On-demand request profiling: send X-Profile-Token matching PROFILE_TOKEN to
+# profile that one request. The profile is written to PROFILE_DIR (open it with
+# pstats or snakeviz); add X-Profile-Format: text to get the report back instead
+# of the normal response body.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+# Statements slower than SLOW_QUERY_MS are logged with their query plan
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+
+logger = logging.getLogger("budget_tracker.profiling")
+slow_query_logger = logging.getLogger("budget_tracker.slow_query")
+
+current_profile: contextvars.ContextVar[Optional[cProfile.Profile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+def profile_call(func):
+    """Wrap an endpoint so an active request profile runs in whichever thread executes it.
+
+    Sync endpoints run on threadpool threads, and cProfile only sees the thread
+    that enabled it, so profiling has to be switched on around the call itself.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return await func(*args, **kwargs)
+            profile.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.disable()
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+    return wrapper
+
+def profile_report(profile: cProfile.Profile, limit: int = 50) -> str:
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+class ProfiledRoute(APIRoute):
+    """Route class whose endpoint joins the active request profile, if any"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profile_call(endpoint), **kwargs)
+
+def profiling_requested(request: Request) -> bool:
+    token = request.headers.get("X-Profile-Token")
+    return token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+def install_request_profiling(app: FastAPI):
+    """Enable token-gated request profiling; call before any route is declared"""
+    if not PROFILE_TOKEN:
+        return
+    if any(isinstance(route, APIRoute) for route in app.routes):
+        raise RuntimeError("install_request_profiling() must run before routes are declared")
+
+    app.router.route_class = ProfiledRoute
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not profiling_requested(request):
+            return await call_next(request)
+
+        profile = cProfile.Profile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            current_profile.reset(token)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+        path = os.path.join(
+            PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{request.method}_{slug}.prof"
+        )
+        profile.dump_stats(path)
+        logger.info("Profiled %s %s in %.1f ms -> %s", request.method, request.url.path, elapsed_ms, path)
+
+        if request.headers.get("X-Profile-Format") == "text":
+            return PlainTextResponse(
+                f"{request.method} {request.url.path} -> {response.status_code} in {elapsed_ms:.1f} ms\n"
+                f"Saved to {path}\n\n{profile_report(profile)}",
+                headers={"X-Profile-File": path}
+            )
+        response.headers["X-Profile-File"] = path
+        return response
+
+EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+def explain_statement(cursor, statement: str, parameters, dialect_name: str) -> str:
+    """Query plan for a statement, run on a fresh cursor of the same DBAPI connection.
+
+    The EXPLAIN runs inside a savepoint: on Postgres any failed statement aborts
+    the surrounding transaction, and the request's own transaction must survive
+    a plan that can't be produced.
+    """
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(prefix + statement, parameters or ())
+            plan = "\n".join(" | ".join(str(value) for value in row) for row in explain_cursor.fetchall())
+        except Exception as e:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            plan = f"(plan unavailable: {e})"
+        explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as e:
+        return f"(plan unavailable: {e})"
+    finally:
+        explain_cursor.close()
+
+def install_slow_query_log(engine, threshold_ms: Optional[float] = None):
+    """Log statements slower than threshold_ms (default SLOW_QUERY_MS) with their plan"""
+    if threshold_ms is None:
+        if not SLOW_QUERY_MS:
+            return
+        threshold_ms = float(SLOW_QUERY_MS)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "handle_error")
+    def discard_timer(exception_context):
+        start_times = exception_context.connection.info.get("query_start_times") \
+            if exception_context.connection is not None else None
+        if start_times:
+            start_times.pop()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_times"].pop()) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+        if executemany:
+            plan = "(executemany: plan not captured)"
+        elif statement.lstrip().split(None, 1)[0].upper() in EXPLAINABLE:
+            plan = explain_statement(cursor, statement, parameters, engine.dialect.name)
+        else:
+            plan = "(not a query)"
+        slow_query_logger.warning(
+            "Slow query (%.1f ms): %s\nParameters: %r\nPlan:\n%s", elapsed_ms, statement, parameters, plan
+        )
@@ -1,7 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import datetime as dt
 from datetime import date, datetime
 from typing import Optional, List
 
+from currency import CURRENCY_PATTERN, REPORTING_CURRENCY
+
+
 # User schemas
 class UserBase(BaseModel):
     name: str
@@ -44,6 +48,7 @@ class ExpenseBase(BaseModel):
     date: date
     user_id: int
     category_id: int
+    currency: str = Field(REPORTING_CURRENCY, pattern=CURRENCY_PATTERN)
 
 class ExpenseCreate(ExpenseBase):
     pass
@@ -51,12 +56,17 @@ class ExpenseCreate(ExpenseBase):
 class ExpenseUpdate(BaseModel):
     amount: Optional[float] = None
     description: Optional[str] = None
-    date: Optional[date] = None
+    date: Optional[dt.date] = None  # dt.date: a bare "date" here would resolve to this field's None default
     user_id: Optional[int] = None
     category_id: Optional[int] = None
+    currency: Optional[str] = Field(None, pattern=CURRENCY_PATTERN)
+    # Optional. The version the client edited: a mismatch is rejected with 409.
+    # Without it the update applies unconditionally (last write wins).
+    version: Optional[int] = None
 
 class Expense(ExpenseBase):
     id: int
+    version: int = 1
     created_at: datetime
     updated_at: Optional[datetime] = None
     user: User
@@ -65,6 +75,18 @@ class Expense(ExpenseBase):
     class Config:
         from_attributes = True
 
+# Compact expense list: parallel column arrays plus one copy of each referenced user/category
+class CompactExpenseList(BaseModel):
+    ids: List[int]
+    dates: List[date]
+    amounts: List[float]
+    user_ids: List[int]
+    category_ids: List[int]
+    descriptions: List[Optional[str]]
+    currencies: List[str]
+    users: List[User]
+    categories: List[Category]
+
 # CSV Import schemas
 class CSVRow(BaseModel):
     date: str
@@ -81,6 +103,7 @@ class ImportPreview(BaseModel):
 
 # Dashboard/Summary schemas
 class CategorySummary(BaseModel):
+    category_id: int
     category_name: str
     category_color: str
     total_amount: float
@@ -88,6 +111,7 @@ class CategorySummary(BaseModel):
     percentage: float
 
 class UserSummary(BaseModel):
+    user_id: int
     user_name: str
     user_color: str
     total_amount: float
@@ -95,10 +119,66 @@ class UserSummary(BaseModel):
     percentage: float
 
 class MonthlySummary(BaseModel):
+    """Totals for one month in the reporting currency.
+
+    Archived expenses contribute totals converted when they were archived, so
+    exchange rates added or changed later don't affect archived months.
+    """
     year: int
     month: int
     total_amount: float
     expense_count: int
     daily_average: float
     categories: List[CategorySummary]
-    users: List[UserSummary]
\ No newline at end of file
+    users: List[UserSummary]
+    currency: str = REPORTING_CURRENCY  # All amounts are converted to this currency
+    # Expenses in currencies with no exchange rate yet, left out of the totals and counts above
+    unconverted_count: int = 0
+    unconverted_currencies: List[str] = []
+
+class ForecastEntry(BaseModel):
+    id: int
+    name: str
+    color: str
+    month_to_date: float
+    forecast_amount: Optional[float]  # Model's estimate for the whole month; None without history
+    projected_total: float
+
+class SpendingForecast(BaseModel):
+    year: int
+    month: int
+    days_elapsed: int
+    days_in_month: int
+    month_to_date: float
+    projected_total: float
+    categories: List[ForecastEntry]
+    users: List[ForecastEntry]
+
+# Expense without nested user/category; clients resolve the ids against the reference lists
+class ExpenseRecord(BaseModel):
+    id: int
+    date: dt.date
+    amount: float
+    description: Optional[str] = None
+    user_id: int
+    category_id: int
+    currency: str
+
+class DashboardData(BaseModel):
+    summary: MonthlySummary
+    forecast: SpendingForecast
+    recent_expenses: List[ExpenseRecord]
+    users: List[User]
+    categories: List[Category]
+
+# Exchange rate schemas
+class ExchangeRateBase(BaseModel):
+    currency: str = Field(pattern=CURRENCY_PATTERN)
+    rate_date: date
+    rate: float = Field(gt=0)  # Reporting currency per unit of currency
+
+class ExchangeRate(ExchangeRateBase):
+    id: int
+    
+    class Config:
+        from_attributes = True
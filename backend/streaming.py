@@ -0,0 +1,66 @@
+import json
+import logging
+import zlib
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional: without it, clients that ask for br get gzip
+    brotli = None
+
+logger = logging.getLogger("budget_tracker.streaming")
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, or None for identity"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def ndjson_batches(records: Iterable[dict], batch_size: int) -> Iterator[bytes]:
+    """One bytes chunk of newline-delimited JSON per batch of records"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield "".join(json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+
+class StreamStats:
+    def __init__(self):
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+
+def compressed(chunks: Iterable[bytes], encoding: Optional[str], stats: StreamStats, label: str) -> Iterator[bytes]:
+    """Compress a chunk stream, flushing after every chunk so the client gets each batch as it's ready"""
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        compress, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    else:
+        compress = flush = finish = None
+
+    for chunk in chunks:
+        stats.raw_bytes += len(chunk)
+        out = chunk if compress is None else compress(chunk) + flush()
+        stats.wire_bytes += len(out)
+        if out:
+            yield out
+    if finish is not None:
+        out = finish()
+        stats.wire_bytes += len(out)
+        if out:
+            yield out
+    logger.info("%s streamed %d bytes as %d bytes on the wire (%s)",
+                label, stats.raw_bytes, stats.wire_bytes, encoding or "identity")
@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy.orm import sessionmaker
+
+import crud, models
+from database import add_autoincrement, add_missing_columns, create_sqlite_engine, writer_for
+from profiling import install_slow_query_log
+
+# Multi-tenant mode: each household gets its own SQLite file, picked per request
+# from the X-Household header (or ?household= for EventSource clients).
+MULTI_TENANT = os.getenv("MULTI_TENANT", "off").lower() in ("1", "true", "on")
+TENANT_DATABASE_DIR = os.getenv("TENANT_DATABASE_DIR", "./households")
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "32"))
+
+HOUSEHOLD_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+class TenantEnginePool:
+    """Bounded LRU of open household databases.
+
+    A household's database is created and seeded the first time this process
+    opens it. When the pool is full the least recently used engine is disposed;
+    sessions already using it finish normally. Each eviction listener is then
+    called with the household, so per-household caches are dropped with it.
+    """
+
+    def __init__(self, directory: str, size: int):
+        self.directory = directory
+        self.size = size
+        self.eviction_listeners: List[Callable[[str], None]] = []
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._opening = {}
+
+    def database_path(self, household: str) -> str:
+        return os.path.join(self.directory, f"{household}.db")
+
+    def sessionmaker_for(self, household: str) -> sessionmaker:
+        with self._lock:
+            factory = self._sessions.get(household)
+            if factory is not None:
+                self._sessions.move_to_end(household)
+                return factory
+            opening = self._opening.setdefault(household, threading.Lock())
+
+        # Open outside the pool lock so one slow first access doesn't block other households
+        with opening:
+            with self._lock:
+                factory = self._sessions.get(household)
+                if factory is not None:
+                    self._sessions.move_to_end(household)
+                    return factory
+            factory = self._open(household)
+            evicted = []
+            with self._lock:
+                self._sessions[household] = factory
+                self._opening.pop(household, None)
+                while len(self._sessions) > self.size:
+                    evicted.append(self._sessions.popitem(last=False))
+            for evicted_household, evicted_factory in evicted:
+                evicted_factory.kw["bind"].dispose()
+                for listener in self.eviction_listeners:
+                    listener(evicted_household)
+            return factory
+
+    def _open(self, household: str) -> sessionmaker:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.database_path(household)
+        db_engine = create_sqlite_engine(path)
+        # Household engines serve every request in this mode, so they log slow queries, not the default engine
+        install_slow_query_log(db_engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine,
+                               info={"household": household})
+        # Several workers may open a new household at once; only one creates and seeds it
+        with writer_for(path).hold():
+            models.Base.metadata.create_all(bind=db_engine)
+            add_missing_columns(db_engine, models.Base.metadata)
+            add_autoincrement(db_engine, models.Expense.__table__, reserved_ids=[models.ArchivedExpense.id])
+            db = factory()
+            try:
+                crud.create_default_categories(db)
+                crud.create_default_user(db)
+                crud.backfill_expense_fingerprints(db)
+            finally:
+                db.close()
+        return factory
+
+    def sessionmakers(self) -> List[sessionmaker]:
+        """The open households' session factories, without touching their LRU order"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def open_count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+tenant_pool = TenantEnginePool(TENANT_DATABASE_DIR, TENANT_POOL_SIZE)
+
+def household_from_request(request: Request) -> str:
+    household = (request.headers.get("X-Household") or request.query_params.get("household") or "").lower()
+    if not household:
+        raise HTTPException(status_code=400, detail="X-Household header is required")
+    if not HOUSEHOLD_PATTERN.fullmatch(household):
+        raise HTTPException(status_code=400, detail="Invalid household id")
+    return household
+
+def tenant_session(household: str):
+    return tenant_pool.sessionmaker_for(household)()
+
+def get_tenant_db(request: Request):
+    """Drop-in replacement for database.get_db in multi-tenant mode"""
+    db = tenant_session(household_from_request(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def household_or_none(request: Request) -> Optional[str]:
+    return household_from_request(request) if MULTI_TENANT else None
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Both apps open their SQLite files relative to the working directory at import
+os.chdir(tempfile.mkdtemp(prefix="budget-tests-"))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./simple.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def simple():
+    """main_simple with empty tables and the default categories"""
+    import main_simple
+    main_simple.Base.metadata.drop_all(bind=main_simple.engine)
+    main_simple.Base.metadata.create_all(bind=main_simple.engine)
+    main_simple.seed_default_data()
+    return main_simple
+
+
+@pytest.fixture
+def simple_client(simple):
+    from fastapi.testclient import TestClient
+    with TestClient(simple.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    """A session on main's database, emptied and seeded with the defaults"""
+    import crud, models
+    from database import SessionLocal, engine
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    crud.create_default_categories(session)
+    crud.create_default_user(session)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as client:
+        yield client
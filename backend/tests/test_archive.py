@@ -0,0 +1,72 @@
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import crud, models, schemas
+from database import add_autoincrement
+
+
+def add(db, on, amount=10):
+    return crud.create_expense(db, schemas.ExpenseCreate(date=on, amount=amount, user_id=1, category_id=1))
+
+
+def test_archived_ids_are_never_reused(db):
+    add(db, date(2020, 1, 1))
+    newest = add(db, date(2020, 1, 2))
+    assert crud.archive_expenses(db, before=date(2020, 2, 1)) == 2
+
+    replacement = add(db, date(2020, 1, 3))
+    assert replacement.id > newest.id
+    # Archiving the new row must not collide with the archived one
+    assert crud.archive_expenses(db, before=date(2020, 2, 1)) == 1
+    assert db.query(models.ArchivedExpense).count() == 3
+
+
+def test_archived_expenses_can_be_read_but_not_changed(client, db):
+    expense_id = add(db, date(2020, 1, 1)).id
+    crud.archive_expenses(db, before=date(2020, 2, 1))
+
+    assert client.get(f"/api/expenses/{expense_id}").status_code == 200
+    update = client.put(f"/api/expenses/{expense_id}", json={"amount": 99, "version": 1})
+    assert update.status_code == 409
+    assert "archived" in update.json()["detail"]
+    assert client.delete(f"/api/expenses/{expense_id}").status_code == 409
+    assert client.delete("/api/expenses/9999").status_code == 404
+
+
+def test_older_databases_are_migrated_to_autoincrement(tmp_path, monkeypatch):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    table = models.Expense.__table__
+    monkeypatch.setitem(table.dialect_options["sqlite"], "autoincrement", False)
+    models.Base.metadata.create_all(bind=db_engine)
+    monkeypatch.undo()
+    with db_engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, name) VALUES (1, 'You')"))
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Food')"))
+        for expense_id in (1, 2):
+            conn.execute(text(
+                "INSERT INTO expenses (id, amount, date, user_id, category_id, version, currency) "
+                f"VALUES ({expense_id}, 5, '2025-01-01', 1, 1, 1, 'USD')"
+            ))
+        # Archived before the migration, with an id above the hot table's max
+        conn.execute(text(
+            "INSERT INTO archived_expenses (id, amount, date, user_id, category_id, version, currency) "
+            "VALUES (7, 5, '2019-01-01', 1, 1, 1, 'USD')"
+        ))
+
+    add_autoincrement(db_engine, table, reserved_ids=[models.ArchivedExpense.id])
+    add_autoincrement(db_engine, table, reserved_ids=[models.ArchivedExpense.id])  # Already migrated: no-op
+
+    with db_engine.connect() as conn:
+        assert "AUTOINCREMENT" in conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE name = 'expenses'"
+        )).scalar().upper()
+    assert {index["name"] for index in inspect(db_engine).get_indexes("expenses")} >= {
+        index.name for index in table.indexes
+    }
+    db = sessionmaker(bind=db_engine)()
+    assert db.query(models.Expense).count() == 2
+    assert add(db, date(2025, 2, 1)).id == 8
+    db.close()
+    db_engine.dispose()
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import backup
+from database import writer_for
+
+
+def make_database(path, rows=2000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.executemany("INSERT INTO items (body) VALUES (?)", [("x" * 500,)] * rows)
+    conn.commit()
+    conn.close()
+
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_blocked_writes_keep_uncoordinated_writers_out(tmp_path):
+    path = str(tmp_path / "live.db")
+    make_database(path, rows=1)
+    writer = sqlite3.connect(path, timeout=0.1)
+    with backup.writes_blocked(path):
+        assert count(path) == 1  # Readers still get in
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            writer.execute("INSERT INTO items (body) VALUES ('late')")
+            writer.commit()
+    writer.rollback()
+    writer.execute("INSERT INTO items (body) VALUES ('late')")
+    writer.commit()
+    writer.close()
+
+
+def test_rollback_journal_snapshot_falls_back_to_blocking_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "WRITE_COORDINATION", "off")
+    monkeypatch.setattr(backup, "BACKUP_MAX_RESTARTS", 1)
+    path = str(tmp_path / "live.db")
+    make_database(path)
+    stop = threading.Event()
+
+    def keep_writing():
+        conn = sqlite3.connect(path, timeout=30)
+        while not stop.is_set():
+            conn.execute("INSERT INTO items (body) VALUES ('during')")
+            conn.commit()
+            time.sleep(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=keep_writing)
+    thread.start()
+    try:
+        stats = backup.snapshot_database(path, str(tmp_path / "snap.db"), pages=4, pause_ms=2)
+    finally:
+        stop.set()
+        thread.join()
+    assert not stats.wal and stats.restarts > 1 and stats.blocked_writes
+    snapshot = sqlite3.connect(str(tmp_path / "snap.db"))
+    assert snapshot.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    snapshot.close()
+    assert 2000 <= count(str(tmp_path / "snap.db")) <= count(path)
+
+
+def test_restore_without_coordination_requires_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "WRITE_COORDINATION", "off")
+    snapshot, target = str(tmp_path / "snap.db"), str(tmp_path / "live.db")
+    make_database(snapshot, rows=3)
+    make_database(target, rows=10)
+    with pytest.raises(RuntimeError, match="offline"):
+        backup.restore_database(snapshot, target)
+    assert count(target) == 10
+    backup.restore_database(snapshot, target, offline=True)
+    assert count(target) == 3
+
+
+def test_restore_under_single_writer_waits_for_the_writer_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "WRITE_COORDINATION", "single-writer")
+    snapshot, target = str(tmp_path / "snap.db"), str(tmp_path / "live.db")
+    make_database(snapshot, rows=3)
+    make_database(target, rows=10)
+    held = threading.Event()
+
+    def hold_writer_lock():
+        with writer_for(target).hold():
+            held.set()
+            time.sleep(0.3)
+
+    thread = threading.Thread(target=hold_writer_lock)
+    thread.start()
+    held.wait()
+    start = time.monotonic()
+    backup.restore_database(snapshot, target)
+    assert time.monotonic() - start >= 0.25
+    thread.join()
+    assert count(target) == 3
+
+
+def test_household_ids_must_match_in_full():
+    with pytest.raises(ValueError):
+        backup.household_path("smiths\n")
@@ -0,0 +1,118 @@
+import time
+from datetime import date
+from threading import Thread
+
+
+def totals(simple):
+    db = simple.SessionLocal()
+    try:
+        return {
+            (row.category_id, row.period): (round(row.total, 2), row.count)
+            for row in db.query(simple.CategoryPeriodTotal).all()
+        }
+    finally:
+        db.close()
+
+
+def expense(client, amount, category_id=1, on="2025-03-10", type="expense"):
+    response = client.post("/api/transactions", json={
+        "description": "test", "amount": amount, "date": on, "category_id": category_id, "type": type
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_create_update_delete_keep_totals_in_step(simple, simple_client):
+    first = expense(simple_client, 10)
+    expense(simple_client, 5.5)
+    expense(simple_client, 100, type="income")
+    assert totals(simple) == {(1, "2025-03"): (15.5, 2)}
+
+    simple_client.put(f"/api/transactions/{first['id']}", json={
+        "description": "moved", "amount": 12, "date": "2025-04-01", "category_id": 2, "type": "expense"
+    })
+    assert totals(simple) == {(1, "2025-03"): (5.5, 1), (2, "2025-04"): (12, 1)}
+
+    simple_client.delete(f"/api/transactions/{first['id']}")
+    assert totals(simple)[(2, "2025-04")] == (0, 0)
+
+
+def test_concurrent_increments_are_not_lost(simple):
+    def add():
+        db = simple.SessionLocal()
+        try:
+            for _ in range(20):
+                simple.apply_period_total(db, "expense", 1, date(2025, 3, 1), 1.0, 1)
+                db.commit()
+        finally:
+            db.close()
+
+    threads = [Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert totals(simple) == {(1, "2025-03"): (80, 80)}
+
+
+def test_backfill_skips_databases_with_only_income(simple, simple_client, monkeypatch):
+    expense(simple_client, 100, type="income")
+    rebuilds = []
+    monkeypatch.setattr(simple, "rebuild_period_totals", rebuilds.append)
+    simple.seed_default_data()
+    assert rebuilds == []
+
+
+def test_backfill_rebuilds_missing_totals(simple, simple_client):
+    expense(simple_client, 7)
+    db = simple.SessionLocal()
+    db.query(simple.CategoryPeriodTotal).delete()
+    db.commit()
+    db.close()
+    simple.seed_default_data()
+    assert totals(simple) == {(1, "2025-03"): (7, 1)}
+
+
+def test_concurrent_edits_and_deletes_keep_totals_in_step(simple, simple_client, monkeypatch):
+    from fastapi import HTTPException
+    original = simple.apply_period_total
+
+    def slow_apply(*args, **kwargs):
+        # Widen the gap between reading the old row and adjusting the totals
+        time.sleep(0.01)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(simple, "apply_period_total", slow_apply)
+    edited = expense(simple_client, 10)
+    deleted = expense(simple_client, 20)
+
+    def edit(amount):
+        db = simple.SessionLocal()
+        try:
+            simple.update_transaction(edited["id"], simple.TransactionCreate(
+                description="edited", amount=amount, date=date(2025, 3, 10), category_id=1, type="expense"
+            ), db)
+        finally:
+            db.close()
+
+    def delete():
+        db = simple.SessionLocal()
+        try:
+            simple.delete_transaction(deleted["id"], db)
+        except HTTPException:
+            pass
+        finally:
+            db.close()
+
+    threads = [Thread(target=edit, args=(amount,)) for amount in (1, 2, 3, 4)]
+    threads += [Thread(target=delete) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = simple.SessionLocal()
+    final = db.query(simple.Transaction).one()
+    db.close()
+    assert final.id == edited["id"]
+    assert totals(simple) == {(1, "2025-03"): (final.amount, 1)}
@@ -0,0 +1,28 @@
+from datetime import date
+
+import crud, schemas
+
+
+def test_compact_page_matches_the_full_page(client, db):
+    partner = crud.create_user(db, schemas.UserCreate(name="Partner"))
+    for day, user_id in ((1, 1), (2, partner.id), (3, 1)):
+        crud.create_expense(db, schemas.ExpenseCreate(
+            date=date(2025, 3, day), amount=day * 10, description=f"Expense {day}", user_id=user_id, category_id=day
+        ))
+
+    full = client.get("/api/expenses", params={"limit": 2}).json()
+    compact = client.get("/api/expenses", params={"limit": 2, "format": "compact"}).json()
+
+    assert compact["ids"] == [expense["id"] for expense in full]
+    assert compact["dates"] == [expense["date"] for expense in full]
+    assert compact["amounts"] == [expense["amount"] for expense in full]
+    assert compact["user_ids"] == [expense["user_id"] for expense in full]
+    assert compact["descriptions"] == [expense["description"] for expense in full]
+    # Each referenced user and category is sent once
+    assert sorted(user["id"] for user in compact["users"]) == sorted(set(compact["user_ids"]))
+    assert sorted(category["id"] for category in compact["categories"]) == sorted(set(compact["category_ids"]))
+
+
+def test_compact_empty_page(client):
+    compact = client.get("/api/expenses", params={"format": "compact"}).json()
+    assert compact["ids"] == [] and compact["users"] == [] and compact["categories"] == []
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import crud, currency, models, schemas
+from currency import REPORTING_CURRENCY
+from live_summary import summary_deltas
+
+
+def add(db, amount, currency, on=date(2025, 6, 10)):
+    return crud.create_expense(db, schemas.ExpenseCreate(
+        date=on, amount=amount, user_id=1, category_id=1, currency=currency
+    ))
+
+
+def test_summary_leaves_out_and_reports_unconvertible_expenses(db):
+    crud.upsert_exchange_rates(db, [schemas.ExchangeRateBase(currency="EUR", rate_date=date(2025, 6, 1), rate=2)])
+    add(db, 10, REPORTING_CURRENCY)
+    add(db, 5, "EUR")
+    add(db, 1000, "JPY")
+    add(db, 2000, "CHF")
+
+    summary = crud.get_monthly_summary(db, 2025, 6)
+    assert summary.total_amount == 20 and summary.expense_count == 2
+    assert (summary.unconverted_count, summary.unconverted_currencies) == (2, ["CHF", "JPY"])
+    assert [(entry.total_amount, entry.expense_count) for entry in summary.categories] == [(20, 2)]
+    assert "archived" in schemas.MonthlySummary.model_json_schema()["description"]
+
+
+def test_unconvertible_expenses_are_not_archived_until_they_have_a_rate(db):
+    add(db, 10, REPORTING_CURRENCY, on=date(2020, 1, 5))
+    stranded = add(db, 1000, "JPY", on=date(2020, 1, 6)).id
+    assert crud.archive_expenses(db, before=date(2020, 2, 1)) == 1
+    assert crud.get_expense(db, stranded) is not None
+
+    crud.upsert_exchange_rates(db, [schemas.ExchangeRateBase(currency="JPY", rate_date=date(2020, 1, 1), rate=0.01)])
+    assert crud.archive_expenses(db, before=date(2020, 2, 1)) == 1
+    [total] = db.query(models.ArchivedMonthlyTotal).all()
+    assert (total.total_amount, total.expense_count) == (20, 2)
+
+
+def test_live_deltas_skip_unconverted_snapshots(db):
+    snapshot = crud.expense_snapshot(db, crud.get_expense(db, add(db, 1000, "JPY").id))
+    assert snapshot["amount"] is None
+    assert summary_deltas(None, snapshot) == []
+
+
+def test_budget_totals_skip_unconvertible_transactions(simple, simple_client):
+    category_id = simple_client.get("/api/categories").json()[0]["id"]
+    transaction = {"description": "x", "date": "2025-06-10", "category_id": category_id, "type": "expense"}
+    simple_client.post("/api/transactions", json={**transaction, "amount": 10})
+    simple_client.post("/api/transactions", json={**transaction, "amount": 1000, "currency": "JPY"})
+
+    summary = simple_client.get("/api/summary").json()
+    assert summary["total_expenses"] == 10
+    assert (summary["unconverted_count"], summary["unconverted_currencies"]) == (1, ["JPY"])
+    db = simple.SessionLocal()
+    try:
+        [total] = db.query(simple.CategoryPeriodTotal).all()
+        assert (total.total, total.count) == (10, 1)
+    finally:
+        db.close()
+
+    simple_client.put("/api/exchange-rates", json=[{"currency": "JPY", "rate_date": "2025-01-01", "rate": 0.01}])
+    assert simple_client.get("/api/summary").json()["total_expenses"] == 20
+
+
+def test_reporting_currency_is_validated_on_import():
+    result = subprocess.run([sys.executable, "-c", "import currency"], capture_output=True, text=True,
+                            cwd=os.path.dirname(currency.__file__),
+                            env={**os.environ, "REPORTING_CURRENCY": "USD'; DROP TABLE x; --"})
+    assert result.returncode != 0 and "REPORTING_CURRENCY" in result.stderr
@@ -0,0 +1,53 @@
+from datetime import date
+
+from sqlalchemy import event
+
+import crud, models, schemas
+from forecast import forecast_cache
+
+
+def test_dashboard_bootstrap_matches_the_separate_endpoints(client, db):
+    today = date.today()
+    crud.create_expense(db, schemas.ExpenseCreate(date=today, amount=12, description="Coffee", user_id=1, category_id=1))
+    dashboard = client.get("/api/dashboard", params={"recent": 3}).json()
+
+    assert dashboard["summary"] == client.get(f"/api/summary/monthly/{today.year}/{today.month}").json()
+    assert dashboard["forecast"] == client.get("/api/forecast/current-month").json()
+    assert [row["description"] for row in dashboard["recent_expenses"]] == ["Coffee"]
+    assert dashboard["users"] == client.get("/api/users").json()
+    assert dashboard["categories"] == client.get("/api/categories").json()
+
+
+def test_dashboard_lists_every_user_and_category(client, db):
+    db.add_all(models.User(name=f"User {n}") for n in range(150))
+    db.add_all(models.Category(name=f"Category {n}") for n in range(150))
+    db.commit()
+    last_user = db.query(models.User).order_by(models.User.id.desc()).first()
+    today = date.today()
+    crud.create_expense(db, schemas.ExpenseCreate(date=today, amount=5, user_id=last_user.id, category_id=1))
+
+    dashboard = client.get("/api/dashboard").json()
+    assert len(dashboard["users"]) == db.query(models.User).count() > 100
+    assert len(dashboard["categories"]) == db.query(models.Category).count() > 100
+    assert last_user.id in {entry["id"] for entry in dashboard["forecast"]["users"]}
+
+
+def test_dashboard_takes_fewer_queries_than_the_separate_calls(client, db):
+    crud.create_expense(db, schemas.ExpenseCreate(date=date.today(), amount=12, user_id=1, category_id=1))
+    separate = ["/api/summary/current-month", "/api/expenses?limit=5", "/api/users", "/api/categories",
+                "/api/forecast/current-month"]
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        counts = {}
+        for label, paths in (("separate", separate), ("dashboard", ["/api/dashboard"])):
+            # Compare with a cold forecast cache on both sides
+            forecast_cache.forget_household(None)
+            del statements[:]
+            for path in paths:
+                assert client.get(path).status_code == 200
+            counts[label] = len(statements)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert counts["dashboard"] < counts["separate"]
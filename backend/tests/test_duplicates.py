@@ -0,0 +1,50 @@
+from datetime import date
+
+import crud, schemas
+
+CSV = (
+    "date,amount,category,description,user\n"
+    "2025-03-01,12.50,Food,Lunch,You\n"
+    "2025-03-01,12.50,Food,  lunch ,You\n"
+    "2025-03-02,40.00,Food,Groceries,You\n"
+)
+
+
+def preview(client, content=CSV):
+    response = client.post("/api/import/csv/preview", files={"file": ("expenses.csv", content, "text/csv")})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_preview_flags_file_and_database_duplicates(client, db):
+    crud.create_expense(db, schemas.ExpenseCreate(
+        date=date(2025, 3, 2), amount=40, description="groceries", user_id=1, category_id=1
+    ))
+    data = preview(client)
+    assert [row["duplicate"] for row in data["valid_rows"]] == [None, "file", "database"]
+    assert data["summary"]["duplicate_count"] == 2
+
+
+def test_confirm_keeps_duplicates_unless_asked_to_skip(client):
+    data = preview(client)
+    kept = client.post("/api/import/csv/confirm", json=data).json()
+    assert kept["created_count"] == 3
+    assert kept["skipped_duplicate_count"] == 0
+
+    skipped = client.post("/api/import/csv/confirm", json={**data, "skip_duplicates": True}).json()
+    assert skipped["created_count"] == 0
+    assert skipped["skipped_duplicate_count"] == 3
+
+
+def test_existing_fingerprints_are_looked_up_in_chunks_on_both_tiers(db):
+    for day in (1, 2, 3):
+        crud.create_expense(db, schemas.ExpenseCreate(
+            date=date(2020, 1, day), amount=day, description="old", user_id=1, category_id=1
+        ))
+    assert crud.archive_expenses(db, before=date(2020, 2, 1)) == 3
+    stored = {fingerprint for (fingerprint,) in db.query(crud.models.Expense.fingerprint)}
+    stored |= {fingerprint for (fingerprint,) in db.query(crud.models.ArchivedExpense.fingerprint)}
+    assert len(stored) == 3
+
+    candidates = list(stored) + [f"{n:040x}" for n in range(1000)]
+    assert crud.get_existing_fingerprints(db, candidates, batch_size=7) == stored
@@ -0,0 +1,125 @@
+from datetime import date
+
+from sqlalchemy import event
+
+import crud, main, models, schemas
+
+
+def add(db, **fields):
+    values = dict(date=date(2025, 3, 1), amount=10, description="Lunch", user_id=1, category_id=1)
+    return crud.create_expense(db, schemas.ExpenseCreate(**{**values, **fields})).id
+
+
+def test_stale_versions_are_rejected(client, db):
+    expense_id = add(db)
+    first = client.put(f"/api/expenses/{expense_id}", json={"amount": 12, "version": 1})
+    assert first.status_code == 200 and first.json()["version"] == 2
+    assert client.put(f"/api/expenses/{expense_id}", json={"amount": 13, "version": 1}).status_code == 409
+    assert client.delete(f"/api/expenses/{expense_id}", params={"version": 1}).status_code == 409
+    assert client.delete(f"/api/expenses/{expense_id}", params={"version": 2}).status_code == 200
+    assert client.put(f"/api/expenses/{expense_id}", json={"amount": 14}).status_code == 404
+
+
+def test_unversioned_updates_apply(client, db):
+    expense_id = add(db)
+    response = client.put(f"/api/expenses/{expense_id}", json={"description": "Dinner"})
+    assert response.status_code == 200
+    assert response.json()["description"] == "Dinner" and response.json()["version"] == 2
+
+
+def test_partial_edit_refingerprints_in_the_same_statement(db):
+    expense_id = add(db)
+    partner_id = crud.create_user(db, schemas.UserCreate(name="Partner")).id
+    db.expire_all()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        result = crud.update_expense(db, expense_id, schemas.ExpenseUpdate(user_id=partner_id, amount=7.5))
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    writes = [statement for statement in statements if not statement.lstrip().upper().startswith("SELECT")]
+    assert len(writes) == 1 and writes[0].startswith("UPDATE")
+    assert result.user.name == "Partner" and result.amount == 7.5
+    stored = crud.get_expense(db, expense_id)
+    assert stored.fingerprint == crud.expense_fingerprint(date(2025, 3, 1), 7.5, partner_id, 1, "Lunch")
+
+
+def test_delete_returns_the_deleted_expense(db):
+    expense_id = add(db)
+    deleted = crud.delete_expense(db, expense_id)
+    assert isinstance(deleted, models.Expense)
+    assert deleted.id == expense_id and deleted.amount == 10
+    assert crud.get_expense(db, expense_id) is None
+
+
+def test_live_summary_listener_is_registered_at_startup(client):
+    assert main.broadcaster in crud.expense_listeners
+
+
+class Recorder:
+    def __init__(self, wanted=True):
+        self.wanted = wanted
+        self.changes = []
+
+    def wants(self, household):
+        return self.wanted
+
+    def on_expense_change(self, household, before, after):
+        self.changes.append((before, after))
+
+
+def statements_during(db, write):
+    statements = []
+    listener = lambda *args: statements.append(args[2].lstrip().split()[0].upper())
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        write()
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    return statements
+
+
+def test_writes_without_live_listeners_skip_the_old_row(client, db):
+    expense_id = add(db)
+    assert not main.broadcaster.wants(None)
+    update = statements_during(db, lambda: client.put(f"/api/expenses/{expense_id}", json={"amount": 12}))
+    assert update == ["UPDATE", "SELECT"]
+    delete = statements_during(db, lambda: client.delete(f"/api/expenses/{expense_id}"))
+    assert delete == ["DELETE"]
+
+
+def test_listeners_get_the_state_the_write_replaced(db):
+    expense_id = add(db, amount=10, category_id=2)
+    recorder = Recorder()
+    crud.expense_listeners.append(recorder)
+    try:
+        crud.update_expense(db, expense_id, schemas.ExpenseUpdate(amount=12, category_id=3))
+        crud.delete_expense(db, expense_id)
+    finally:
+        crud.expense_listeners.remove(recorder)
+
+    (before, after), (deleted, gone) = recorder.changes
+    assert (before["amount"], before["category_id"]) == (10, 2)
+    assert before["category_name"] is not None
+    assert (after["amount"], after["category_id"]) == (12, 3)
+    assert (deleted["amount"], deleted["category_id"], gone) == (12, 3, None)
+
+
+def test_a_listener_that_starts_wanting_mid_write_gets_a_resync(db, monkeypatch):
+    expense_id = add(db)
+    recorder = Recorder(wanted=False)
+    crud.expense_listeners.append(recorder)
+    commit = db.commit
+
+    def commit_then_subscribe():
+        commit()
+        recorder.wanted = True
+
+    monkeypatch.setattr(db, "commit", commit_then_subscribe)
+    try:
+        crud.update_expense(db, expense_id, schemas.ExpenseUpdate(amount=12))
+    finally:
+        crud.expense_listeners.remove(recorder)
+    assert recorder.changes == [(None, None)]
@@ -0,0 +1,59 @@
+from datetime import date
+
+import crud, forecast, schemas
+from database import SessionLocal
+from forecast import ForecastCache
+
+
+def add(db, on, amount, category_id=1):
+    crud.create_expense(db, schemas.ExpenseCreate(date=on, amount=amount, user_id=1, category_id=category_id))
+
+
+def test_a_write_during_the_first_computation_is_not_lost(db, monkeypatch):
+    cache = ForecastCache()
+    add(db, date(2025, 1, 10), 100)
+    compute = forecast.compute_forecasts
+
+    def compute_then_write(*args, **kwargs):
+        result = compute(*args, **kwargs)
+        writer = SessionLocal()
+        try:
+            add(writer, date(2025, 2, 10), 900, category_id=2)
+        finally:
+            writer.close()
+        return result
+
+    monkeypatch.setattr(forecast, "compute_forecasts", compute_then_write)
+    first = cache.get(db, 2025, 3)
+    monkeypatch.setattr(forecast, "compute_forecasts", compute)
+    assert ("category_id", 2) not in first
+
+    db.rollback()
+    second = cache.get(db, 2025, 3)
+    assert second[("category_id", 2)] > 0
+    assert second[("user_id", 1)] != first[("user_id", 1)]
+    crud.expense_listeners.remove(cache)
+
+
+def test_bulk_writes_during_a_computation_keep_it_out_of_the_cache(db, monkeypatch):
+    cache = ForecastCache()
+    compute = forecast.compute_forecasts
+
+    def compute_then_bulk_write(*args, **kwargs):
+        result = compute(*args, **kwargs)
+        cache.on_expense_change(None, None, None)
+        return result
+
+    monkeypatch.setattr(forecast, "compute_forecasts", compute_then_bulk_write)
+    cache.get(db, 2025, 3)
+    assert not cache.forecasts
+    crud.expense_listeners.remove(cache)
+
+
+def test_least_recently_used_months_are_evicted(db):
+    cache = ForecastCache(size=2)
+    add(db, date(2025, 1, 10), 100)
+    for month in (2, 3, 2, 4):
+        cache.get(db, 2025, month)
+    assert list(cache.forecasts) == [(None, 2025, 2), (None, 2025, 4)]
+    crud.expense_listeners.remove(cache)
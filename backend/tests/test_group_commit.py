@@ -0,0 +1,62 @@
+import threading
+from datetime import date
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import crud, models, schemas
+from database import GroupCommitter, create_sqlite_engine
+
+
+def values(user_id=1):
+    return {"date": date(2025, 1, 15), "amount": 10.0, "description": "Lunch", "user_id": user_id,
+            "category_id": 1, "currency": "USD", "version": 1}
+
+
+def test_a_failing_row_only_fails_its_own_caller(tmp_path):
+    db_engine = create_sqlite_engine(str(tmp_path / "group.db"))
+    event.listen(db_engine, "connect", lambda connection, record: connection.execute("PRAGMA foreign_keys=ON"))
+    models.Base.metadata.create_all(bind=db_engine)
+    db = sessionmaker(bind=db_engine)()
+    crud.create_default_categories(db)
+    crud.create_default_user(db)
+    db.close()
+
+    committer = GroupCommitter(db_engine, window_ms=50)
+    outcomes = {}
+    barrier = threading.Barrier(5)
+
+    def insert_row(caller, user_id):
+        barrier.wait()
+        try:
+            outcomes[caller] = committer.insert(models.Expense.__table__, values(user_id))
+        except Exception as e:
+            outcomes[caller] = e
+
+    threads = [threading.Thread(target=insert_row, args=(caller, 999 if caller == 2 else 1)) for caller in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(outcomes.pop(2), IntegrityError)
+    with db_engine.connect() as conn:
+        stored = set(conn.execute(select(models.Expense.id)).scalars())
+    assert stored == set(outcomes.values()) and len(stored) == 4
+
+
+def test_group_commit_reads_back_with_pending_changes_and_stale_snapshots(db, monkeypatch):
+    monkeypatch.setattr(crud, "GROUP_COMMIT_MS", 1)
+    db.add(models.User(name="Partner"))
+    created = crud.create_expense(db, schemas.ExpenseCreate(date=date(2025, 1, 15), amount=10, user_id=1, category_id=1))
+    assert created.amount == 10
+    # The session's own pending user was committed with it
+    db.rollback()
+    assert db.query(models.User).filter_by(name="Partner").count() == 1
+
+    # An open read transaction must not hide the row committed on the committer's connection
+    db.query(models.Expense).count()
+    assert db.in_transaction()
+    again = crud.create_expense(db, schemas.ExpenseCreate(date=date(2025, 1, 16), amount=11, user_id=1, category_id=1))
+    assert again.id != created.id and again.user.name
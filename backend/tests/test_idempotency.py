@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+import crud, main, models, schemas
+from database import SessionLocal
+from idempotency import IDEMPOTENCY_PENDING_TIMEOUT, purge_expired_keys, request_hash
+
+EXPENSE = {"date": "2025-01-15", "amount": 12.5, "description": "Lunch", "user_id": 1, "category_id": 1}
+TTL = timedelta(hours=1)
+
+
+def backdate(db, **fields):
+    db.execute(update(models.IdempotencyKey).values(**fields))
+    db.commit()
+
+
+def test_repeats_replay_the_first_response(client, db):
+    first = client.post("/api/expenses", json=EXPENSE, headers={"Idempotency-Key": "k1"})
+    repeat = client.post("/api/expenses", json=EXPENSE, headers={"Idempotency-Key": "k1"})
+    assert repeat.json() == first.json() and repeat.headers["Idempotent-Replayed"] == "true"
+    assert db.query(models.Expense).count() == 1
+
+    changed = client.post("/api/expenses", json={**EXPENSE, "amount": 13}, headers={"Idempotency-Key": "k1"})
+    assert changed.status_code == 422
+
+
+def test_pending_claims_are_never_run_again(client, db):
+    # The first request claimed the key and wrote its expense, then its process died
+    record_id, _ = crud.claim_idempotency_key(db, "/api/expenses", "k2", request_hash(schemas.ExpenseCreate(**EXPENSE)), TTL)
+    assert record_id is not None
+    client.post("/api/expenses", json=EXPENSE)
+
+    in_progress = client.post("/api/expenses", json=EXPENSE, headers={"Idempotency-Key": "k2"})
+    assert in_progress.status_code == 409 and in_progress.headers["Retry-After"] == "1"
+
+    backdate(db, created_at=datetime.now(timezone.utc) - IDEMPOTENCY_PENDING_TIMEOUT - timedelta(seconds=1))
+    abandoned = client.post("/api/expenses", json=EXPENSE, headers={"Idempotency-Key": "k2"})
+    assert abandoned.status_code == 409 and "Retry-After" not in abandoned.headers
+    assert "never finished" in abandoned.json()["detail"]
+    assert db.query(models.Expense).count() == 1
+
+
+def test_expired_keys_are_unused_and_purged_in_the_background(db):
+    crud.claim_idempotency_key(db, "/api/expenses", "old", "hash", TTL)
+    crud.claim_idempotency_key(db, "/api/expenses", "kept", "hash", TTL)
+    db.execute(update(models.IdempotencyKey).where(models.IdempotencyKey.key == "old").values(
+        expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+    ))
+    db.commit()
+
+    assert purge_expired_keys([SessionLocal]) == 1
+    assert [row.key for row in db.query(models.IdempotencyKey)] == ["kept"]
+
+    backdate(db, expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    record_id, _ = crud.claim_idempotency_key(db, "/api/expenses", "kept", "new hash", TTL)
+    assert record_id is not None
+
+
+def test_the_purge_task_runs_while_the_app_is_up(client):
+    task = main.app.state.idempotency_purge
+    assert isinstance(task, asyncio.Task) and not task.done()
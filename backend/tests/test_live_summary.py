@@ -0,0 +1,88 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy import event
+
+import crud, live_summary, schemas
+from live_summary import SummaryBroadcaster, change_event, sse_frame
+
+
+def snapshots(db, description="Lunch"):
+    """Snapshots of a new expense before and after its description is set to description"""
+    expense = crud.create_expense(db, schemas.ExpenseCreate(
+        date=date(2025, 3, 1), amount=10, description="Lunch", user_id=1, category_id=1
+    ))
+    before = crud.expense_snapshot(db, crud.get_expense(db, expense.id))
+    after = {**before, "expense": {**before["expense"], "description": description}}
+    return before, after
+
+
+def test_snapshot_loads_user_and_category_with_the_expense(db):
+    expense_id = crud.create_expense(db, schemas.ExpenseCreate(
+        date=date(2025, 3, 1), amount=10, user_id=1, category_id=2
+    )).id
+    db.expire_all()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        result = crud.expense_snapshot(db, crud.get_expense(db, expense_id))
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert len(statements) == 1
+    assert result["category_name"] and result["user_name"]
+
+
+def test_change_event_for_create_update_and_delete(db):
+    before, after = snapshots(db)
+    created = change_event(None, after)
+    assert created["expense"]["id"] == after["id"] and created["removed_id"] is None
+    assert created["months"][0]["categories"]["1"]["expense_count"] == 1
+
+    deleted = change_event(before, None)
+    assert deleted["expense"] is None and deleted["removed_id"] == before["id"]
+    assert deleted["months"][0]["total_amount"] == -10
+
+
+def test_description_only_edit_sends_the_row_without_summary_changes(db):
+    before, after = snapshots(db, "Dinner")
+    data = change_event(before, after)
+    assert data["months"] == []
+    assert data["expense"]["description"] == "Dinner"
+
+
+def test_monthly_summary_entries_carry_ids(db):
+    crud.create_expense(db, schemas.ExpenseCreate(date=date(2025, 3, 1), amount=10, user_id=1, category_id=3))
+    summary = crud.get_monthly_summary(db, 2025, 3)
+    assert [entry.category_id for entry in summary.categories] == [3]
+    assert [entry.user_id for entry in summary.users] == [1]
+
+
+def test_changes_fan_out_and_forecasts_are_coalesced(db, monkeypatch):
+    monkeypatch.setattr(live_summary, "FORECAST_PUSH_DELAY_SECONDS", 0.05)
+    broadcaster = SummaryBroadcaster()
+    forecasts = []
+
+    def forecast_frame(household):
+        forecasts.append(household)
+        return sse_frame("forecast", {"projected_total": 1})
+
+    broadcaster.forecast_frame = forecast_frame
+    before, after = snapshots(db)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        broadcaster.bind_loop(loop)
+        queues = [broadcaster.subscribe() for _ in range(3)]
+        for _ in range(3):
+            await loop.run_in_executor(None, broadcaster.on_expense_change, None, None, after)
+        await asyncio.sleep(0.3)
+        return [[queue.get_nowait() for _ in range(queue.qsize())] for queue in queues]
+
+    received = asyncio.run(run())
+    assert forecasts == [None]
+    for frames in received:
+        assert [frame.split("\n")[0] for frame in frames] == ["event: delta"] * 3 + ["event: forecast"]
+        data = json.loads(frames[0].split("\n")[1][len("data: "):])
+        assert data["expense"]["id"] == after["id"]
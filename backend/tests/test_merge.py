@@ -0,0 +1,41 @@
+from datetime import date
+
+import crud, models, schemas
+
+
+def add(db, user_id=1, category_id=1, on=date(2025, 3, 1), amount=10):
+    return crud.create_expense(db, schemas.ExpenseCreate(
+        date=on, amount=amount, description="Shared", user_id=user_id, category_id=category_id
+    )).id
+
+
+def test_merge_moves_expenses_with_fresh_fingerprints(client, db):
+    partner = crud.create_user(db, schemas.UserCreate(name="Partner")).id
+    hot = add(db, user_id=partner)
+    archived = add(db, user_id=partner, on=date(2020, 1, 1))
+    add(db, user_id=1, on=date(2020, 1, 2), amount=5)
+    crud.archive_expenses(db, before=date(2020, 2, 1))
+
+    response = client.post(f"/api/users/{partner}/merge", params={"into": 1})
+    assert response.status_code == 200 and response.json()["moved_expense_count"] == 2
+
+    db.expire_all()
+    for row in (db.get(models.Expense, hot), db.get(models.ArchivedExpense, archived)):
+        assert row.user_id == 1 and row.version == 2
+        assert row.fingerprint == crud.fingerprint_for(row)
+    totals = db.query(models.ArchivedMonthlyTotal).all()
+    assert [(row.user_id, row.total_amount, row.expense_count) for row in totals] == [(1, 15, 2)]
+    assert crud.get_user(db, partner) is None
+
+
+def test_merged_rows_are_found_as_duplicates(db):
+    groceries = crud.create_category(db, schemas.CategoryCreate(name="Groceries 2")).id
+    add(db, category_id=groceries)
+    crud.merge_categories(db, source_id=groceries, target_id=1)
+    fingerprint = crud.expense_fingerprint(date(2025, 3, 1), 10, 1, 1, "Shared")
+    assert crud.get_existing_fingerprints(db, [fingerprint]) == {fingerprint}
+
+
+def test_merge_rejects_itself_and_unknown_targets(client):
+    assert client.post("/api/users/1/merge", params={"into": 1}).status_code == 400
+    assert client.post("/api/users/1/merge", params={"into": 999}).status_code == 404
@@ -0,0 +1,64 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import profiling
+
+
+def busy_work():
+    return sum(range(1000))
+
+
+def profiled_app(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    app = FastAPI()
+    profiling.install_request_profiling(app)
+
+    @app.get("/work")
+    def work():
+        return {"total": busy_work()}
+
+    return TestClient(app)
+
+
+def test_sync_endpoints_are_profiled_in_their_worker_thread(monkeypatch, tmp_path):
+    client = profiled_app(monkeypatch, tmp_path)
+    response = client.get("/work", headers={"X-Profile-Token": "secret", "X-Profile-Format": "text"})
+    assert response.status_code == 200
+    assert "busy_work" in response.text
+    assert (tmp_path / response.headers["X-Profile-File"].rsplit("/", 1)[-1]).exists()
+
+
+def test_requests_without_the_token_are_not_profiled(monkeypatch, tmp_path):
+    client = profiled_app(monkeypatch, tmp_path)
+    for headers in ({}, {"X-Profile-Token": "wrong"}, {"X-Profile-Token": "sécret"}):
+        response = client.get("/work", headers={key: value.encode() for key, value in headers.items()})
+        assert response.json() == {"total": 499500} and "X-Profile-File" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_profiling_is_installed_before_routes(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    app = FastAPI()
+    app.get("/")(lambda: {})
+    with pytest.raises(RuntimeError):
+        profiling.install_request_profiling(app)
+
+
+def test_slow_query_log_keeps_the_transaction_when_the_plan_fails(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    profiling.install_slow_query_log(engine, threshold_ms=0)
+    with caplog.at_level(logging.WARNING, logger="budget_tracker.slow_query"), engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES ('kept')"))
+        plan = profiling.explain_statement(conn.connection.driver_connection.cursor(),
+                                           "SELECT * FROM missing", None, "sqlite")
+        assert plan.startswith("(plan unavailable")
+        assert conn.execute(text("SELECT name FROM items")).scalar_one() == "kept"
+    assert any("Plan:" in record.message and "SCAN items" in record.message for record in caplog.records)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM items")).scalar_one() == 1
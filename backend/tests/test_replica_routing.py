@@ -0,0 +1,41 @@
+import itertools
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import pytest
+
+
+@pytest.fixture
+def replica(simple, tmp_path, monkeypatch):
+    """An empty replica, so reads that reach it are easy to tell apart"""
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    simple.Base.metadata.create_all(bind=replica_engine)
+    monkeypatch.setattr(simple, "ReplicaSessions", [sessionmaker(bind=replica_engine)])
+    monkeypatch.setattr(simple, "replica_cycle", itertools.cycle([0]))
+    yield replica_engine
+    replica_engine.dispose()
+
+
+def test_reads_go_to_the_replica_without_a_pin(simple_client, replica):
+    assert simple_client.get("/api/transactions").json() == []
+
+
+def test_a_write_pins_only_the_client_sending_its_header(simple_client, replica):
+    response = simple_client.post("/api/transactions", json={
+        "description": "Train", "amount": 30, "date": "2025-03-01", "category_id": 1, "type": "expense"
+    }, headers={"Origin": "https://budget.example"})
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+    assert "x-primary-pin-until" in response.headers["access-control-expose-headers"].lower()
+
+    pin = {"X-Primary-Pin-Until": response.headers["X-Primary-Pin-Until"]}
+    pinned = simple_client.get("/api/transactions", headers=pin).json()
+    assert [transaction["description"] for transaction in pinned] == ["Train"]
+    # Another client at the same address is not pinned
+    assert simple_client.get("/api/transactions").json() == []
+
+
+def test_an_expired_or_malformed_pin_reads_from_the_replica(simple_client, replica):
+    assert simple_client.get("/api/transactions", headers={"X-Primary-Pin-Until": "1"}).json() == []
+    assert simple_client.get("/api/transactions", headers={"X-Primary-Pin-Until": "soon"}).json() == []
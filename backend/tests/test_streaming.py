@@ -0,0 +1,49 @@
+import json
+import zlib
+from datetime import date
+
+import crud, schemas
+from streaming import StreamStats, compressed, ndjson_batches, negotiate_encoding
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, *") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+
+
+def test_ndjson_batches_hold_batch_size_records_each():
+    chunks = list(ndjson_batches(({"n": n} for n in range(5)), batch_size=2))
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+    assert [json.loads(line) for chunk in chunks for line in chunk.splitlines()] == [{"n": n} for n in range(5)]
+
+
+def test_gzip_chunks_decode_as_they_arrive():
+    stats = StreamStats()
+    decompressor = zlib.decompressobj(31)
+    decoded = []
+    for chunk in compressed([b"first\n" * 50, b"second\n" * 50], "gzip", stats, label="test"):
+        decoded.append(decompressor.decompress(chunk))
+    # Every batch is readable before the stream ends, not only after the trailer
+    assert decoded[0] == b"first\n" * 50 and decoded[1] == b"second\n" * 50
+    assert stats.raw_bytes == 650 and 0 < stats.wire_bytes < stats.raw_bytes
+
+
+def test_stream_endpoint_returns_every_matching_expense(client, db):
+    for day in range(1, 6):
+        crud.create_expense(db, schemas.ExpenseCreate(
+            date=date(2025, 3, day), amount=day, description=f"day {day}", user_id=1, category_id=1 + day % 2
+        ))
+    response = client.get("/api/expenses/stream", params={"category_id": 2, "batch_size": 1},
+                          headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["description"] for row in rows] == ["day 5", "day 3", "day 1"]
+
+    plain = client.get("/api/expenses/stream", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.text.splitlines()) == 5
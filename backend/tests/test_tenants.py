@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import crud, profiling, schemas
+from forecast import ForecastCache
+from live_summary import SummaryBroadcaster
+from tenants import TenantEnginePool, household_from_request
+
+
+def request_for(household):
+    return Request({"type": "http", "query_string": b"", "headers": [(b"x-household", household.encode())]})
+
+
+def test_household_ids_must_match_in_full():
+    assert household_from_request(request_for("Smiths")) == "smiths"
+    for household in ("smiths\n", "-smiths", "smiths/../x", "a" * 65):
+        with pytest.raises(HTTPException):
+            household_from_request(request_for(household))
+
+
+def test_evicted_households_keep_their_subscribers_but_lose_forecasts(tmp_path):
+    pool = TenantEnginePool(str(tmp_path), size=1)
+    forecasts = ForecastCache()
+    broadcaster = SummaryBroadcaster()
+    loop = asyncio.new_event_loop()
+    broadcaster.bind_loop(loop)
+    pool.eviction_listeners.append(forecasts.forget_household)
+
+    db = pool.sessionmaker_for("smiths")()
+    crud.create_expense(db, schemas.ExpenseCreate(date=date(2025, 1, 5), amount=20, user_id=1, category_id=1))
+    forecasts.get(db, 2025, 2)
+    db.close()
+    queue = broadcaster.subscribe("smiths")
+    assert [key[0] for key in forecasts.forecasts] == ["smiths"]
+
+    pool.sessionmaker_for("joneses")
+    loop.run_until_complete(asyncio.sleep(0))
+    assert pool.open_count() == 1
+    assert not forecasts.forecasts
+    # Reconnecting would only reopen the household and evict another one
+    assert broadcaster.is_subscribed(queue, "smiths")
+    loop.close()
+    crud.expense_listeners.remove(forecasts)
+
+
+def test_household_engines_log_slow_queries(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", "0")
+    pool = TenantEnginePool(str(tmp_path), size=1)
+    db = pool.sessionmaker_for("smiths")()
+    with caplog.at_level(logging.WARNING, logger="budget_tracker.slow_query"):
+        crud.get_expenses(db)
+    db.close()
+    assert any("FROM expenses" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,65 @@
+import inspect
+import threading
+import time
+from datetime import date
+
+import crud, database, main, schemas
+
+
+def max_concurrent_holders(writers, threads=8, hold_seconds=0.005):
+    inside = [0]
+    peak = [0]
+    lock = threading.Lock()
+
+    def write(writer):
+        for _ in range(5):
+            with writer.hold():
+                with lock:
+                    inside[0] += 1
+                    peak[0] = max(peak[0], inside[0])
+                time.sleep(hold_seconds)
+                with lock:
+                    inside[0] -= 1
+
+    workers = [threading.Thread(target=write, args=(writers[i % len(writers)],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return peak[0]
+
+
+def test_single_writer_excludes_threads_and_other_lock_holders(tmp_path):
+    lock_path = str(tmp_path / "db.write-lock")
+    assert max_concurrent_holders([database.SingleWriter(lock_path)]) == 1
+    # Separate instances stand in for worker processes: only the flock is shared
+    if database.fcntl is not None:
+        assert max_concurrent_holders([database.SingleWriter(lock_path), database.SingleWriter(lock_path)]) == 1
+
+
+def test_single_writer_is_reentrant(tmp_path):
+    writer = database.SingleWriter(str(tmp_path / "db.write-lock"))
+    with writer.hold():
+        with writer.hold():
+            pass
+
+
+def test_serialized_writes_hold_the_writer(db, monkeypatch):
+    monkeypatch.setattr(database, "WRITE_COORDINATION", "single-writer")
+    writer = database.writer_for(db.get_bind().url.database)
+    held = []
+    hold = writer.hold
+
+    def tracking_hold():
+        held.append(True)
+        return hold()
+
+    monkeypatch.setattr(writer, "hold", tracking_hold)
+    crud.create_expense(db, schemas.ExpenseCreate(date=date(2025, 1, 1), amount=5, user_id=1, category_id=1))
+    assert held
+
+
+def test_import_endpoints_run_on_the_threadpool():
+    # Blocking serialized writes must not run on the event loop
+    assert not inspect.iscoroutinefunction(main.preview_csv_import)
+    assert not inspect.iscoroutinefunction(main.confirm_csv_import)
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { expenseApi, userApi, categoryApi, User, Category, CreateExpenseData } from '../services/api';
 
@@ -23,7 +23,10 @@ const AddExpense: React.FC = () => {
     date: getLocalDateString(),
     description: '',
     user_id: '',
+    currency: '', // Blank: the reporting currency
   });
+  // One key per form state: resubmitting the same expense after a network error can't create it twice
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [formData]);
 
   useEffect(() => {
     fetchFormData();
@@ -88,9 +91,10 @@ const AddExpense: React.FC = () => {
         date: formData.date,
         description: formData.description || undefined,
         user_id: parseInt(formData.user_id),
+        currency: formData.currency.toUpperCase() || undefined,
       };
 
-      await expenseApi.create(expenseData);
+      await expenseApi.create(expenseData, idempotencyKey);
       navigate('/');
     } catch (err) {
       console.error('Failed to create expense:', err);
@@ -118,9 +122,10 @@ const AddExpense: React.FC = () => {
         date: formData.date,
         description: formData.description || undefined,
         user_id: parseInt(formData.user_id),
+        currency: formData.currency.toUpperCase() || undefined,
       };
 
-      await expenseApi.create(expenseData);
+      await expenseApi.create(expenseData, idempotencyKey);
       
       // Reset form but keep user and use today's date
       setFormData(prev => ({
@@ -181,6 +186,20 @@ const AddExpense: React.FC = () => {
               />
             </div>
             
+            <div className="form-group">
+              <label htmlFor="currency">Currency:</label>
+              <input
+                type="text"
+                id="currency"
+                name="currency"
+                value={formData.currency}
+                onChange={handleInputChange}
+                maxLength={3}
+                pattern="[A-Za-z]{3}"
+                placeholder="USD"
+              />
+            </div>
+            
             <div className="form-group">
               <label htmlFor="category_id">Category:</label>
               <select
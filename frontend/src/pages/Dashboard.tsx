@@ -1,11 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { summaryApi, expenseApi, MonthlySummary, Expense } from '../services/api';
+import {
+  summaryApi, expenseApi, dashboardApi, applySummaryDeltas, applyExpenseChange,
+  MonthlySummary, SpendingForecast, ExpenseChange, ExpenseRecord, User, Category
+} from '../services/api';
 import { format } from 'date-fns';
 
+const RECENT_LIMIT = 5;
+
 const Dashboard: React.FC = () => {
   const [summary, setSummary] = useState<MonthlySummary | null>(null);
-  const [recentExpenses, setRecentExpenses] = useState<Expense[]>([]);
+  const [forecast, setForecast] = useState<SpendingForecast | null>(null);
+  const [recentExpenses, setRecentExpenses] = useState<ExpenseRecord[]>([]);
+  const [usersById, setUsersById] = useState<Record<number, User>>({});
+  const [categoriesById, setCategoriesById] = useState<Record<number, Category>>({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -13,16 +21,60 @@ const Dashboard: React.FC = () => {
     fetchDashboardData();
   }, []);
 
+  // Live updates: the server pushes summary deltas instead of us polling
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+    const source = new EventSource(summaryApi.streamUrl);
+    source.addEventListener('summary', (event) => {
+      setSummary(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('delta', (event) => {
+      const change: ExpenseChange = JSON.parse((event as MessageEvent).data);
+      setSummary((current) => (current ? applySummaryDeltas(current, change.months) : current));
+      setRecentExpenses((current) => applyExpenseChange(current, change, RECENT_LIMIT));
+      // A deleted row may leave a gap in the list that only the server can fill
+      if (change.removed_id !== null) fetchRecentExpenses();
+    });
+    // Recomputed once on the server after a burst of changes, for every dashboard
+    source.addEventListener('forecast', (event) => {
+      setForecast(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('resync', () => {
+      fetchDashboardData();
+    });
+    return () => source.close();
+  }, []);
+
+  const indexById = <T extends { id: number }>(items: T[]) =>
+    Object.fromEntries(items.map((item) => [item.id, item])) as Record<number, T>;
+
+  // Only needed when a deleted expense leaves the recent list short
+  const fetchRecentExpenses = () => {
+    expenseApi.getAllCompact({ limit: RECENT_LIMIT }).then(({ data }) => {
+      setRecentExpenses(data.ids.map((id, i) => ({
+        id,
+        date: data.dates[i],
+        amount: data.amounts[i],
+        description: data.descriptions[i],
+        user_id: data.user_ids[i],
+        category_id: data.category_ids[i],
+        currency: data.currencies[i]
+      })));
+      setUsersById((current) => ({ ...current, ...indexById(data.users) }));
+      setCategoriesById((current) => ({ ...current, ...indexById(data.categories) }));
+    }).catch(() => {});
+  };
+
   const fetchDashboardData = async () => {
     try {
       setLoading(true);
-      const [summaryResponse, expensesResponse] = await Promise.all([
-        summaryApi.getCurrentMonth(),
-        expenseApi.getAll({ limit: 5 })
-      ]);
+      const { data } = await dashboardApi.get(RECENT_LIMIT);
       
-      setSummary(summaryResponse.data);
-      setRecentExpenses(expensesResponse.data);
+      setSummary(data.summary);
+      setForecast(data.forecast);
+      setRecentExpenses(data.recent_expenses);
+      setUsersById(indexById(data.users));
+      setCategoriesById(indexById(data.categories));
       setError(null);
     } catch (err) {
       console.error('Failed to fetch dashboard data:', err);
@@ -32,10 +84,10 @@ const Dashboard: React.FC = () => {
     }
   };
 
-  const formatCurrency = (amount: number) => {
+  const formatCurrency = (amount: number, currency: string = 'USD') => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
-      currency: 'USD'
+      currency
     }).format(amount);
   };
 
@@ -67,10 +119,17 @@ const Dashboard: React.FC = () => {
       <div className="dashboard-grid">
         <div className="dashboard-section quick-stats">
           <div className="section-title">─ QUICK STATS ─────────────────────────</div>
-          <div className="stat-line">Total Spent: {formatCurrency(summary.total_amount)}</div>
-          <div className="stat-line">Budget Remaining: {formatCurrency(budgetRemaining)}</div>
-          <div className="stat-line">Daily Average: {formatCurrency(summary.daily_average)}</div>
-          <div className="stat-line"></div>
+          <div className="stat-line">Total Spent: {formatCurrency(summary.total_amount, summary.currency)}</div>
+          <div className="stat-line">Budget Remaining: {formatCurrency(budgetRemaining, summary.currency)}</div>
+          <div className="stat-line">Daily Average: {formatCurrency(summary.daily_average, summary.currency)}</div>
+          {summary.unconverted_count > 0 && (
+            <div className="stat-line">
+              Not counted: {summary.unconverted_count} expense(s) in {summary.unconverted_currencies.join(', ')} without an exchange rate
+            </div>
+          )}
+          <div className="stat-line">
+            {forecast ? `Projected Month End: ${formatCurrency(forecast.projected_total, summary.currency)}` : ''}
+          </div>
           <div className="progress-line">
             [{getProgressBar(budgetUsedPercentage)}] {Math.round(budgetUsedPercentage)}% used
           </div>
@@ -84,10 +143,10 @@ const Dashboard: React.FC = () => {
             recentExpenses.map((expense) => (
               <div key={expense.id} className="expense-row">
                 <span className="expense-date">{formatDate(expense.date)}</span>
-                <span className="expense-category">| {expense.category.name}</span>
-                <span className="expense-amount">| {formatCurrency(expense.amount)}</span>
+                <span className="expense-category">| {categoriesById[expense.category_id]?.name}</span>
+                <span className="expense-amount">| {formatCurrency(expense.amount, expense.currency)}</span>
                 <div className="expense-details">
-                  <span className="expense-user">| @{expense.user.name}</span>
+                  <span className="expense-user">| @{usersById[expense.user_id]?.name}</span>
                   <span className="expense-description">| {expense.description || 'No description'}</span>
                 </div>
               </div>
@@ -104,9 +163,9 @@ const Dashboard: React.FC = () => {
             <div className="empty-state">No expense data</div>
           ) : (
             summary.users.map((user) => (
-              <div key={user.user_name} className="user-row">
+              <div key={user.user_id} className="user-row">
                 <span className="user-name">{user.user_name}:</span>
-                <span className="user-amount">{formatCurrency(user.total_amount)} ({Math.round(user.percentage)}%)</span>
+                <span className="user-amount">{formatCurrency(user.total_amount, summary.currency)} ({Math.round(user.percentage)}%)</span>
               </div>
             ))
           )}
@@ -121,10 +180,10 @@ const Dashboard: React.FC = () => {
             <div className="empty-state">No expense data</div>
           ) : (
             summary.categories.map((category) => (
-              <div key={category.category_name} className="category-row">
+              <div key={category.category_id} className="category-row">
                 <span className="category-name">{category.category_name}</span>
                 <span className="category-progress">{getProgressBar(category.percentage, 15)}</span>
-                <span className="category-amount">{formatCurrency(category.total_amount)} ({Math.round(category.percentage)}%)</span>
+                <span className="category-amount">{formatCurrency(category.total_amount, summary.currency)} ({Math.round(category.percentage)}%)</span>
               </div>
             ))
           )}
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
+import axios from 'axios';
 import { expenseApi, userApi, categoryApi, User, Category } from '../services/api';
 
 const EditExpense: React.FC = () => {
@@ -9,12 +10,14 @@ const EditExpense: React.FC = () => {
   const [categories, setCategories] = useState<Category[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [version, setVersion] = useState<number | undefined>(undefined);
   const [formData, setFormData] = useState({
     amount: '',
     category_id: '',
     date: '',
     description: '',
     user_id: '',
+    currency: '',
   });
 
   useEffect(() => {
@@ -41,7 +44,9 @@ const EditExpense: React.FC = () => {
         date: expense.date,
         description: expense.description || '',
         user_id: expense.user_id.toString(),
+        currency: expense.currency,
       });
+      setVersion(expense.version);
       
       setUsers(usersResponse.data);
       setCategories(categoriesResponse.data);
@@ -82,13 +87,21 @@ const EditExpense: React.FC = () => {
         date: formData.date,
         description: formData.description || undefined,
         user_id: parseInt(formData.user_id),
+        currency: formData.currency.toUpperCase(),
+        version,
       };
 
       await expenseApi.update(parseInt(id), updateData);
       navigate('/expenses');
     } catch (err) {
       console.error('Failed to update expense:', err);
-      setError('Failed to update expense');
+      if (axios.isAxiosError(err) && err.response?.status === 409) {
+        setError(String(err.response.data?.detail ?? '').includes('archived')
+          ? 'This expense has been archived and can no longer be edited.'
+          : 'This expense was changed elsewhere. Reload it and apply your edit again.');
+      } else {
+        setError('Failed to update expense');
+      }
     } finally {
       setLoading(false);
     }
@@ -140,6 +153,20 @@ const EditExpense: React.FC = () => {
                 />
               </div>
               
+              <div className="form-group">
+                <label htmlFor="currency">Currency:</label>
+                <input
+                  type="text"
+                  id="currency"
+                  name="currency"
+                  value={formData.currency}
+                  onChange={handleInputChange}
+                  maxLength={3}
+                  pattern="[A-Za-z]{3}"
+                  required
+                />
+              </div>
+              
               <div className="form-group">
                 <label htmlFor="category_id">Category:</label>
                 <select
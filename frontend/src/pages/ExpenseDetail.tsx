@@ -82,10 +82,10 @@ const ExpenseDetail: React.FC = () => {
     navigate(`/expenses/add?${params.toString()}`);
   };
 
-  const formatCurrency = (amount: number) => {
+  const formatCurrency = (amount: number, currency: string = 'USD') => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
-      currency: 'USD'
+      currency
     }).format(amount);
   };
 
@@ -121,7 +121,7 @@ const ExpenseDetail: React.FC = () => {
           <div className="detail-row">
             <span className="detail-label">Amount:</span>
             <span className="detail-value expense-amount">
-              {formatCurrency(expense.amount)}
+              {formatCurrency(expense.amount, expense.currency)}
             </span>
           </div>
           
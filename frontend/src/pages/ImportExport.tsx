@@ -11,6 +11,7 @@ interface PreviewData {
     valid_count: number;
     error_count: number;
     new_user_count: number;
+    duplicate_count?: number;
   };
 }
 
@@ -21,6 +22,9 @@ const ImportExport: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
   const [previewData, setPreviewData] = useState<PreviewData | null>(null);
+  // A retried confirm of the same preview is only imported once
+  const [importKey, setImportKey] = useState('');
+  const [skipDuplicates, setSkipDuplicates] = useState(true);
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [exportFilters, setExportFilters] = useState({
     range: 'current',
@@ -84,6 +88,7 @@ const ImportExport: React.FC = () => {
       setError(null);
       const response = await csvApi.previewImport(selectedFile);
       setPreviewData(response.data);
+      setImportKey(crypto.randomUUID());
     } catch (err: any) {
       console.error('Failed to preview import:', err);
       setError(err.response?.data?.detail || 'Failed to preview import');
@@ -98,7 +103,7 @@ const ImportExport: React.FC = () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await csvApi.confirmImport(previewData);
+      const response = await csvApi.confirmImport({ ...previewData, skip_duplicates: skipDuplicates }, importKey);
       setSuccess(response.data.message);
       setPreviewData(null);
       setSelectedFile(null);
@@ -237,6 +242,15 @@ const ImportExport: React.FC = () => {
               <div>Valid rows: {previewData.summary.valid_count}</div>
               <div>Error rows: {previewData.summary.error_count}</div>
               <div>New users: {previewData.summary.new_user_count}</div>
+              <div>Duplicates: {previewData.summary.duplicate_count ?? 0}</div>
+              <label>
+                <input
+                  type="checkbox"
+                  checked={skipDuplicates}
+                  onChange={(e) => setSkipDuplicates(e.target.checked)}
+                />
+                Skip duplicates on import
+              </label>
             </div>
             
             {previewData.valid_rows.length > 0 && (
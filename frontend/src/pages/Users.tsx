@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import axios from 'axios';
 import { userApi, summaryApi, User, UserSummary } from '../services/api';
 import { format } from 'date-fns';
 
@@ -83,7 +84,7 @@ const Users: React.FC = () => {
   };
 
   const handleDeleteUser = async (user: User) => {
-    if (!window.confirm(`Are you sure you want to delete user "${user.name}"? This will not delete their expenses.`)) {
+    if (!window.confirm(`Are you sure you want to delete user "${user.name}"?`)) {
       return;
     }
 
@@ -92,7 +93,11 @@ const Users: React.FC = () => {
       await fetchData();
     } catch (err) {
       console.error('Failed to delete user:', err);
-      setError('Failed to delete user');
+      if (axios.isAxiosError(err) && err.response?.status === 409) {
+        setError(`"${user.name}" still has expenses. Move them to another user before deleting.`);
+      } else {
+        setError('Failed to delete user');
+      }
     }
   };
 
@@ -9,6 +9,26 @@ const api = axios.create({
   },
 });
 
+// Read-your-writes: after a write the API returns how long this client should
+// read from the primary database; send it back so reads see our own writes
+const PRIMARY_PIN_HEADER = 'X-Primary-Pin-Until';
+let primaryPinUntil: string | null = null;
+
+api.interceptors.request.use((config) => {
+  if (primaryPinUntil) {
+    config.headers.set(PRIMARY_PIN_HEADER, primaryPinUntil);
+  }
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  const pin = response.headers[PRIMARY_PIN_HEADER.toLowerCase()];
+  if (pin) {
+    primaryPinUntil = pin;
+  }
+  return response;
+});
+
 export interface User {
   id: number;
   name: string;
@@ -31,13 +51,29 @@ export interface Expense {
   date: string;
   created_at: string;
   updated_at: string | null;
+  version?: number;
+  currency: string;
   user_id: number;
   category_id: number;
   user: User;
   category: Category;
 }
 
+// Returned by /expenses?format=compact: one array per column, users/categories listed once
+export interface CompactExpenseList {
+  ids: number[];
+  dates: string[];
+  amounts: number[];
+  user_ids: number[];
+  category_ids: number[];
+  descriptions: (string | null)[];
+  currencies: string[];
+  users: User[];
+  categories: Category[];
+}
+
 export interface CategorySummary {
+  category_id: number;
   category_name: string;
   category_color: string;
   total_amount: number;
@@ -46,6 +82,7 @@ export interface CategorySummary {
 }
 
 export interface UserSummary {
+  user_id: number;
   user_name: string;
   user_color: string;
   total_amount: number;
@@ -61,16 +98,158 @@ export interface MonthlySummary {
   daily_average: number;
   categories: CategorySummary[];
   users: UserSummary[];
+  currency: string; // Every amount above is converted to this reporting currency
+  unconverted_count: number; // Expenses left out above because their currency has no exchange rate yet
+  unconverted_currencies: string[];
+}
+
+export interface ForecastEntry {
+  id: number;
+  name: string;
+  color: string;
+  month_to_date: number;
+  forecast_amount: number | null;
+  projected_total: number;
+}
+
+export interface SpendingForecast {
+  year: number;
+  month: number;
+  days_elapsed: number;
+  days_in_month: number;
+  month_to_date: number;
+  projected_total: number;
+  categories: ForecastEntry[];
+  users: ForecastEntry[];
+}
+
+// Expense without nested user/category objects; resolve the ids against DashboardData.users/categories
+export interface ExpenseRecord {
+  id: number;
+  date: string;
+  amount: number;
+  description: string | null;
+  user_id: number;
+  category_id: number;
+  currency: string;
+}
+
+export interface DashboardData {
+  summary: MonthlySummary;
+  forecast: SpendingForecast;
+  recent_expenses: ExpenseRecord[];
+  users: User[];
+  categories: Category[];
+}
+
+// Pushed by /summary/stream when expenses change; keyed by user/category id
+export interface SummaryDeltaEntry {
+  name: string;
+  color: string;
+  total_amount: number;
+  expense_count: number;
+}
+
+export interface SummaryDelta {
+  year: number;
+  month: number;
+  total_amount: number;
+  expense_count: number;
+  users: Record<string, SummaryDeltaEntry>; // Keyed by user id
+  categories: Record<string, SummaryDeltaEntry>; // Keyed by category id
+}
+
+// Data of the summary stream's "delta" event
+export interface ExpenseChange {
+  months: SummaryDelta[];
+  expense: ExpenseRecord | null; // The created or updated row
+  removed_id: number | null; // Set when the expense was deleted
 }
 
+const mergeSummaryEntries = <T extends { total_amount: number; expense_count: number; percentage: number }>(
+  entries: T[],
+  changes: Record<string, SummaryDeltaEntry>,
+  idOf: (entry: T) => number,
+  create: (id: number, change: SummaryDeltaEntry) => T,
+  total: number
+): T[] => {
+  // By id, not name: two users may share a name, and a rename must not split an entry
+  const byId = new Map(entries.map((entry) => [idOf(entry), { ...entry }] as [number, T]));
+  Object.entries(changes).forEach(([key, change]) => {
+    const id = Number(key);
+    const existing = byId.get(id);
+    if (existing) {
+      existing.total_amount += change.total_amount;
+      existing.expense_count += change.expense_count;
+    } else {
+      byId.set(id, create(id, change));
+    }
+  });
+  return Array.from(byId.values())
+    .filter((entry) => entry.expense_count > 0)
+    .map((entry) => ({ ...entry, percentage: total > 0 ? (entry.total_amount / total) * 100 : 0 }));
+};
+
+// Applies a delta event's row to a newest-first recent-expenses list of at most limit rows
+export const applyExpenseChange = (recent: ExpenseRecord[], change: ExpenseChange, limit: number): ExpenseRecord[] => {
+  const changedId = change.expense?.id ?? change.removed_id;
+  const rows = recent.filter((row) => row.id !== changedId);
+  if (change.expense) rows.push(change.expense);
+  return rows
+    .sort((a, b) => b.date.localeCompare(a.date) || b.id - a.id)
+    .slice(0, limit);
+};
+
+export const applySummaryDeltas = (summary: MonthlySummary, deltas: SummaryDelta[]): MonthlySummary => {
+  return deltas
+    .filter((delta) => delta.year === summary.year && delta.month === summary.month)
+    .reduce((current, delta) => {
+      const total_amount = current.total_amount + delta.total_amount;
+      const expense_count = current.expense_count + delta.expense_count;
+      return {
+        ...current,
+        total_amount,
+        expense_count,
+        daily_average: expense_count > 0 ? total_amount / 30 : 0,
+        users: mergeSummaryEntries(current.users, delta.users, (user) => user.user_id, (id, change) => ({
+          user_id: id,
+          user_name: change.name,
+          user_color: change.color,
+          total_amount: change.total_amount,
+          expense_count: change.expense_count,
+          percentage: 0,
+        }), total_amount),
+        categories: mergeSummaryEntries(current.categories, delta.categories, (category) => category.category_id, (id, change) => ({
+          category_id: id,
+          category_name: change.name,
+          category_color: change.color,
+          total_amount: change.total_amount,
+          expense_count: change.expense_count,
+          percentage: 0,
+        }), total_amount),
+      };
+    }, summary);
+};
+
 export interface CreateExpenseData {
   amount: number;
   description?: string;
   date: string;
   user_id: number;
   category_id: number;
+  currency?: string; // ISO 4217 code; defaults to the reporting currency
+}
+
+export interface ExchangeRate {
+  id: number;
+  currency: string;
+  rate_date: string;
+  rate: number;
 }
 
+// version: the version the edit was based on; the API answers 409 if it has changed since
+export type UpdateExpenseData = Partial<CreateExpenseData> & { version?: number };
+
 export interface CreateUserData {
   name: string;
   color?: string;
@@ -88,7 +267,10 @@ export const userApi = {
   getById: (id: number) => api.get<User>(`/users/${id}`),
   create: (data: CreateUserData) => api.post<User>('/users', data),
   update: (id: number, data: Partial<CreateUserData>) => api.put<User>(`/users/${id}`, data),
-  delete: (id: number) => api.delete(`/users/${id}`),
+  delete: (id: number, reassignTo?: number) =>
+    api.delete(`/users/${id}`, { params: reassignTo === undefined ? undefined : { reassign_to: reassignTo } }),
+  merge: (id: number, into: number) =>
+    api.post<{ message: string; moved_expense_count: number }>(`/users/${id}/merge`, null, { params: { into } }),
 };
 
 // Category API
@@ -97,7 +279,10 @@ export const categoryApi = {
   getById: (id: number) => api.get<Category>(`/categories/${id}`),
   create: (data: CreateCategoryData) => api.post<Category>('/categories', data),
   update: (id: number, data: CreateCategoryData) => api.put<Category>(`/categories/${id}`, data),
-  delete: (id: number) => api.delete(`/categories/${id}`),
+  delete: (id: number, reassignTo?: number) =>
+    api.delete(`/categories/${id}`, { params: reassignTo === undefined ? undefined : { reassign_to: reassignTo } }),
+  merge: (id: number, into: number) =>
+    api.post<{ message: string; moved_expense_count: number }>(`/categories/${id}/merge`, null, { params: { into } }),
 };
 
 // Expense API
@@ -110,16 +295,39 @@ export const expenseApi = {
     start_date?: string;
     end_date?: string;
   }) => api.get<Expense[]>('/expenses', { params }),
+  getAllCompact: (params?: {
+    skip?: number;
+    limit?: number;
+    user_id?: number;
+    category_id?: number;
+    start_date?: string;
+    end_date?: string;
+  }) => api.get<CompactExpenseList>('/expenses', { params: { ...params, format: 'compact' } }),
   getById: (id: number) => api.get<Expense>(`/expenses/${id}`),
-  create: (data: CreateExpenseData) => api.post<Expense>('/expenses', data),
-  update: (id: number, data: Partial<CreateExpenseData>) => api.put<Expense>(`/expenses/${id}`, data),
+  // Retrying with the same idempotencyKey never creates the expense twice
+  create: (data: CreateExpenseData, idempotencyKey?: string) =>
+    api.post<Expense>('/expenses', data, { headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined }),
+  update: (id: number, data: UpdateExpenseData) => api.put<Expense>(`/expenses/${id}`, data),
   delete: (id: number) => api.delete(`/expenses/${id}`),
 };
 
+// Exchange rate API
+export const exchangeRateApi = {
+  getAll: (currency?: string) => api.get<ExchangeRate[]>('/exchange-rates', { params: currency ? { currency } : undefined }),
+  put: (rates: Omit<ExchangeRate, 'id'>[]) => api.put<ExchangeRate[]>('/exchange-rates', rates),
+};
+
 // Summary API
 export const summaryApi = {
   getMonthly: (year: number, month: number) => api.get<MonthlySummary>(`/summary/monthly/${year}/${month}`),
   getCurrentMonth: () => api.get<MonthlySummary>('/summary/current-month'),
+  streamUrl: `${API_BASE_URL}/summary/stream`,
+  getCurrentMonthForecast: () => api.get<SpendingForecast>('/forecast/current-month'),
+};
+
+// Dashboard API
+export const dashboardApi = {
+  get: (recent: number = 5) => api.get<DashboardData>('/dashboard', { params: { recent } }),
 };
 
 // CSV Import/Export API
@@ -133,7 +341,8 @@ export const csvApi = {
       },
     });
   },
-  confirmImport: (data: any) => api.post('/import/csv/confirm', data),
+  confirmImport: (data: any, idempotencyKey?: string) =>
+    api.post('/import/csv/confirm', data, { headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined }),
   export: (params?: {
     start_date?: string;
     end_date?: string;